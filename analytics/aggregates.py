@@ -0,0 +1,197 @@
+# analytics/aggregates.py — running sums/counts + log-bucket quantile sketches per mode and model
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+from utils.config import MODELS
+
+# Where a call's time went (services/http_session.post_timed, decode from the clients);
+# server_time is what the provider says it spent, part of ttft/transfer
+PHASES = ("retry_wait", "connect", "tls", "ttfb", "transfer", "decode", "server_time")
+# Per-model result fields folded into the aggregates; timings of answers served from the
+# response cache are not real latencies, and a failed call has no timings or answer
+METRICS = ("latency", "ttft", "itl", "tps", "queue_wait", *PHASES, "tokens_in", "tokens_out", "cost",
+           "context_tokens", "tokens_saved", "coverage", "readability", "citations", "words")
+TIMINGS = ("latency", "ttft", "itl", "tps", "queue_wait", *PHASES)
+ANSWER = ("tokens_out", "cost", "coverage", "readability", "citations", "words")
+# Bump when features() changes; stores with another value rebuild agg/agg_hist on open
+VERSION = "2"
+# Wide rows (legacy CSV, stores before per-model results) named these {metric}_{side}, the rest {side}_{field}
+SUFFIXED = ("coverage", "readability", "citations", "words")
+
+# Old column names / vote strings (OpenRouter/Groq -> OpenAI/Llama)
+LEGACY_COLUMNS = {
+    "openrouter_latency": "openai_latency",
+    "groq_latency": "llama_latency",
+    "openrouter_tokens_in": "openai_tokens_in",
+    "openrouter_tokens_out": "openai_tokens_out",
+    "groq_tokens_in": "llama_tokens_in",
+    "groq_tokens_out": "llama_tokens_out",
+    "openrouter_cost": "openai_cost",
+    "groq_cost": "llama_cost",
+    "coverage_openrouter": "coverage_openai",
+    "coverage_groq": "coverage_llama",
+    "readability_openrouter": "readability_openai",
+    "readability_groq": "readability_llama",
+    "citations_openrouter": "citations_openai",
+    "citations_groq": "citations_llama",
+    "openrouter_answer": "openai_answer",
+    "groq_answer": "llama_answer",
+}
+LEGACY_VOTES = {
+    "OpenRouter": "OpenAI (GPT-4o-mini)",
+    "Groq": "Llama-3.1 (Groq)",
+    "openrouter": "OpenAI (GPT-4o-mini)",
+    "groq": "Llama-3.1 (Groq)",
+}
+
+# Sketch buckets grow by GAMMA, so any quantile is within ~1% of the true value (DDSketch-style).
+# Bucket ids sort like the values they hold: 0 is zero, ±(OFFSET + i) covers |v| in (γ^(i-1), γ^i].
+GAMMA, _OFFSET = 1.02, 1_000_000
+_LG = math.log(GAMMA)
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS agg(mode TEXT, side TEXT, metric TEXT,
+        n INTEGER, total REAL, sumsq REAL, PRIMARY KEY(mode, side, metric))""",
+    """CREATE TABLE IF NOT EXISTS agg_hist(mode TEXT, side TEXT, metric TEXT,
+        bucket INTEGER, n INTEGER, PRIMARY KEY(mode, side, metric, bucket))""",
+)
+
+Key = Tuple[str, str, str]  # (mode, side, metric); side is "" for per-run counters
+
+def bucket(v: float) -> int:
+    if abs(v) < 1e-9: return 0
+    return int(math.copysign(math.ceil(math.log(abs(v)) / _LG) + _OFFSET, v))
+
+def bucket_value(b: int) -> float:
+    if b == 0: return 0.0
+    return math.copysign(2 * GAMMA ** (abs(b) - _OFFSET) / (GAMMA + 1), b)
+
+def is_hit(v: Any) -> bool:
+    return v in (True, "True", "true", 1, "1")
+
+def _num(v: Any) -> Optional[float]:
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(f) or math.isinf(f) else f
+
+def normalize(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Legacy column names and vote strings mapped to the current ones."""
+    r = dict(row)
+    for old, new in LEGACY_COLUMNS.items():
+        if old in r:
+            v = r.pop(old)
+            if r.get(new) is None: r[new] = v
+    pref = r.get("preference")
+    if isinstance(pref, str) and pref in LEGACY_VOTES: r["preference"] = LEGACY_VOTES[pref]
+    return r
+
+Results = Dict[str, Dict[str, Any]]  # model key → that model's fields for one run
+
+def split(row: Dict[str, Any], sides: Optional[Iterable[str]] = None) -> Tuple[Dict[str, Any], Results]:
+    """Wide row ({side}_latency, coverage_{side}, ...) → (run fields, {side: fields}); empty fields dropped."""
+    sides = sorted(sides or [m["key"] for m in MODELS], key=len, reverse=True)  # "llama_70b" before "llama"
+    run: Dict[str, Any] = {}
+    results: Results = {}
+    for k, v in normalize(row).items():
+        for side in sides:
+            if k.startswith(side + "_"): field = k[len(side) + 1:]
+            elif k.endswith("_" + side) and k[:-len(side) - 1] in SUFFIXED: field = k[:-len(side) - 1]
+            else: continue
+            if v is not None: results.setdefault(side, {})[field] = v
+            break
+        else:
+            run[k] = v
+    return run, results
+
+def join(run: Dict[str, Any], results: Results) -> Dict[str, Any]:
+    """(run fields, {side: fields}) → one wide row, {side}_{field} per model."""
+    out = dict(run)
+    for side, fields in results.items():
+        out.update({f"{side}_{k}": v for k, v in fields.items()})
+    return out
+
+Entry = Tuple[Dict[str, Any], Results]
+
+def features(entry: Optional[Entry]) -> Dict[Key, float]:
+    """Everything one run (run fields, per-model results) contributes to the aggregates."""
+    if not entry: return {}
+    run, results = entry
+    mode = str(run.get("mode") or "text")
+    out: Dict[Key, float] = {(mode, "", "runs"): 1.0}
+    pref = run.get("preference")
+    if isinstance(pref, str) and pref:
+        out[(mode, "", f"vote:{pref}")] = 1.0
+    for side, r in results.items():
+        hit, err = is_hit(r.get("cache_hit")), bool(r.get("error"))
+        if hit: out[(mode, side, "cache_hit")] = 1.0
+        if err: out[(mode, side, "error")] = 1.0
+        if is_hit(r.get("hedged")):  # services/hedging.py sent a duplicate; hedge_won: the duplicate answered first
+            out[(mode, side, "hedged")] = 1.0
+            if r.get("hedge_winner") == "hedge": out[(mode, side, "hedge_won")] = 1.0
+        for metric in METRICS:
+            if (hit or err) and metric in TIMINGS or err and metric in ANSWER: continue
+            v = _num(r.get(metric))
+            if v is not None: out[(mode, side, metric)] = v
+    return out
+
+def apply(c, changes: Iterable[Tuple[Optional[Entry], Optional[Entry]]]):
+    """
+    Fold (old, new) run entries into the aggregates on connection `c` (same transaction as
+    the row write). old=None is an insert, new=None a delete; on updates only the features
+    that changed are touched, so a vote costs a couple of upserts.
+    """
+    sums: Dict[Key, List[float]] = {}
+    hist: Dict[Tuple[str, str, str, int], int] = {}
+    def add(key: Key, v: float, sign: int):
+        s = sums.setdefault(key, [0, 0.0, 0.0])
+        s[0] += sign; s[1] += sign * v; s[2] += sign * v * v
+        if key[2] in METRICS:
+            hk = (*key, bucket(v))
+            hist[hk] = hist.get(hk, 0) + sign
+    for old, new in changes:
+        a, b = features(old), features(new)
+        for key in a.keys() | b.keys():
+            x, y = a.get(key), b.get(key)
+            if x == y: continue
+            if x is not None: add(key, x, -1)
+            if y is not None: add(key, y, +1)
+    c.executemany("""INSERT INTO agg VALUES (?,?,?,?,?,?) ON CONFLICT(mode, side, metric) DO UPDATE SET
+                     n = n + excluded.n, total = total + excluded.total, sumsq = sumsq + excluded.sumsq""",
+                  [(*k, *s) for k, s in sums.items() if any(s)])
+    c.executemany("""INSERT INTO agg_hist VALUES (?,?,?,?,?) ON CONFLICT(mode, side, metric, bucket) DO UPDATE SET
+                     n = n + excluded.n""", [(*k, n) for k, n in hist.items() if n])
+
+def _quantiles(buckets: pd.DataFrame, qs: Tuple[float, ...]) -> List[float]:
+    b = buckets.sort_values("bucket")
+    cum, n = b["n"].cumsum().to_numpy(), int(b["n"].sum())
+    ids = b["bucket"].to_numpy()
+    out = []
+    for q in qs:
+        i = min(int(cum.searchsorted(q * (n - 1) + 1)), len(ids) - 1)
+        out.append(bucket_value(int(ids[i])))
+    return out
+
+def quantile(buckets: pd.DataFrame, q: float) -> float:
+    """One quantile from sketch buckets (columns bucket, n)."""
+    return _quantiles(buckets, (q,))[0]
+
+QUANTILES = {"min": 0.0, "q1": 0.25, "median": 0.5, "q3": 0.75, "p90": 0.9, "p99": 0.99, "max": 1.0}
+
+def summarize(agg: pd.DataFrame, hist: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per (mode, side, metric) plus mode="all" across modes: n, mean, std and sketch
+    quantiles (QUANTILES). Counters (runs, vote:*, cache_hit, error, hedged, hedge_won) only carry n.
+    """
+    agg = agg[agg["n"] > 0]
+    hist = hist[hist["n"] > 0]
+    keys = ["mode", "side", "metric"]
+    agg = pd.concat([agg, agg.groupby(["side", "metric"], as_index=False)[["n", "total", "sumsq"]].sum().assign(mode="all")])
+    hist = pd.concat([hist, hist.groupby(["side", "metric", "bucket"], as_index=False)["n"].sum().assign(mode="all")])
+    out = agg[keys + ["n"]].copy()
+    out["mean"] = agg["total"] / agg["n"]
+    out["std"] = ((agg["sumsq"] / agg["n"] - out["mean"] ** 2).clip(lower=0)) ** 0.5
+    qrows = [(*k, *_quantiles(g, tuple(QUANTILES.values()))) for k, g in hist.groupby(keys)]
+    q = pd.DataFrame(qrows, columns=keys + list(QUANTILES))
+    return out.merge(q, on=keys, how="left").reset_index(drop=True)
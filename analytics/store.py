@@ -0,0 +1,275 @@
+# analytics/store.py — append-only SQLite (WAL) run log behind MetricsTracker
+import json, math, os, sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import pandas as pd
+from analytics import aggregates
+from analytics.aggregates import Entry, Results
+
+SCHEMA_VERSION = "2"  # 2: one results row per run per model (1: every model's fields in runs.data)
+
+def _clean(v: Any) -> Any:
+    # pandas hands back NaN for empty CSV cells; store them as NULL
+    return None if isinstance(v, float) and math.isnan(v) else v
+
+def _dump(d: Dict[str, Any]) -> str:
+    return json.dumps({k: _clean(v) for k, v in d.items()}, default=str)
+
+class RunStore:
+    """
+    Long format: one `runs` row per run — run_id (INTEGER PRIMARY KEY, so allocation is unique
+    across sessions and processes), timestamp, mode, and run-level fields (prompt, preference,
+    ...) as JSON — and one `results` row per run per model with that model's fields (answer,
+    latency, tokens, metrics) as JSON, so adding a contender adds rows, not columns.
+    Appends and votes are a few single-row statements; WAL lets readers and one writer work
+    concurrently, and busy_timeout serialises competing writers.
+    Every write also folds the run into analytics/aggregates.py in the same transaction and
+    bumps `version`, so readers can cache derived views until something changes. Writes open
+    with BEGIN IMMEDIATE, so reading a run and applying its aggregate deltas can't interleave
+    with another process's write (the app and batch_eval.py share the store).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as c:
+            c.execute("PRAGMA journal_mode=WAL")  # not allowed inside a transaction
+        with self._conn(write=True) as c:
+            c.execute("""CREATE TABLE IF NOT EXISTS runs(
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT, mode TEXT, data TEXT NOT NULL)""")
+            c.execute("""CREATE TABLE IF NOT EXISTS results(
+                run_id INTEGER NOT NULL, model TEXT NOT NULL, data TEXT NOT NULL,
+                PRIMARY KEY(run_id, model))""")
+            c.execute("CREATE INDEX IF NOT EXISTS runs_timestamp ON runs(timestamp)")  # time-window reads
+            c.execute("CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT)")
+            for ddl in aggregates.SCHEMA: c.execute(ddl)
+            if c.execute("SELECT 1 FROM meta WHERE key='schema'").fetchone() is None:
+                self._migrate(c)  # stores written before per-model results
+            row = c.execute("SELECT value FROM meta WHERE key='aggregates'").fetchone()
+            if row is None or row[0] != aggregates.VERSION:
+                self._rebuild(c)  # stores written before aggregates existed or by an older features()
+
+    @contextmanager
+    def _conn(self, write: bool = False):
+        c = sqlite3.connect(self.path, timeout=30)
+        c.execute("PRAGMA synchronous=NORMAL")  # durable enough in WAL mode, far fewer fsyncs
+        # take the write lock before the first read: sqlite3 would otherwise only BEGIN at the
+        # first INSERT/UPDATE, leaving reads before it (old aggregates, the run being merged) stale
+        if write: c.execute("BEGIN IMMEDIATE")
+        try:
+            with c: yield c
+        finally:
+            c.close()
+
+    @staticmethod
+    def _pack(run: Dict[str, Any]) -> str:
+        return _dump({k: v for k, v in run.items() if k not in ("run_id", "timestamp", "mode")})
+
+    @staticmethod
+    def _bump(c):
+        c.execute("INSERT INTO meta VALUES ('version', '1') ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+
+    @staticmethod
+    def _put_results(c, run_id: int, results: Results):
+        c.executemany("""INSERT INTO results VALUES (?,?,?) ON CONFLICT(run_id, model) DO UPDATE SET
+                         data = excluded.data""", [(run_id, m, _dump(f)) for m, f in results.items()])
+
+    def _migrate(self, c):
+        """Wide rows ({side}_latency, coverage_{side}, ... in runs.data) → run fields + results rows."""
+        wide = c.execute("SELECT run_id, mode, data FROM runs").fetchall()
+        for rid, mode, data in wide:
+            run, results = aggregates.split({**json.loads(data), "mode": mode})
+            c.execute("UPDATE runs SET data=? WHERE run_id=?", (self._pack(run), rid))
+            self._put_results(c, rid, results)
+        c.execute("INSERT OR REPLACE INTO meta VALUES ('schema', ?)", (SCHEMA_VERSION,))
+        if wide: c.execute("DELETE FROM meta WHERE key='aggregates'")
+
+    def _rebuild(self, c):
+        c.execute("DELETE FROM agg"); c.execute("DELETE FROM agg_hist")
+        aggregates.apply(c, ((None, e) for e in self._entries(c)))
+        c.execute("INSERT OR REPLACE INTO meta VALUES ('aggregates', ?)", (aggregates.VERSION,))
+        self._bump(c)
+
+    def append(self, run: Dict[str, Any], results: Optional[Results] = None, replace: Sequence[str] = ()) -> int:
+        """
+        One run and its per-model results; a single wide row (results=None) is split first.
+        replace: run fields; earlier runs with the same values that a model errored on are
+        deleted in the same transaction (a retry supersedes the failed attempt).
+        """
+        if results is None: run, results = aggregates.split(run)
+        with self._conn(write=True) as c:
+            stale = self._failed(c, {f: run.get(f) for f in replace}) if replace else []
+            for old in stale:
+                c.execute("DELETE FROM results WHERE run_id=?", (old[0]["run_id"],))
+                c.execute("DELETE FROM runs WHERE run_id=?", (old[0]["run_id"],))
+            cur = c.execute("INSERT INTO runs(run_id, timestamp, mode, data) VALUES (?,?,?,?)",
+                            (run.get("run_id"), run.get("timestamp"), run.get("mode"), self._pack(run)))
+            self._put_results(c, cur.lastrowid, results)
+            aggregates.apply(c, [*((old, None) for old in stale), (None, (run, results))])
+            self._bump(c)
+            return cur.lastrowid
+
+    def append_many(self, rows: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Wide rows (legacy CSV import) → {"added", "renumbered", "duplicates"}. A run_id already
+        taken by a different run (timestamp or prompt differ) gets a new id, the old one kept as
+        legacy_run_id; a row matching the stored run (e.g. a re-imported export) is skipped.
+        """
+        counts = {"added": 0, "renumbered": 0, "duplicates": 0}
+        with self._conn(write=True) as c:
+            new = []
+            for r in rows:
+                run, results = aggregates.split({k: _clean(v) for k, v in r.items()})
+                rid = run.get("run_id")
+                if rid is not None:
+                    got = c.execute("SELECT timestamp, json_extract(data, '$.prompt') FROM runs WHERE run_id=?",
+                                    (int(rid),)).fetchone()
+                    if got is not None:
+                        if tuple(got) == (run.get("timestamp"), run.get("prompt")):
+                            counts["duplicates"] += 1
+                            continue
+                        run = {**run, "run_id": None, "legacy_run_id": rid}
+                        counts["renumbered"] += 1
+                cur = c.execute("INSERT INTO runs(run_id, timestamp, mode, data) VALUES (?,?,?,?)",
+                                (run.get("run_id"), run.get("timestamp"), run.get("mode"), self._pack(run)))
+                self._put_results(c, cur.lastrowid, results)
+                new.append((None, (run, results)))
+                counts["added"] += 1
+            aggregates.apply(c, new)
+            self._bump(c)
+        return counts
+
+    def _failed(self, c, match: Dict[str, Any]) -> List[Entry]:
+        """Runs whose fields equal `match` and that some model errored on."""
+        where = " AND ".join("json_extract(r.data, ?) = ?" for _ in match)
+        ids = [rid for (rid,) in c.execute(
+            f"""SELECT run_id FROM runs r WHERE {where} AND EXISTS (SELECT 1 FROM results x
+                WHERE x.run_id = r.run_id AND json_extract(x.data, '$.error') IS NOT NULL)""",
+            [a for f, v in match.items() for a in (f"$.{f}", v)])]
+        return [e for e in (self._load(c, rid) for rid in ids) if e]
+
+    def _load(self, c, run_id: int) -> Optional[Entry]:
+        got = self._entries(c, "WHERE run_id=?", (int(run_id),))
+        return got[0] if got else None
+
+    def _merge(self, c, run_id: int, fields: Optional[Dict[str, Any]], results: Optional[Results]):
+        """Apply run-level and per-model field updates; returns the (old, new) entry pair or None."""
+        old = self._load(c, run_id)
+        if old is None: return None
+        run, res = old
+        if fields:
+            run = {**run, **{k: _clean(v) for k, v in fields.items()}}
+            c.execute("UPDATE runs SET data=? WHERE run_id=?", (self._pack(run), int(run_id)))
+        if results:
+            res = {**res, **{m: {**res.get(m, {}), **f} for m, f in results.items()}}
+            self._put_results(c, int(run_id), {m: res[m] for m in results})
+        return old, (run, res)
+
+    def update(self, run_id: int, fields: Optional[Dict[str, Any]] = None, results: Optional[Results] = None) -> bool:
+        """Update run-level fields (e.g. preference) and/or some models' fields of one run."""
+        with self._conn(write=True) as c:
+            change = self._merge(c, run_id, fields, results)
+            if change is None: return False
+            aggregates.apply(c, [change])
+            self._bump(c)
+            return True
+
+    def update_many(self, updates: Dict[int, Results]) -> int:
+        """Per-model field updates {run_id: {model: fields}} in one transaction (metric backfills); returns runs changed."""
+        if not updates: return 0
+        with self._conn(write=True) as c:
+            changes = [ch for rid, res in updates.items() if (ch := self._merge(c, rid, None, res)) is not None]
+            aggregates.apply(c, changes)
+            if changes: self._bump(c)
+            return len(changes)
+
+    @staticmethod
+    def _entries(c, where: str = "", args=(), order: str = "ASC", limit: Optional[int] = None) -> List[Entry]:
+        """(run fields incl. run_id/timestamp/mode, {model: fields}) per run, in run_id order."""
+        lim = f" LIMIT {int(limit)}" if limit else ""
+        q = f"""SELECT r.run_id, r.timestamp, r.mode, r.data, x.model, x.data
+                FROM (SELECT * FROM runs {where} ORDER BY run_id {order}{lim}) r
+                LEFT JOIN results x ON x.run_id = r.run_id ORDER BY r.run_id {order}"""
+        out: List[Entry] = []
+        for rid, ts, mode, data, model, rdata in c.execute(q, args):
+            if not out or out[-1][0]["run_id"] != rid:
+                out.append(({"run_id": rid, "timestamp": ts, "mode": mode, **json.loads(data)}, {}))
+            if model is not None: out[-1][1][model] = json.loads(rdata)
+        return out
+
+    def entries(self, mode: Optional[str] = None) -> List[Entry]:
+        with self._conn() as c:
+            return self._entries(c, *(("WHERE mode=?", (mode,)) if mode else ()))
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Every run as one wide row ({model}_{field} per model), oldest first."""
+        with self._conn() as c:
+            return [aggregates.join(r, x) for r, x in self._entries(c)]
+
+    def recent(self, limit: int, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Newest `limit` runs (optionally of one mode) as wide rows, newest first."""
+        with self._conn() as c:
+            where, args = ("WHERE mode=?", (mode,)) if mode else ("", ())
+            return [aggregates.join(r, x) for r, x in self._entries(c, where, args, "DESC", limit)]
+
+    def model_rows(self, limit: Optional[int] = None, mode: Optional[str] = None,
+                   since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Long format: one row per run per model (run_id, timestamp, mode, side = model key,
+        fields), newest first; since: only runs stamped at or after this "%Y-%m-%d %H:%M:%S".
+        """
+        conds = [(sql, arg) for sql, arg in (("mode=?", mode), ("timestamp>=?", since)) if arg]
+        where = "WHERE " + " AND ".join(sql for sql, _ in conds) if conds else ""
+        with self._conn() as c:
+            return [{"run_id": r["run_id"], "timestamp": r["timestamp"], "mode": r["mode"], "side": m, **f}
+                    for r, x in self._entries(c, where, tuple(a for _, a in conds), "DESC", limit) for m, f in x.items()]
+
+    @property
+    def version(self) -> int:
+        """Bumped by every write; a cheap key for caching anything derived from the runs."""
+        return int(self.get_meta("version") or 0)
+
+    def summary(self) -> pd.DataFrame:
+        """Pre-aggregated per mode/model statistics (see aggregates.summarize)."""
+        with self._conn() as c:
+            agg = pd.read_sql_query("SELECT * FROM agg", c)
+            hist = pd.read_sql_query("SELECT * FROM agg_hist", c)
+        return aggregates.summarize(agg, hist)
+
+    def quantiles(self, metric: str, q: float, mode: str = "all") -> Dict[str, Tuple[int, float]]:
+        """{model: (samples, q-quantile of `metric`)} straight from the sketches of one mode ("all" = every mode)."""
+        sql = "SELECT side, bucket, SUM(n) AS n FROM agg_hist WHERE metric=? AND side != ''"
+        args: Tuple = (metric,)
+        if mode != "all": sql, args = sql + " AND mode=?", (metric, mode)
+        with self._conn() as c:
+            hist = pd.read_sql_query(sql + " GROUP BY side, bucket", c, params=args)
+        hist = hist[hist["n"] > 0]
+        return {side: (int(g["n"].sum()), aggregates.quantile(g, q)) for side, g in hist.groupby("side")}
+
+    def distinct(self, *fields: str, ok: bool = False) -> List[Tuple]:
+        """Distinct value tuples of run fields (runs missing any are skipped); ok: only runs no model errored on."""
+        cols = ", ".join("json_extract(r.data, ?)" for _ in fields)
+        where = " AND ".join("json_extract(r.data, ?) IS NOT NULL" for _ in fields)
+        if ok:
+            where += " AND NOT EXISTS (SELECT 1 FROM results x WHERE x.run_id = r.run_id AND json_extract(x.data, '$.error') IS NOT NULL)"
+        paths = [f"$.{f}" for f in fields]
+        with self._conn() as c:
+            return list(c.execute(f"SELECT DISTINCT {cols} FROM runs r WHERE {where}", paths + paths))
+
+    def count(self) -> int:
+        with self._conn() as c:
+            return c.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._conn() as c:
+            got = c.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+            return got[0] if got else None
+
+    def set_meta(self, key: str, value: str):
+        with self._conn(write=True) as c:
+            c.execute("INSERT OR REPLACE INTO meta VALUES (?,?)", (key, value))
+
+    def clear(self):
+        with self._conn(write=True) as c:
+            c.execute("DELETE FROM runs"); c.execute("DELETE FROM results")
+            self._rebuild(c)
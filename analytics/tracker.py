@@ -1,58 +1,146 @@
 # analytics/tracker.py
-import time, pandas as pd, os
-from typing import Optional, Any, Dict, List
+import time, pandas as pd, os, sqlite3, sys
+from typing import Optional, Any, Dict, List, Sequence
+from analytics.store import RunStore
+from analytics.aggregates import PHASES
+from evaluators.metrics import token_estimate, cost_estimate
+from evaluators.evaluation import evaluate
+from utils.config import RUNS_DB_PATH, OLD_RUNS_DB_PATH, LEGACY_CSV, COST_MAP, HEDGE_ENABLED, HEDGE_QUANTILE, HEDGE_MIN_SAMPLES
+
+# Per-model timings recorded for streamed calls (see services/streaming.py)
+STREAM_METRICS = ("ttft", "itl", "tps")
+# Everything logged per model from a call's usage dict; queue_wait is the time spent waiting
+# for services/scheduler.py (not part of latency); cache_hit marks answers served from
+# services/response_cache.py, whose latencies must not be mixed with real ones; hedged /
+# hedge_winner say whether services/hedging.py sent a duplicate and which copy answered;
+# PHASES split the call's latency (connect, TLS, TTFB, transfer, decode, server time);
+# image_* are services/image_prep.py's time and payload size for vision calls
+CALL_FIELDS = STREAM_METRICS + PHASES + ("queue_wait", "cache_hit", "hedged", "hedge_winner",
+                                         "image_prep_s", "image_bytes", "image_bytes_saved")
+
+def call_fields(usage: Dict[str, Any]) -> Dict[str, Any]:
+    """{"ttft": .., "tps": .., "cache_hit": ..} from a call's usage dict."""
+    return {k: (usage or {}).get(k) for k in CALL_FIELDS}
+
+def result_fields(model: str, r: Dict[str, Any], prompt: str, context: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One model's entry in log(results=...) from its fan_out result: answer, latency, tokens
+    (provider-reported, else estimated with the model's tokenizer), cost, call timings and
+    answer metrics (coverage only when a RAG context is given). A failed call keeps its error,
+    tokens_in and call fields; latency, output tokens, cost and answer metrics are None.
+    """
+    u, text = r.get("usage") or {}, r.get("text") or ""
+    tin = u.get("prompt_tokens") or token_estimate(prompt + (context or ""), model)
+    if r.get("error"):
+        return {"model": model, "answer": text, "latency": None, "error": r["error"], "tokens_in": tin,
+                "tokens_out": None, "cost": None, **call_fields(u), **{m: None for m in evaluate("", context)}}
+    tout = u.get("completion_tokens") or token_estimate(text, model)
+    return {"model": model, "answer": text, "latency": r.get("latency"), "error": None,
+            "tokens_in": tin, "tokens_out": tout, "cost": cost_estimate(model, model, tin, tout, COST_MAP),
+            **call_fields(u), **evaluate(text, context)}
+
+def _copy_db(src: str, dst: str):
+    """Consistent copy of a SQLite db (WAL included) via the backup API; src is left in place."""
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    old, new = sqlite3.connect(src), sqlite3.connect(dst)
+    try:
+        old.backup(new)
+    finally:
+        old.close(); new.close()
+    print(f"run store moved: copied {src} to {dst} (the old file can be deleted)", file=sys.stderr)
 
 class MetricsTracker:
-    def __init__(self):
-        self.rows: List[Dict[str, Any]] = []
-        self._next_id = 1  # simple incremental run_id
-
-    def _alloc_id(self) -> int:
-        rid = self._next_id
-        self._next_id += 1
-        return rid
-
-    def log(self, row: dict) -> int:
-        """Append a row and return its run_id."""
-        run_id = row.get("run_id") or self._alloc_id()
+    """
+    Runs live in a SQLite run store (analytics/store.py): log() and update_by_id() are durable
+    immediately, so nothing needs to rewrite a CSV afterwards. Every session/process opening
+    the same db sees the same history. Each run holds one result per model (long format).
+    """
+    def __init__(self, path: str = RUNS_DB_PATH):
+        if path == RUNS_DB_PATH and not os.path.exists(path) and os.path.exists(OLD_RUNS_DB_PATH):
+            _copy_db(OLD_RUNS_DB_PATH, path)
+        self.store = RunStore(path)
+
+    @property
+    def rows(self) -> List[Dict[str, Any]]:
+        return self.store.rows()
+
+    def log(self, run: dict, results: Optional[Dict[str, Dict[str, Any]]] = None, replace: Sequence[str] = ()) -> int:
+        """
+        Append a run and return its run_id. run: run-level fields (mode, prompt, preference, ...);
+        results: {model key: result_fields(...)}. A single wide row ({key}_latency, ...) still works.
+        replace: run fields identifying a retry, e.g. ("batch", "prompt_id"); earlier failed runs
+        with the same values are dropped so the prompt is counted once.
+        """
         stamped = {
-            **row,
-            "run_id": run_id,
+            **run,
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
         }
-        self.rows.append(stamped)
-        return run_id
+        return self.store.append(stamped, results, replace)
 
     def update_by_id(self, run_id: int, **fields):
-        for r in reversed(self.rows):
-            if r.get("run_id") == run_id:
-                r.update(fields)
-                return True
-        return False
+        return self.store.update(run_id, fields)
 
     def df(self):
-        return pd.DataFrame(self.rows)
+        """One wide row per run ({model}_{field} columns)."""
+        return pd.DataFrame(self.store.rows())
+
+    def long_df(self, limit: Optional[int] = None, mode: Optional[str] = None):
+        """One row per run per model, newest first."""
+        return pd.DataFrame(self.store.model_rows(limit, mode))
 
-    # Persistence
+    def recent(self, limit: int = 50, mode: Optional[str] = None):
+        """Newest runs first, without reading the whole history."""
+        return pd.DataFrame(self.store.recent(limit, mode))
+
+    @property
+    def version(self) -> int:
+        return self.store.version
+
+    def summary(self):
+        """Running per mode/model aggregates (analytics/aggregates.py), kept up to date by log/update."""
+        return self.store.summary()
+
+    def hedge_delays(self, mode: str) -> Dict[str, Dict[str, float]]:
+        """
+        {model: {"latency": s, "ttft": s}} at HEDGE_QUANTILE of this mode's history, for
+        registry.clients(hedge=...); models with under HEDGE_MIN_SAMPLES answers are left out.
+        """
+        if not HEDGE_ENABLED: return {}
+        out: Dict[str, Dict[str, float]] = {}
+        for metric in ("latency", "ttft"):
+            for side, (n, v) in self.store.quantiles(metric, HEDGE_QUANTILE, mode).items():
+                if n >= HEDGE_MIN_SAMPLES: out.setdefault(side, {})[metric] = v
+        return out
+
+    def logged(self, *fields: str, ok: bool = False) -> set:
+        """
+        Distinct (field, ...) string tuples across all runs, e.g. ("batch", "prompt_id") for
+        resuming; ok=True leaves out runs where any model returned an error.
+        """
+        return {tuple(str(v) for v in row) for row in self.store.distinct(*fields, ok=ok)}
+
+    # Import / export
     def save_csv(self, path="llm_benchmarks.csv"):
-        if not self.rows: 
-            # still write an empty df to keep schema stable
-            pd.DataFrame(self.rows).to_csv(path, index=False)
+        """Export a snapshot; persistence itself no longer depends on this."""
+        self.df().to_csv(path, index=False)
+
+    def load_csv(self, path=LEGACY_CSV):
+        """
+        One-time import of a legacy tracker CSV; later calls are no-ops. run_ids are kept unless
+        another run already has them (then renumbered, see RunStore.append_many); the counts
+        are reported on stderr and returned.
+        """
+        tag = f"imported:{os.path.abspath(path)}"
+        if not os.path.exists(path) or self.store.get_meta(tag): return
+        try:
+            df = pd.read_csv(path)
+        except Exception:
             return
-        df = self.df()
-        df.to_csv(path, index=False)
-
-    def load_csv(self, path="llm_benchmarks.csv"):
-        if os.path.exists(path):
-            try:
-                df = pd.read_csv(path)
-                self.rows = df.to_dict(orient="records")
-                # restore next_id (max existing + 1)
-                if "run_id" in df.columns and not df["run_id"].empty:
-                    self._next_id = int(df["run_id"].max()) + 1
-            except Exception:
-                pass
+        counts = self.store.append_many(df.to_dict(orient="records"))
+        self.store.set_meta(tag, time.strftime("%Y-%m-%d %H:%M:%S"))
+        print(f"imported {path}: {counts['added']} runs ({counts['renumbered']} renumbered after a run_id clash, "
+              f"{counts['duplicates']} already in the store skipped)", file=sys.stderr)
+        return counts
 
     def clear(self):
-        self.rows = []
-        self._next_id = 1
+        self.store.clear()
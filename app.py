@@ -1,11 +1,26 @@
 import streamlit as st
 import pandas as pd
 from components.ui import page_header, section_divider, note
-from utils.config import OPENROUTER_API_KEY, GROQ_API_KEY, JINA_API_KEY, QDRANT_URL, QDRANT_API_KEY
+from utils.config import OPENROUTER_API_KEY, GROQ_API_KEY, JINA_API_KEY, QDRANT_URL, QDRANT_API_KEY, HTTP_WARMUP
 from analytics.tracker import MetricsTracker
+from services import openrouter, groq_llama, embeddings_jina, registry
+from services.http_session import warm_up
 
 st.set_page_config(page_title="LLM Comparison Workbench", page_icon="⚖️", layout="wide", initial_sidebar_state="expanded")
 
+@st.cache_resource(show_spinner="Warming up provider connections...")
+def provider_rtts():
+    """Once per process: open pooled connections and measure connect RTT per provider."""
+    urls = {"openrouter": openrouter.URL, "groq": groq_llama.URL}
+    if JINA_API_KEY: urls["jina"] = embeddings_jina.JINA_URL
+    if QDRANT_URL: urls["qdrant"] = QDRANT_URL
+    return warm_up(urls)
+
+def rtt_label(name: str) -> str:
+    rtts = provider_rtts() if HTTP_WARMUP else {}
+    if name not in rtts: return "—"
+    return f"{rtts[name]*1000:.0f} ms" if rtts[name] is not None else "unreachable"
+
 # Ensure tracker and load past CSV if any
 if "tracker" not in st.session_state:
     st.session_state.tracker = MetricsTracker()
@@ -40,22 +55,22 @@ with c4:
 section_divider()
 st.subheader("Status")
 s1, s2, s3, s4 = st.columns(4)
-with s1: st.write("**OpenAI via OpenRouter**"); st.write("Key:", "✅" if OPENROUTER_API_KEY else "❌")
-with s2: st.write("**Groq (Llama-3.1)**"); st.write("Key:", "✅" if GROQ_API_KEY else "❌")
-with s3: st.write("**Jina (optional)**"); st.write("Key:", "✅" if JINA_API_KEY else "—")
-with s4: st.write("**Qdrant (optional)**"); st.write("URL:", "✅" if (QDRANT_URL and QDRANT_API_KEY) else "—")
+with s1: st.write("**OpenAI via OpenRouter**"); st.write("Key:", "✅" if OPENROUTER_API_KEY else "❌"); st.write("Connect RTT:", rtt_label("openrouter"))
+with s2: st.write("**Groq (Llama-3.1)**"); st.write("Key:", "✅" if GROQ_API_KEY else "❌"); st.write("Connect RTT:", rtt_label("groq"))
+with s3: st.write("**Jina (optional)**"); st.write("Key:", "✅" if JINA_API_KEY else "—"); st.write("Connect RTT:", rtt_label("jina"))
+with s4: st.write("**Qdrant (optional)**"); st.write("URL:", "✅" if (QDRANT_URL and QDRANT_API_KEY) else "—"); st.write("Connect RTT:", rtt_label("qdrant"))
 
 section_divider()
 st.subheader("Recent runs")
-df = st.session_state.tracker.df()
+df = st.session_state.tracker.recent(6)
 if not df.empty:
     # Backward-compat: compute a small view regardless of column names
     cols = []
-    for c in ["openai_latency","llama_latency","openrouter_latency","groq_latency"]:
+    for c in [f"{k}_latency" for k in registry.keys()] + ["openrouter_latency","groq_latency"]:
         if c in df.columns: cols.append(c)
     view_cols = ["timestamp","mode","preference"] + cols
     show = [c for c in view_cols if c in df.columns]
-    st.dataframe(df[show].tail(6).iloc[::-1], use_container_width=True)
+    st.dataframe(df[show], use_container_width=True)
     st.caption("Runs are saved automatically from the compare pages.")
 else:
     note("No runs yet — jump into a page above to log your first comparison.")
@@ -0,0 +1,159 @@
+# batch_eval.py — headless comparisons of the registered models over a JSONL prompt set
+#
+#   python batch_eval.py prompts.jsonl --concurrency 16 --openrouter-rpm 300 --groq-rpm 30
+#
+# One JSON object per line:
+#   {"id": "q1", "mode": "text", "prompt": "Explain transformers.", "system": "...", "max_tokens": 512}
+#   {"id": "d1", "mode": "doc",  "prompt": "Summarize in bullets.", "document": "reports/q3.pdf"}
+#   {"id": "r1", "mode": "rag",  "prompt": "What was Q3 revenue?", "document": "reports/q3.pdf", "k": 6}
+# `id` defaults to the line number. Every model in utils/config.MODELS answers each prompt.
+# Results are logged through MetricsTracker (same fields as the Streamlit pages, plus
+# prompt_id/batch) into the run store as each one finishes, so they show up on the
+# Analytics page; rerunning the same file skips its prompt ids already logged without model
+# errors and replaces the failed runs of the ones it retries (ids are per file, keyed on its
+# absolute path: line numbers of another batch, or a same-named file elsewhere, don't count).
+import argparse, json, os, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Optional
+
+from analytics.tracker import MetricsTracker, result_fields
+from retrieval.document_processor import (extract_text_from_pdf, extract_text_from_docx,
+                                          extract_text_from_csv, chunk_text)
+from retrieval.hybrid_retriever import HybridRetriever
+from retrieval.index_cache import shared_cache, index_key, estimate_bytes
+from retrieval.context_packer import pack_context
+from services.dispatch import fan_out
+from services.scheduler import shared_scheduler, BATCH
+from services import registry
+from utils.config import RUNS_DB_PATH
+
+RAG_SYSTEM = ("Answer using only the provided context. If unknown, say you don't know. "
+              "Include inline citation labels like [12] if applicable.")
+
+@lru_cache(maxsize=64)
+def load_document(path: str) -> str:
+    ext = path.rsplit(".", 1)[-1].lower()
+    if ext == "pdf":
+        with open(path, "rb") as f: return extract_text_from_pdf(f)
+    with open(path, "rb") as f: data = f.read()
+    if ext == "docx": return extract_text_from_docx(data)
+    if ext == "csv": return extract_text_from_csv(data)
+    return data.decode("utf-8", errors="ignore")
+
+def rag_context(path: str, question: str, k: int) -> dict:
+    """Per-model packed context (see retrieval/context_packer.py) for the top-k chunks."""
+    text = load_document(path)
+    key = index_key(text, 900, 120, "sentence")
+    def build():
+        chunks = chunk_text(text, chunk_size=900, overlap=120, boundary="sentence")
+        retriever = HybridRetriever(chunks)
+        return {"retriever": retriever, "chunks": chunks, "n_chunks": len(chunks),
+                "bytes": estimate_bytes(chunks, retriever)}
+    entry, _ = shared_cache().get_or_build(key + ":bm25", build)
+    idx_map = {id(c): i for i, c in enumerate(entry["chunks"])}
+    top = entry["retriever"].get_top_chunks(question, k=k)
+    scored = [(idx_map[id(c)], c, float(k - r)) for r, c in enumerate(top)]
+    return {m["key"]: pack_context(scored, m["context_tokens"], m["model"]) for m in registry.models()}
+
+def run_one(item: dict, clients: dict, use_cache: bool = True, deadline: Optional[float] = None) -> tuple:
+    mode = item.get("mode", "text")
+    prompt, system = item["prompt"], item.get("system", "You are a helpful assistant.")
+    max_tokens, packs = int(item.get("max_tokens", 512)), {}
+    if mode == "doc":
+        prompt = f"Document:\n{load_document(item['document'])[:12000]}\n\nInstruction:\n{item['prompt']}"
+    elif mode == "rag":
+        packs, system = rag_context(item["document"], prompt, int(item.get("k", 6))), item.get("system", RAG_SYSTEM)
+    models = registry.models()
+    contexts = {m["key"]: packs[m["key"]]["context"] if packs else "" for m in models}
+
+    # pacing happens inside the clients (services/scheduler.py), after the cache check
+    call = lambda key: lambda: clients[key].chat_text(prompt, system=system, context=contexts[key],
+                                                      max_tokens=max_tokens, use_cache=use_cache)
+    res = fan_out({m["key"]: call(m["key"]) for m in models}, deadline=deadline)
+
+    run = {"mode": mode, "prompt": item["prompt"], "prompt_id": str(item["id"]), "batch": item["batch"]}
+    if item.get("document"): run["filename"] = os.path.basename(item["document"])
+    results = {}
+    for m in models:
+        key = m["key"]
+        if mode == "rag":
+            P = packs[key]
+            results[key] = {**result_fields(m["model"], res[key], prompt + system, P["context"]),
+                            "context_tokens": P["tokens"], "tokens_saved": P["saved_tokens"], "context": P["context"]}
+        else:
+            results[key] = result_fields(m["model"], res[key], prompt + system)
+    if mode == "rag":
+        first = packs[models[0]["key"]]
+        run.update({"context_chars": len(first["context"]), "context_tokens_raw": first["raw_tokens"]})
+    run["preference"] = None
+    return run, results
+
+def read_items(path: str):
+    batch = os.path.abspath(path)
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip(): continue
+            item = json.loads(line)
+            item.setdefault("id", n)
+            item["batch"] = batch
+            yield item
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run model comparisons over a JSONL prompt set.")
+    ap.add_argument("prompts", help="JSONL file of text/doc/rag prompts")
+    ap.add_argument("--concurrency", type=int, default=8, help="prompts in flight at once")
+    ap.add_argument("--openrouter-rpm", type=float, default=None, help="OpenRouter requests per minute (default OPENROUTER_RPM, 0 = unlimited)")
+    ap.add_argument("--groq-rpm", type=float, default=None, help="Groq requests per minute (default GROQ_RPM, 0 = unlimited)")
+    ap.add_argument("--groq-tpm", type=float, default=None, help="Groq tokens per minute (default GROQ_TPM, 0 = unlimited)")
+    ap.add_argument("--db", default=RUNS_DB_PATH, help="run store to resume from and log to")
+    ap.add_argument("--csv", default=None, help="also export all runs to this CSV when done")
+    ap.add_argument("--progress", type=int, default=25, help="report progress every N results")
+    ap.add_argument("--no-cache", action="store_true", help="bypass the response cache (always hit the providers)")
+    ap.add_argument("--deadline", type=float, default=0, help="seconds each prompt may take, queueing included (0 = no limit)")
+    ap.add_argument("--hedge", action="store_true", help="duplicate calls still unanswered past the model's p95 (costs extra requests)")
+    a = ap.parse_args(argv)
+
+    tracker = MetricsTracker(a.db); tracker.load_csv()
+    done = tracker.logged("batch", "prompt_id", ok=True)
+    items = list(read_items(a.prompts))
+    todo = [it for it in items if (it["batch"], str(it["id"])) not in done]
+    print(f"{len(items) - len(todo)} prompts already answered, {len(todo)} to run", file=sys.stderr)
+    items = todo
+    if not items: return
+
+    sched = shared_scheduler()
+    if a.openrouter_rpm is not None: sched.set_limits("openrouter", rpm=a.openrouter_rpm)
+    if a.groq_rpm is not None: sched.set_limits("groq", rpm=a.groq_rpm)
+    if a.groq_tpm is not None: sched.set_limits("groq", tpm=a.groq_tpm)
+    modes = {it.get("mode", "text") for it in items}
+    clients = {m: registry.clients(BATCH, hedge=tracker.hedge_delays(m) if a.hedge else None) for m in modes}
+    lock, t0, n_done, n_err = threading.Lock(), time.perf_counter(), 0, 0
+    with ThreadPoolExecutor(max_workers=a.concurrency) as pool:
+        futs = {pool.submit(run_one, it, clients[it.get("mode", "text")], not a.no_cache, a.deadline): it for it in items}
+        for f in as_completed(futs):
+            try:
+                run, results = f.result()
+            except Exception as e:  # bad item (missing document, ...): report and keep going
+                n_err += 1
+                print(f"prompt {futs[f]['id']}: {e}", file=sys.stderr)
+                continue
+            # durable on return: an interrupted run resumes from here; a retry replaces the failed run
+            tracker.log(run, results, replace=("batch", "prompt_id"))
+            errors = {k: r["error"] for k, r in results.items() if r.get("error")}
+            if errors:  # logged for analytics, but retried on the next run
+                print(f"prompt {run['prompt_id']}: " + "; ".join(f"{k}: {e}" for k, e in errors.items()), file=sys.stderr)
+            with lock:
+                n_done += 1
+                n_err += bool(errors)
+                if n_done % a.progress == 0:
+                    rate = n_done / (time.perf_counter() - t0)
+                    print(f"{n_done}/{len(items)} done ({rate:.1f} prompts/s)", file=sys.stderr)
+    if a.csv: tracker.save_csv(a.csv)
+    print(f"finished {n_done} prompts ({n_err} failed) in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    for ln in sched.snapshot():
+        print(f"  {ln['provider']}/{ln['model']}: {ln['admitted']} calls, queue wait avg {ln['avg_wait_s']:.2f}s "
+              f"max {ln['max_wait_s']:.2f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
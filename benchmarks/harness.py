@@ -0,0 +1,90 @@
+# benchmarks/harness.py — timing, peak memory, JSON results and baseline comparison
+import json, os, platform, subprocess, time, tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+# Below these absolute differences a change is noise, whatever the relative tolerance says
+MIN_DELTA_MS = 0.05
+MIN_DELTA_MB = 0.25
+
+def measure(bench: str, size: int, op: Callable[[int], Any], items: int = 1, repeat: int = 5,
+            unit: str = "items", **extra) -> Dict[str, Any]:
+    """
+    op(i) is one operation over `items` units. One untimed pass under tracemalloc gives the
+    peak Python heap (numpy/scipy buffers included; worker processes are not) and doubles as
+    warm-up; then `repeat` timed passes give latency percentiles and throughput (items/s at p50).
+    """
+    tracemalloc.start()
+    try:
+        op(0)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    secs = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        op(i)
+        secs.append(time.perf_counter() - t0)
+    s = np.array(secs)
+    p50 = float(np.percentile(s, 50))
+    return {"bench": bench, "size": size, "unit": unit, "repeat": repeat,
+            "p50_ms": p50 * 1000, "p95_ms": float(np.percentile(s, 95)) * 1000, "min_ms": float(s.min()) * 1000,
+            "throughput": items / p50 if p50 > 0 else None, "peak_mb": peak / 1048576, **extra}
+
+def environment() -> Dict[str, Any]:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        sha = ""
+    return {"timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "git": sha or None, "python": platform.python_version(),
+            "platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count()}
+
+def save(path: str, results: List[Dict[str, Any]], args: Dict[str, Any]):
+    with open(path, "w") as f:
+        json.dump({"meta": {**environment(), "args": args}, "results": results}, f, indent=2)
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+def compare(base: Dict[str, Any], cur: Dict[str, Any], tolerance: float = 0.2,
+            mem_tolerance: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    One row per (bench, size) in either file. status is "regression" when p50 latency or peak
+    memory grew by more than the tolerance (relative, and above MIN_DELTA_*), "improved" when
+    either shrank by as much without the other regressing, else "ok"; "new"/"missing" when only
+    one side has it.
+    """
+    mem_tolerance = tolerance if mem_tolerance is None else mem_tolerance
+    old = {(r["bench"], r["size"]): r for r in base["results"]}
+    new = {(r["bench"], r["size"]): r for r in cur["results"]}
+    rows = []
+    for key in list(old) + [k for k in new if k not in old]:
+        o, n = old.get(key), new.get(key)
+        row = {"bench": key[0], "size": key[1]}
+        if o is None or n is None:
+            rows.append({**row, "status": "new" if o is None else "missing"}); continue
+        worse, better = [], []
+        for field, tol, floor in (("p50_ms", tolerance, MIN_DELTA_MS), ("peak_mb", mem_tolerance, MIN_DELTA_MB)):
+            a, b = o.get(field), n.get(field)
+            row[field] = (a, b)
+            if a is None or b is None or abs(b - a) < floor: continue
+            if b > a * (1 + tol): worse.append(field)
+            elif b < a * (1 - tol): better.append(field)
+        rows.append({**row, "status": "regression" if worse else "improved" if better else "ok",
+                     "fields": worse or better})
+    return rows
+
+def report(rows: List[Dict[str, Any]], base_meta: Dict[str, Any], cur_meta: Dict[str, Any]) -> int:
+    """Print the comparison; returns the number of regressions."""
+    for k in ("machine", "cpus", "python"):
+        if base_meta.get(k) != cur_meta.get(k):
+            print(f"warning: baseline {k}={base_meta.get(k)!r}, this run {k}={cur_meta.get(k)!r}; timings may not be comparable")
+    fmt = lambda v: "" if v is None else f"{v:.2f}"
+    print(f"{'bench':>18} {'size':>9} {'p50 ms':>25} {'peak MB':>23} {'status':>11}")
+    for r in rows:
+        t, m = r.get("p50_ms", (None, None)), r.get("peak_mb", (None, None))
+        ratio = lambda p: f"{p[1] / p[0] - 1:+.0%}" if p[0] and p[1] is not None else ""
+        print(f"{r['bench']:>18} {r['size']:>9} {fmt(t[0]):>8} → {fmt(t[1]):>8} {ratio(t):>5}"
+              f" {fmt(m[0]):>7} → {fmt(m[1]):>7} {ratio(m):>5} {r['status']:>11}")
+    return sum(r["status"] == "regression" for r in rows)
@@ -0,0 +1,278 @@
+# benchmarks/load_test.py — N concurrent Streamlit sessions in one process against the mock provider
+#
+#   python -m benchmarks.load_test --sessions 1 2 4 8 16 --iterations 2 --out load.json
+#   python -m benchmarks.load_test --sessions 8 --pages text rag --ttft lognormal:0.8,0.6
+#
+# Each simulated user is one AppTest session of app.py that switches to the Text, Images & Docs
+# and RAG pages and clicks through them (its own tracker, chunk list and index, like a browser
+# tab); all users of a level run at once on threads, as Streamlit runs sessions' scripts. Providers
+# are benchmarks/mock_provider.py in-process, so nothing leaves the machine. Per level it reports
+# rerun latency percentiles (overall and per step), RSS growth per session, and CPU use.
+import os, sys, argparse, gc, json, random, resource, tempfile, threading, time
+from io import BytesIO
+from typing import Dict, List
+import numpy as np
+from benchmarks.mock_provider import serve, DEFAULT_PROFILE
+from benchmarks.synthetic import synthetic_pdf, synthetic_docx, synthetic_text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = {"text": "pages/1_Text_Compare.py", "multimodal": "pages/2_Multimodal_Compare.py", "rag": "pages/3_RAG_Compare.py"}
+
+def _env(mock_url: str, tmp: str, keep_limits: bool, response_cache: bool):
+    """Point the app at the mock before utils.config is imported (load_dotenv() keeps values already set)."""
+    os.environ.update(OPENROUTER_BASE_URL=f"{mock_url}/v1", GROQ_BASE_URL=f"{mock_url}/groq/v1",
+                      OPENROUTER_API_KEY="mock", GROQ_API_KEY="mock", JINA_API_KEY="", QDRANT_URL="",
+                      RUNS_DB_PATH=os.path.join(tmp, "runs.sqlite"), LEGACY_CSV=os.path.join(tmp, "none.csv"),
+                      RESPONSE_CACHE="1" if response_cache else "0", RESPONSE_CACHE_PATH=os.path.join(tmp, "responses.sqlite"))
+    if not keep_limits:  # measure the app, not the scheduler's provider quotas
+        for k in ("GROQ_RPM", "GROQ_TPM", "GROQ_CONCURRENCY", "OPENROUTER_RPM", "OPENROUTER_TPM", "OPENROUTER_CONCURRENCY"):
+            os.environ[k] = "0"
+
+# _session() overrides AppTest._run and builds the runner, pages manager and runtime the way
+# this Streamlit release does; benchmarks/requirements.txt pins it. Re-check _session() before widening.
+TESTED_STREAMLIT = ("1.65",)
+
+_shared: Dict = {}
+
+def _server():
+    """
+    What one `streamlit run` process shares between sessions: the runtime (media files, caches),
+    the compiled-script cache and the component registry. AppTest builds these per rerun and
+    resets process-wide state afterwards, which breaks sessions running at the same time.
+    """
+    if _shared: return _shared
+    from unittest.mock import MagicMock
+    from streamlit import config, logger
+    from streamlit.components.v2.component_manager import BidiComponentManager
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    config.set_option("global.appTest", True)  # parses the config, which sets the log level: lower it after
+    logger.set_log_level("error")  # a deprecation warning per widget per rerun otherwise
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.bidi_component_registry = BidiComponentManager()
+    runtime.bidi_component_registry.discover_and_register_components(start_file_watching=False)
+    Runtime._instance = runtime
+    _shared.update(runtime=runtime, scripts=ScriptCache())
+    return _shared
+
+def _session(script: str, timeout: float):
+    """An AppTest whose reruns run against the shared _server() state, so sessions can rerun concurrently."""
+    from streamlit.runtime.pages_manager import PagesManager
+    from streamlit.testing.v1 import AppTest
+    from streamlit.runtime.state import SCRIPT_RUN_WITHOUT_ERRORS_KEY
+    from streamlit.testing.v1.app_test import _query_params_from_query_string
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    class Session(AppTest):
+        def _run(self, widget_state=None, timeout=None):
+            pages = PagesManager(self._script_path, _server()["scripts"], setup_watcher=False)
+            runner = LocalScriptRunner(self._script_path, self._session_state, pages, args=self.args,
+                                       kwargs=self.kwargs, fragment_storage=self._fragment_storage)
+            self._register_uploaded_files(runner)
+            self._tree = runner.run(widget_state, self.query_params, timeout or self.default_timeout, self._page_hash)
+            self._tree._runner = self
+            new_pages = pages.get_pages()
+            if any("url_pathname" in p for p in new_pages.values()) or self.session_state[SCRIPT_RUN_WITHOUT_ERRORS_KEY]:
+                self._registered_pages = new_pages
+            self.query_params = _query_params_from_query_string(runner.event_data[-1]["client_state"].query_string)
+            return self
+
+    return Session(script, default_timeout=timeout)
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576
+    except OSError:  # not Linux: peak instead of current
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1048576 if sys.platform == "darwin" else 1024)
+
+def _cpu_s() -> float:
+    t = os.times()
+    return t.user + t.system
+
+def _png(seed: int) -> bytes:
+    from PIL import Image  # Streamlit's own dependency
+    rng = np.random.default_rng(seed)
+    out = BytesIO()
+    Image.fromarray(rng.integers(0, 255, (256, 256, 3), dtype=np.uint8)).save(out, "PNG")
+    return out.getvalue()
+
+def _button(at, label: str):
+    return next(b for b in at.button if b.label == label)
+
+class User:
+    """One browser session; every AppTest.run() is one rerun, timed and checked for exceptions."""
+    def __init__(self, i: int, a, record):
+        self.i, self.a, self.record = i, a, record
+        self.at = _session(os.path.join(ROOT, "app.py"), a.timeout)
+        self.rng = random.Random(i)
+
+    def rerun(self, step: str):
+        t0 = time.perf_counter()
+        try:
+            self.at.run()
+            error = "; ".join(str(e.value)[:200] for e in self.at.exception) or None
+        except Exception as e:  # timeouts surface here
+            error = f"{type(e).__name__}: {e}"[:200]
+        self.record(step, time.perf_counter() - t0, error)
+        if error and "Timeout" in error: raise RuntimeError(error)  # the session is gone; stop this user
+
+    def open(self, page: str):
+        self.at.switch_page(PAGES[page])
+        self.rerun(f"{page}:open")
+
+    def prompt(self, it: int) -> str:
+        return f"[user {self.i}, round {it}] " + synthetic_text(300, vocab=2000, seed=self.rng.randrange(1 << 30))
+
+    def text(self, it: int):
+        self.open("text")
+        self.at.text_area[0].input(self.prompt(it))
+        self.rerun("text:type")  # the browser commits the text (and enables the button) on blur
+        _button(self.at, "Run Comparison").click()
+        self.rerun("text:compare")
+        self.vote("vote_text_choice", "text:vote")
+
+    def multimodal(self, it: int):
+        self.open("multimodal")
+        self.at.radio[0].set_value("Image → Text")
+        self.at.file_uploader[0].set_value((f"u{self.i}.png", _png(self.i * 1000 + it), "image/png"))
+        self.rerun("image:upload")
+        self.at.text_input[0].input(self.prompt(it))
+        _button(self.at, "Run").click()
+        self.rerun("image:compare")
+        self.at.radio[0].set_value("Document → Text")
+        self.rerun("doc:switch")
+        self.at.file_uploader[0].set_value((f"u{self.i}.docx", synthetic_docx(200, seed=self.i * 1000 + it), None))
+        self.at.text_area[0].input(self.prompt(it))
+        self.rerun("doc:type")
+        _button(self.at, "Run on Document").click()
+        self.rerun("doc:compare")
+
+    def rag(self, it: int):
+        self.open("rag")
+        if it == 0 or not self.a.keep_doc:
+            seed = 0 if self.a.shared_doc else self.i * 1000 + it  # distinct PDFs: every session builds its own index
+            self.at.file_uploader[0].set_value((f"u{self.i}.pdf", synthetic_pdf(self.a.pdf_pages, seed=seed), "application/pdf"))
+            self.rerun("rag:upload")
+            _button(self.at, "Index").click()
+            self.rerun("rag:index")
+        next(t for t in self.at.text_input if t.label.startswith("Ask")).input(self.prompt(it)[:200])
+        self.rerun("rag:type")
+        _button(self.at, "Compare Answers").click()
+        self.rerun("rag:compare")
+        self.vote("vote_rag_choice", "rag:vote")
+
+    def vote(self, key: str, step: str):
+        radio = self.at.radio(key=key)
+        radio.set_value(self.rng.choice(radio.options))  # set and submit in one rerun (the form clears on submit)
+        _button(self.at, "Save Vote").click()
+        self.rerun(step)
+
+    def run(self):
+        self.rerun("home")
+        for it in range(self.a.iterations):
+            for page in self.a.pages:
+                try:
+                    getattr(self, page)(it)
+                except Exception as e:  # a widget the step needs is missing/disabled: the page misrendered
+                    self.record(f"{page}:failed", None, f"{type(e).__name__}: {e}"[:200])
+                    if isinstance(e, RuntimeError): return
+
+def _pcts(xs: List[float]) -> Dict[str, float]:
+    s = np.array(xs) * 1000
+    return {"n": len(xs), "p50": float(np.percentile(s, 50)), "p90": float(np.percentile(s, 90)),
+            "p99": float(np.percentile(s, 99)), "max": float(s.max())}
+
+def run_level(n: int, a) -> Dict:
+    samples: List = []
+    lock = threading.Lock()
+    def record(step, secs, error):
+        with lock: samples.append((step, secs, error))
+    gc.collect()
+    rss0, cpu0, t0 = _rss_mb(), _cpu_s(), time.perf_counter()
+    users = [User(i, a, record) for i in range(n)]
+    threads = [threading.Thread(target=u.run, name=f"user-{u.i}") for u in users]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall, cpu = time.perf_counter() - t0, _cpu_s() - cpu0
+    gc.collect()
+    rss1 = _rss_mb()  # sessions still alive: their state is what each extra user costs
+    errors = [(s, e) for s, _, e in samples if e]
+    timed = [(step, secs) for step, secs, _ in samples if secs is not None]
+    steps = {}
+    for step, secs in timed: steps.setdefault(step, []).append(secs)
+    del users
+    return {"sessions": n, "reruns": len(timed), "errors": len(errors), "first_errors": errors[:3],
+            "wall_s": wall, "reruns_per_s": len(timed) / wall,
+            "rerun_ms": _pcts([s for _, s in timed]), "steps": {k: _pcts(v) for k, v in steps.items()},
+            "rss_mb": rss1, "mb_per_session": (rss1 - rss0) / n,
+            "cpu_cores": cpu / wall, "cpu_saturation": cpu / wall / (os.cpu_count() or 1)}
+
+def main():
+    ap = argparse.ArgumentParser(description="Concurrent-session load test of the Streamlit pages against the mock provider")
+    ap.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8], help="concurrent users per level")
+    ap.add_argument("--iterations", type=int, default=1, help="rounds through the pages per user")
+    ap.add_argument("--pages", nargs="+", choices=list(PAGES), default=list(PAGES))
+    ap.add_argument("--pdf-pages", type=int, default=20, help="pages of each RAG document")
+    ap.add_argument("--shared-doc", action="store_true", help="every user indexes the same PDF (index cache hits)")
+    ap.add_argument("--keep-doc", action="store_true", help="index once per user, not every round")
+    ap.add_argument("--ttft", default="lognormal:0.3,0.4", help="mock time to first token (mock_provider syntax)")
+    ap.add_argument("--tps", default=DEFAULT_PROFILE["tps"], help="mock output tokens per second")
+    ap.add_argument("--output-tokens", default="uniform:40,200")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--keep-limits", action="store_true", help="apply the configured RPM/TPM/concurrency limits")
+    ap.add_argument("--response-cache", action="store_true", help="keep the response cache on (empty at start)")
+    ap.add_argument("--timeout", type=float, default=120, help="seconds one rerun may take")
+    ap.add_argument("--no-warmup", action="store_true", help="don't send one untimed user through first (imports, caches)")
+    ap.add_argument("--out", help="write the results as JSON")
+    a = ap.parse_args()
+    import streamlit
+    if not streamlit.__version__.startswith(tuple(v + "." for v in TESTED_STREAMLIT)):
+        sys.exit(f"load_test drives Streamlit {streamlit.__version__} through AppTest internals tested only on "
+                 f"{', '.join(TESTED_STREAMLIT)}.x; install that (pip install -r benchmarks/requirements.txt) or update _session()")
+    out = a.out and os.path.abspath(a.out)
+
+    mock = serve(profile={"ttft": a.ttft, "tps": a.tps, "output_tokens": a.output_tokens,
+                          "error_rate": a.error_rate, "rate_429": a.rate_429, "retry_after": 0.5}, seed=0)
+    tmp = tempfile.mkdtemp(prefix="loadtest-")
+    _env(mock.url, tmp, a.keep_limits, a.response_cache)
+    os.chdir(ROOT)  # page_link / switch_page paths are relative to the app
+    _server()
+
+    levels = []
+    print(f"mock provider {mock.url}; run store {tmp}")
+    if not a.no_warmup:
+        User(-1, a, lambda *r: None).run()
+    print(f"{'users':>5} {'reruns':>6} {'err':>4} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'reruns/s':>8} "
+          f"{'MB/user':>8} {'RSS MB':>7} {'CPU cores':>9} {'CPU %':>6}")
+    for n in a.sessions:
+        r = run_level(n, a)
+        levels.append(r)
+        q = r["rerun_ms"]
+        print(f"{n:>5} {r['reruns']:>6} {r['errors']:>4} {q['p50']:>8.0f} {q['p90']:>8.0f} {q['p99']:>8.0f} "
+              f"{r['reruns_per_s']:>8.2f} {r['mb_per_session']:>8.1f} {r['rss_mb']:>7.0f} {r['cpu_cores']:>9.2f} "
+              f"{r['cpu_saturation']:>6.0%}", flush=True)
+        for step, e in r["first_errors"]: print(f"      {step}: {e}")
+    print("\nper step, p50 / p99 ms:")
+    steps = list(dict.fromkeys(s for r in levels for s in r["steps"]))
+    print(f"{'step':>14} " + " ".join(f"{str(r['sessions']) + ' users':>15}" for r in levels))
+    for s in steps:
+        cells = [f"{r['steps'][s]['p50']:.0f} / {r['steps'][s]['p99']:.0f}" if s in r["steps"] else "" for r in levels]
+        print(f"{s:>14} " + " ".join(f"{c:>15}" for c in cells))
+    mock.shutdown()
+    if out:
+        with open(out, "w") as f:
+            json.dump({"args": vars(a), "cpus": os.cpu_count(), "mock": mock.stats, "levels": levels}, f, indent=2)
+        print(f"results: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# benchmarks/mock_provider.py — local OpenAI-compatible stand-in for OpenRouter and Groq
+#
+#   python -m benchmarks.mock_provider --port 8800 --ttft lognormal:0.4,0.5 --tps normal:120,25 --rate-429 0.02
+#   OPENROUTER_BASE_URL=http://127.0.0.1:8800/v1 GROQ_BASE_URL=http://127.0.0.1:8800/groq/v1 \
+#   OPENROUTER_API_KEY=x GROQ_API_KEY=x streamlit run app.py
+#
+# Serves POST .../chat/completions, streamed (SSE) and not, with made-up answers whose timing
+# follows the configured distributions: time to first token, tokens/s after it, answer length,
+# plus random 500s and 429s (with Retry-After). Paths containing "groq" answer the way Groq does
+# (usage under x_groq on the last chunk, usage.total_time); others like OpenRouter (a final
+# usage chunk when stream_options.include_usage is set, openai-processing-ms header).
+# A --config JSON file can override any profile field per model:
+#   {"default": {"ttft": "fixed:0.2"}, "models": {"llama-3.1-8b-instant": {"tps": "fixed:600"}}}
+import argparse, json, math, random, signal, sys, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Callable, Dict, Optional
+
+# Distributions are "kind:args" strings, in seconds (ttft) or per second (tps) or tokens
+DEFAULT_PROFILE = {"ttft": "lognormal:0.35,0.5", "tps": "normal:120,20", "output_tokens": "uniform:40,300",
+                   "error_rate": 0.0, "rate_429": 0.0, "retry_after": 1.0, "usage": True}
+WORDS = ("the model answer context result data value system report section table figure page "
+         "analysis revenue quarter growth summary detail example method evidence source claim").split()
+
+def distribution(spec: str) -> Callable[[random.Random], float]:
+    """fixed:x | uniform:lo,hi | normal:mean,sd | lognormal:median,sigma | exp:mean → sampler (never negative)."""
+    kind, _, args = str(spec).partition(":")
+    a = [float(x) for x in args.split(",")] if args else []
+    kinds = {"fixed": lambda r: a[0], "uniform": lambda r: r.uniform(a[0], a[1]),
+             "normal": lambda r: r.gauss(a[0], a[1]), "lognormal": lambda r: a[0] * math.exp(r.gauss(0, a[1])),
+             "exp": lambda r: r.expovariate(1 / a[0])}
+    if kind not in kinds:
+        raise ValueError(f"Unknown distribution {spec!r} (use one of {', '.join(kinds)})")
+    return lambda r: max(0.0, kinds[kind](r))
+
+class _Profile:
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = {**DEFAULT_PROFILE, **fields}
+        self.ttft, self.tps, self.output_tokens = (distribution(self.fields[k]) for k in ("ttft", "tps", "output_tokens"))
+
+    def __getattr__(self, key):
+        return self.fields[key]
+
+def _prompt_tokens(messages) -> int:
+    n = 0
+    for m in messages or []:
+        c = m.get("content")
+        parts = c if isinstance(c, list) else [{"type": "text", "text": c or ""}]
+        for p in parts:
+            n += len(p.get("text") or "") // 4 + 4 if p.get("type") == "text" else 765  # a high-detail image tile set
+    return max(1, n)
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, profile: Optional[Dict[str, Any]] = None, models: Optional[Dict[str, Dict]] = None,
+                 seed: Optional[int] = None, verbose: bool = False):
+        super().__init__(addr, _Handler)
+        self.default = _Profile(profile or {})
+        self.models = {m: _Profile({**self.default.fields, **f}) for m, f in (models or {}).items()}
+        self.seed, self.verbose = seed, verbose
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "streamed": 0, "errors": 0, "rate_limited": 0, "disconnects": 0}
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def profile(self, model: Optional[str]) -> _Profile:
+        return self.models.get(model or "", self.default)
+
+    def count(self, key: str) -> int:
+        with self.lock:
+            self.stats[key] += 1
+            return self.stats["requests"]
+
+    def rng(self, n: int) -> random.Random:
+        return random.Random(None if self.seed is None else self.seed * 1_000_003 + n)
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):  # client dropped a pooled keep-alive connection
+            self.count("disconnects")
+        else:
+            super().handle_error(request, client_address)
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real providers, so pooled connections get reused
+    server: MockServer
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose: super().log_message(fmt, *args)
+
+    def _json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        for k, v in {"Content-Type": "application/json", "Content-Length": str(len(data)), **(headers or {})}.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_HEAD(self):  # services/http_session.warm_up
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self._json(200, {"object": "list", "data": [{"id": m, "object": "model"} for m in self.server.models]})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": f"no route {self.path}", "type": "invalid_request_error"}})
+        n = self.server.count("requests")
+        rng, prof = self.server.rng(n), self.server.profile(body.get("model"))
+        roll = rng.random()
+        if roll < prof.rate_429:
+            self.server.count("rate_limited")
+            return self._json(429, {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error",
+                                              "code": "rate_limit_exceeded"}}, {"Retry-After": str(prof.retry_after)})
+        if roll < prof.rate_429 + prof.error_rate:
+            self.server.count("errors")
+            return self._json(500, {"error": {"message": "Internal error (mock)", "type": "server_error"}})
+        out = max(1, min(int(body.get("max_tokens") or 512), round(prof.output_tokens(rng))))
+        ttft, tps = prof.ttft(rng), max(prof.tps(rng), 1.0)
+        tokens = [(" " if i else "") + rng.choice(WORDS) for i in range(out)]
+        usage = {"prompt_tokens": _prompt_tokens(body.get("messages")), "completion_tokens": out}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        groq = "groq" in self.path
+        if groq: usage.update(queue_time=0.0, prompt_time=ttft, completion_time=out / tps, total_time=ttft + out / tps)
+        meta = {"id": f"chatcmpl-mock-{n}", "object": "chat.completion", "created": int(time.time()), "model": body.get("model")}
+        try:
+            if body.get("stream"):
+                self.server.count("streamed")
+                self._stream(meta, tokens, ttft, tps, usage if prof.usage else None, groq,
+                             bool((body.get("stream_options") or {}).get("include_usage")))
+            else:
+                time.sleep(ttft + out / tps)
+                msg = {"role": "assistant", "content": "".join(tokens)}
+                self._json(200, {**meta, "choices": [{"index": 0, "message": msg, "finish_reason": "stop"}],
+                                 **({"usage": usage} if prof.usage else {})},
+                           {} if groq else {"openai-processing-ms": str(round((ttft + out / tps) * 1000))})
+        except (BrokenPipeError, ConnectionResetError):  # client gave up (e.g. a hedge lost)
+            self.server.count("disconnects")
+            self.close_connection = True
+
+    def _stream(self, meta, tokens, ttft: float, tps: float, usage, groq: bool, include_usage: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        meta = {**meta, "object": "chat.completion.chunk"}
+        def event(payload):
+            data = b"data: " + (payload if isinstance(payload, bytes) else json.dumps(payload).encode()) + b"\n\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+        time.sleep(ttft)
+        per = max(1, round(tps * 0.01))  # above ~100 tok/s, send a few tokens per event instead of sleeping <10 ms
+        for i in range(0, len(tokens), per):
+            if i: time.sleep(per / tps)
+            event({**meta, "choices": [{"index": 0, "delta": {"content": "".join(tokens[i:i + per])}, "finish_reason": None}]})
+        last = {**meta, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        if groq and usage: last["x_groq"] = {"id": meta["id"], "usage": usage}
+        event(last)
+        if include_usage and usage and not groq: event({**meta, "choices": [], "usage": usage})
+        event(b"[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+def serve(host: str = "127.0.0.1", port: int = 0, profile: Optional[Dict[str, Any]] = None,
+          models: Optional[Dict[str, Dict]] = None, seed: Optional[int] = None, verbose: bool = False) -> MockServer:
+    """Start a MockServer on a daemon thread (port 0 = any free port, see .url); stop it with .shutdown()."""
+    srv = MockServer((host, port), profile, models, seed, verbose)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+def main():
+    ap = argparse.ArgumentParser(description="Local OpenAI-compatible mock of the chat providers")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8800)
+    ap.add_argument("--ttft", default=DEFAULT_PROFILE["ttft"], help="seconds to first token (whole latency adds tokens/tps)")
+    ap.add_argument("--tps", default=DEFAULT_PROFILE["tps"], help="output tokens per second")
+    ap.add_argument("--output-tokens", default=DEFAULT_PROFILE["output_tokens"], help="answer length, capped at max_tokens")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 500")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="share of requests answered with a 429")
+    ap.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    ap.add_argument("--no-usage", action="store_true", help="omit usage (clients fall back to estimates)")
+    ap.add_argument("--config", help='JSON {"default": {...}, "models": {model id: {...}}} overriding the flags')
+    ap.add_argument("--seed", type=int, help="reproducible timings and answers")
+    ap.add_argument("--verbose", action="store_true", help="log every request")
+    a = ap.parse_args()
+
+    profile = {"ttft": a.ttft, "tps": a.tps, "output_tokens": a.output_tokens, "error_rate": a.error_rate,
+               "rate_429": a.rate_429, "retry_after": a.retry_after, "usage": not a.no_usage}
+    models = {}
+    if a.config:
+        with open(a.config) as f: cfg = json.load(f)
+        profile.update(cfg.get("default") or {})
+        models = cfg.get("models") or {}
+    srv = MockServer((a.host, a.port), profile, models, a.seed, a.verbose)
+    print(f"mock provider on {srv.url}: OPENROUTER_BASE_URL={srv.url}/v1 GROQ_BASE_URL={srv.url}/groq/v1", flush=True)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # print the stats on kill too
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+        print(json.dumps(srv.stats), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# benchmarks/suite.py — offline micro-benchmarks for the retrieval, ingestion and tracking hot paths
+#
+#   python -m benchmarks.suite --out bench.json                      # 1k–100k chunks, 10–1000 pages
+#   python -m benchmarks.suite --sizes 1000000 --only vectordb       # one group at 1M chunks
+#   python -m benchmarks.suite --out new.json --baseline bench.json  # exits 1 on a regression
+#   python -m benchmarks.suite --compare bench.json new.json         # two saved runs, no benchmarking
+#
+# Inputs come from benchmarks/synthetic.py (seeded, so sizes are comparable run to run).
+# Results — p50/p95/min latency per operation, throughput, peak memory — go to --out as JSON.
+import os
+os.environ["QDRANT_URL"] = ""  # local VectorDB index only; load_dotenv() keeps values already set
+import argparse, sys, tempfile
+from io import BytesIO
+from benchmarks.harness import measure, save, load, compare, report
+from benchmarks.synthetic import (synthetic_chunks, synthetic_queries, synthetic_text, synthetic_pdf,
+                                  synthetic_docx, synthetic_csv, synthetic_answers, synthetic_runs)
+from retrieval.document_processor import chunk_text, extract_text_from_pdf, extract_text_from_docx, extract_text_from_csv
+from retrieval.hybrid_retriever import HybridRetriever
+from services.vectordb_qdrant import VectorDB
+from evaluators.metrics import readability, citation_count, answer_length, grounding_coverage
+from evaluators.evaluation import evaluate_batch
+from analytics.tracker import MetricsTracker
+
+STRIDE = 780  # chars per chunk at the pages' chunk_size=900, overlap=120
+
+def _readability_offline() -> bool:
+    """textstat downloads NLTK's cmudict on every call when it is missing; only time it when local."""
+    try:
+        import nltk
+        nltk.data.find("corpora/cmudict")
+        return True
+    except LookupError:
+        return False
+
+def _cycle(xs, f):
+    return lambda i: f(xs[i % len(xs)])
+
+def bench_chunk_text(a):
+    for n in a.sizes:
+        text = synthetic_text(n * STRIDE)
+        count = len(chunk_text(text, 900, 120, boundary="sentence"))
+        yield measure("chunk_text", n, lambda i: chunk_text(text, 900, 120, boundary="sentence"),
+                      items=count, repeat=a.repeat, unit="chunks", text_mb=len(text) / 1048576)
+
+def bench_retriever(a):
+    queries = synthetic_queries(a.queries)
+    for n in a.sizes:
+        chunks = list(synthetic_chunks(n))
+        yield measure("bm25_build", n, lambda i: HybridRetriever(chunks), items=n, repeat=a.repeat, unit="chunks")
+        r = HybridRetriever(chunks)
+        yield measure("bm25_search", n, _cycle(queries, lambda q: r.get_top_chunks(q, 6)), repeat=a.queries, unit="queries")
+        yield measure("bm25_search_batch", n, lambda i: r.get_top_chunks_batch(queries, 6),
+                      items=len(queries), repeat=a.repeat, unit="queries")
+        del r, chunks
+
+def bench_vectordb(a):
+    queries = synthetic_queries(a.queries)
+    for n in a.sizes:
+        chunks = list(synthetic_chunks(n))
+        def add(i):
+            vdb = VectorDB()
+            for lo in range(0, n, a.batch):
+                vdb.add_chunks(chunks[lo:lo + a.batch])
+            return vdb
+        yield measure("vector_add", n, add, items=n, repeat=a.repeat, unit="chunks", batch=a.batch)
+        vdb = add(0)
+        yield measure("vector_search", n, _cycle(queries, lambda q: vdb.search_with_scores(q, 6)),
+                      repeat=a.queries, unit="queries", index_mb=vdb.nbytes / 1048576)
+        del vdb, chunks
+
+def bench_extract(a):
+    for p in a.pages:
+        pdf = synthetic_pdf(p)
+        yield measure("pdf_extract", p, lambda i: extract_text_from_pdf(BytesIO(pdf)), items=p,
+                      repeat=a.repeat, unit="pages", file_mb=len(pdf) / 1048576)
+        docx = synthetic_docx(p * 20)  # ~20 paragraphs a page
+        yield measure("docx_extract", p, lambda i: extract_text_from_docx(docx), items=p * 20,
+                      repeat=a.repeat, unit="paragraphs", file_mb=len(docx) / 1048576)
+        csv = synthetic_csv(p * 50)  # ~50 rows a page
+        yield measure("csv_extract", p, lambda i: extract_text_from_csv(csv), items=p * 50,
+                      repeat=a.repeat, unit="rows", file_mb=len(csv) / 1048576)
+
+def bench_metrics(a):
+    timed = _readability_offline()
+    if not timed:
+        print("skipping readability/evaluate_batch: NLTK cmudict is not installed (textstat would download it)")
+    for n in a.answers:
+        answers, contexts = synthetic_answers(n)
+        def counts(i):
+            for ans, ctx in zip(answers, contexts):
+                citation_count(ans); answer_length(ans); grounding_coverage(ans, ctx)
+        yield measure("metrics", n, counts, items=n, repeat=a.repeat, unit="answers")
+        if timed:
+            yield measure("readability", n, lambda i: [readability(x) for x in answers], items=n,
+                          repeat=a.repeat, unit="answers")
+            # memoized readability: pass distinct answers each repeat so the cache doesn't hide it
+            yield measure("evaluate_batch", n, lambda i: evaluate_batch([f"{x} ({i})" for x in answers], contexts),
+                          items=n, repeat=a.repeat, unit="answers")
+
+def bench_tracker(a):
+    for n in a.runs:
+        with tempfile.TemporaryDirectory() as tmp:
+            tracker = MetricsTracker(os.path.join(tmp, "runs.sqlite"))
+            tracker.store.append_many(synthetic_runs(n))
+            run = {"mode": "text", "prompt": "benchmark"}
+            results = {m: {"answer": "benchmark answer", "latency": 1.0, "tokens_in": 100, "tokens_out": 200,
+                           "ttft": 0.3, "readability": 55.0, "words": 42} for m in ("openai", "llama")}
+            yield measure("tracker_log", n, lambda i: tracker.log(run, results), repeat=a.queries,
+                          unit="runs", history=n)
+            out = os.path.join(tmp, "runs.csv")
+            yield measure("save_csv", n, lambda i: tracker.save_csv(out), items=n, repeat=a.repeat, unit="runs")
+
+BENCHES = {"chunk_text": bench_chunk_text, "retriever": bench_retriever, "vectordb": bench_vectordb,
+           "extract": bench_extract, "metrics": bench_metrics, "tracker": bench_tracker}
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline micro-benchmarks for retrieval, ingestion and tracking")
+    ap.add_argument("--only", nargs="+", choices=list(BENCHES), help="benchmark groups to run (default: all)")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000], help="corpus sizes in chunks")
+    ap.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000], help="document sizes in pages")
+    ap.add_argument("--answers", type=int, nargs="+", default=[1000, 10_000], help="answers scored per run")
+    ap.add_argument("--runs", type=int, nargs="+", default=[1000, 10_000], help="runs already in the tracker's store")
+    ap.add_argument("--repeat", type=int, default=5, help="timed passes per benchmark")
+    ap.add_argument("--queries", type=int, default=50, help="single-query/log calls timed per benchmark")
+    ap.add_argument("--batch", type=int, default=1000, help="chunks per add_chunks call")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", help="results JSON to compare against; exits 1 on a regression")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p50 latency increase")
+    ap.add_argument("--mem-tolerance", type=float, default=0.1, help="allowed relative peak memory increase")
+    ap.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two results files and exit")
+    a = ap.parse_args()
+
+    if a.compare:
+        base, cur = load(a.compare[0]), load(a.compare[1])
+        sys.exit(1 if report(compare(base, cur, a.tolerance, a.mem_tolerance), base["meta"], cur["meta"]) else 0)
+
+    results = []
+    print(f"{'bench':>18} {'size':>9} {'p50 ms':>10} {'p95 ms':>10} {'throughput':>14} {'peak MB':>9}")
+    for name in a.only or BENCHES:
+        for r in BENCHES[name](a):
+            results.append(r)
+            print(f"{r['bench']:>18} {r['size']:>9} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} "
+                  f"{r['throughput'] or 0:>10,.0f} {r['unit'][:3]}/s {r['peak_mb']:>9.1f}", flush=True)
+    save(a.out, results, {k: v for k, v in vars(a).items() if k not in ("out", "baseline", "compare")})
+    print(f"results: {a.out}")
+    if a.baseline:
+        base, cur = load(a.baseline), load(a.out)
+        sys.exit(1 if report(compare(base, cur, a.tolerance, a.mem_tolerance), base["meta"], cur["meta"]) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/synthetic.py — deterministic offline inputs for the benchmarks
+#
+# Zipf-distributed vocabularies so term statistics look like real text; every generator is
+# seeded, so a size always yields the same input and results stay comparable across runs.
+from io import BytesIO
+from typing import Dict, Iterator, List, Tuple
+import numpy as np, pandas as pd
+from docx import Document
+
+def _lexicon(vocab: int, prefix: str = "t") -> np.ndarray:
+    return np.array([f"{prefix}{i:05d}" for i in range(vocab)])
+
+def _ranks(rng, shape, vocab: int) -> np.ndarray:
+    return np.minimum(rng.zipf(1.2, size=shape), vocab) - 1
+
+def synthetic_chunks(n: int, words_per_chunk: int = 60, vocab: int = 50_000, seed: int = 0) -> Iterator[Dict]:
+    rng = np.random.default_rng(seed)
+    lexicon = _lexicon(vocab)
+    for lo in range(0, n, 10_000):  # generate in slices so 1M chunks don't need GBs up front
+        ranks = _ranks(rng, (min(10_000, n - lo), words_per_chunk), vocab)
+        for j, row in enumerate(ranks):
+            yield {"text": " ".join(lexicon[row]), "metadata": {"i": lo + j}}
+
+def synthetic_queries(n: int, words: int = 12, seed: int = 1) -> List[str]:
+    return [c["text"][:80] for c in synthetic_chunks(n, words, seed=seed)]
+
+def synthetic_text(chars: int, vocab: int = 50_000, seed: int = 0) -> str:
+    """~`chars` characters of prose: sentences of 6–24 words, a paragraph break every ~6 sentences."""
+    rng = np.random.default_rng(seed)
+    lexicon = _lexicon(vocab)
+    n = max(1, chars // 7)  # "t01234 " is 7 chars
+    words = lexicon[_ranks(rng, n, vocab)]
+    ends = np.cumsum(rng.integers(6, 25, size=n // 6 + 1))
+    seps = np.full(n, " ", dtype=object)
+    seps[ends[ends < n]] = ". "
+    seps[ends[ends < n][5::6]] = ".\n\n"
+    return "".join(w + s for w, s in zip(words.tolist(), seps.tolist()))
+
+def synthetic_pdf(pages: int, lines: int = 50, words: int = 11, seed: int = 0) -> bytes:
+    """Minimal valid PDF: one Helvetica font, one uncompressed text stream per page."""
+    rng = np.random.default_rng(seed)
+    lexicon = np.array([f"w{i:04d}" for i in range(5000)])
+    objs = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+            3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for p in range(pages):
+        page, content = 4 + 2 * p, 5 + 2 * p
+        body = [b"BT /F1 10 Tf 13 TL 50 760 Td"]
+        for row in rng.integers(0, len(lexicon), size=(lines, words)):
+            body.append(b"(" + " ".join(lexicon[row]).encode("ascii") + b") Tj T*")
+        stream = b"\n".join(body + [b"ET"])
+        objs[content] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        objs[page] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                      b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content)
+        kids.append(b"%d 0 R" % page)
+    objs[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+    out, offsets = BytesIO(), {}
+    out.write(b"%PDF-1.4\n")
+    for num in sorted(objs):
+        offsets[num] = out.tell()
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (num, objs[num]))
+    xref, size = out.tell(), max(objs) + 1
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+    for num in range(1, size):
+        out.write(b"%010d 00000 n \n" % offsets[num])
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref))
+    return out.getvalue()
+
+def synthetic_docx(paragraphs: int, words: int = 40, seed: int = 0) -> bytes:
+    doc = Document()
+    for c in synthetic_chunks(paragraphs, words, vocab=5000, seed=seed):
+        doc.add_paragraph(c["text"])
+    out = BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+def synthetic_csv(rows: int, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    lexicon = _lexicon(5000, "c")
+    df = pd.DataFrame({"id": np.arange(rows), "name": lexicon[_ranks(rng, rows, 5000)],
+                       "value": rng.normal(100, 15, rows).round(3), "count": rng.integers(0, 1000, rows),
+                       "note": [c["text"] for c in synthetic_chunks(rows, 8, vocab=5000, seed=seed)]})
+    return df.to_csv(index=False).encode()
+
+def synthetic_answers(n: int, contexts: int = 20, seed: int = 0) -> Tuple[List[str], List[str]]:
+    """(answers, contexts[i % contexts]) in English-like sentences with [n] citations and the odd URL."""
+    rng = np.random.default_rng(seed)
+    ctx = [" ".join(c["text"] for c in synthetic_chunks(6, 60, vocab=5000, seed=seed + 1 + i)) for i in range(contexts)]
+    out = []
+    for i, c in enumerate(synthetic_chunks(n, 80, vocab=5000, seed=seed)):
+        words = c["text"].split()
+        cites = " ".join(f"[{k}]" for k in rng.integers(1, 7, size=int(rng.integers(0, 4))))
+        url = " See https://example.com/doc%d." % i if i % 10 == 0 else ""
+        out.append(". ".join(" ".join(words[j:j + 16]).capitalize() for j in range(0, len(words), 16)) + ". " + cites + url)
+    return out, [ctx[i % contexts] for i in range(n)]
+
+def synthetic_runs(n: int, models: Tuple[str, ...] = ("openai", "llama"), seed: int = 0) -> Iterator[Dict]:
+    """Wide tracker rows ({model}_{field}) as MetricsTracker/RunStore.append_many take them."""
+    rng = np.random.default_rng(seed)
+    modes = ("text", "image", "doc", "rag")
+    for i in range(n):
+        row = {"run_id": i + 1, "timestamp": f"2025-01-{1 + i % 28:02d} 12:{i % 60:02d}:00",
+               "mode": modes[i % 4], "prompt": f"prompt {i}", "preference": ("openai", "llama", "Tie")[i % 3]}
+        for m in models:
+            row.update({f"{m}_answer": f"answer {i} from {m}", f"{m}_latency": float(rng.lognormal(0, .5)),
+                        f"{m}_tokens_in": int(rng.integers(20, 2000)), f"{m}_tokens_out": int(rng.integers(20, 800)),
+                        f"{m}_ttft": float(rng.lognormal(-1, .5)), f"{m}_readability": float(rng.uniform(20, 80)),
+                        f"{m}_words": int(rng.integers(20, 600))})
+        yield row
@@ -0,0 +1,68 @@
+# benchmarks/vectordb_local.py — add/search throughput of VectorDB's local TF-IDF index
+#
+#   python -m benchmarks.vectordb_local --sizes 10000 100000 1000000 --batch 1000
+#
+# Runs fully offline on a synthetic Zipf-distributed corpus. With --refit-upto N the
+# previous behaviour (fit_transform over the whole corpus after every batch) is timed
+# too, for sizes ≤ N, so the two can be compared.
+import argparse, time
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from services.vectordb_qdrant import VectorDB
+from benchmarks.synthetic import synthetic_chunks, synthetic_queries
+
+def batched(it, size):
+    buf = []
+    for x in it:
+        buf.append(x)
+        if len(buf) == size:
+            yield buf; buf = []
+    if buf: yield buf
+
+def bench_incremental(n, batch, words, queries):
+    vdb = VectorDB()
+    assert not vdb.hosted, "unset QDRANT_URL/JINA_API_KEY to benchmark the local index"
+    t0 = time.perf_counter()
+    for b in batched(synthetic_chunks(n, words), batch):
+        vdb.add_chunks(b)
+    add_s = time.perf_counter() - t0
+    vdb.search_with_scores(queries[0], k=6)  # first search pays the lazy IDF refresh
+    t1 = time.perf_counter()
+    for q in queries:
+        vdb.search_with_scores(q, k=6)
+    search_s = (time.perf_counter() - t1) / len(queries)
+    return add_s, search_s, vdb.nbytes
+
+def bench_refit(n, batch, words, queries):
+    vec = TfidfVectorizer(ngram_range=(1,2), strip_accents="unicode", lowercase=True)
+    docs, t0 = [], time.perf_counter()
+    for b in batched(synthetic_chunks(n, words), batch):
+        docs.extend(c["text"] for c in b)
+        mat = vec.fit_transform(docs)
+    add_s = time.perf_counter() - t0
+    t1 = time.perf_counter()
+    for q in queries:
+        cosine_similarity(vec.transform([q]), mat)[0].argsort()[::-1][:6]
+    return add_s, (time.perf_counter() - t1) / len(queries)
+
+def main():
+    ap = argparse.ArgumentParser(description="Add/search throughput of VectorDB's local TF-IDF index")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--batch", type=int, default=1000, help="chunks per add_chunks call")
+    ap.add_argument("--words", type=int, default=60, help="words per synthetic chunk")
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--refit-upto", type=int, default=20_000)
+    a = ap.parse_args()
+
+    queries = synthetic_queries(a.queries)
+    print(f"{'chunks':>9} {'impl':>11} {'add chunks/s':>13} {'search ms':>10} {'index MB':>9}")
+    for n in a.sizes:
+        add_s, search_s, nbytes = bench_incremental(n, a.batch, a.words, queries)
+        print(f"{n:>9} {'incremental':>11} {n/add_s:>13,.0f} {search_s*1000:>10.2f} {nbytes/1048576:>9.1f}")
+        if n <= a.refit_upto:
+            add_s, search_s = bench_refit(n, a.batch, a.words, queries)
+            print(f"{n:>9} {'full refit':>11} {n/add_s:>13,.0f} {search_s*1000:>10.2f} {'':>9}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 # components/ui.py — minimal light UI helpers (no dark theme, no heavy CSS)
 import streamlit as st
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional
 
 LIGHT_CSS = """
 <style>
@@ -55,15 +55,12 @@ def page_header(title: str, subtitle: Optional[str] = None, kicker: Optional[str
             st.markdown(f'<div class="subtle">{subtitle}</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
-def metric_cards(metrics_left: Dict[str,str], metrics_right: Dict[str,str], left_title="Model A", right_title="Model B"):
-    """Two-column metric stacks with simple cards."""
-    c1, c2 = st.columns(2)
-    with c1:
-        st.markdown(f"**{left_title}**")
-        _metric_stack(metrics_left)
-    with c2:
-        st.markdown(f"**{right_title}**")
-        _metric_stack(metrics_right)
+def metric_cards(cards: Dict[str, Dict[str, str]]):
+    """One metric stack per model, side by side ({column title: {metric: value}})."""
+    for col, (title, metrics) in zip(st.columns(len(cards)), cards.items()):
+        with col:
+            st.markdown(f"**{title}**")
+            _metric_stack(metrics)
 
 def _metric_stack(m: Dict[str,str]):
     cols = st.columns(3)
@@ -78,16 +75,56 @@ def _metric_stack(m: Dict[str,str]):
                 st.markdown(f'<div class="v">{v}</div>', unsafe_allow_html=True)
                 st.markdown('</div>', unsafe_allow_html=True)
 
+def fmt(v, spec: str = ".2f") -> str:
+    """Format an optional number for a metric card ("—" when missing/NaN)."""
+    return "—" if v is None or v != v else format(v, spec)
+
 def note(text: str):
     st.markdown(f'<div class="badge">{text}</div>', unsafe_allow_html=True)
 
 def section_divider():
     st.markdown('<hr class="clean">', unsafe_allow_html=True)
 
-def answer(title: str, body: str):
-    """Simple answer card—kept generic to avoid name clashes."""
+def vote_radio(label: str, key: str, choices: List[str]) -> Optional[str]:
+    """Preference among `choices` (model labels) or "Tie"; selectbox fallback for older Streamlit."""
+    options = list(choices) + ["Tie"]
+    try:
+        return st.radio(label, options, horizontal=True, index=None, key=key)
+    except TypeError:
+        val = st.selectbox(label, ["(choose…)"] + options, key=key, index=0)
+        return None if val == "(choose…)" else val
+
+def cached_note(names: List[str]):
+    if names:
+        note("Served from the response cache (latency excluded from Analytics): " + ", ".join(names))
+
+def hedge_note(winners: Dict[str, str]):
+    """{model name: "primary"|"hedge"} for calls that went past their p95 and were duplicated."""
+    if winners:
+        note("Hedged past p95: " + ", ".join(f"{n} ({'duplicate' if w == 'hedge' else 'original'} answered first)"
+                                             for n, w in winners.items()))
+
+def image_note(r: Dict):
+    """Payload and prep time of a vision call's images (services/image_prep.py)."""
+    if r.get("image_bytes") is not None:
+        sent, saved = r["image_bytes"], r.get("image_bytes_saved") or 0
+        note(f"Image payload {(sent + saved) / 1048576:.2f} → {sent / 1048576:.2f} MB "
+             f"({saved / max(sent + saved, 1):.0%} smaller), prepared in {r.get('image_prep_s') or 0:.2f} s")
+
+def answer(title: str, body: str = ""):
+    """Simple answer card—kept generic to avoid name clashes.
+    Returns the body slot; call `.write(text)` on it to stream text in place."""
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown(f"**{title}**")
-        st.write(body)
+        slot = st.empty()
+        if body: slot.write(body)
         st.markdown('</div>', unsafe_allow_html=True)
+    return slot
+
+def answer_grid(titles: Dict[str, str], bodies: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """answer() cards side by side, one per model key; returns {key: body slot}."""
+    slots = {}
+    for col, (key, title) in zip(st.columns(len(titles)), titles.items()):
+        with col: slots[key] = answer(title, (bodies or {}).get(key, ""))
+    return slots
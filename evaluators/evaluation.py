@@ -0,0 +1,95 @@
+# evaluators/evaluation.py — answer metrics computed once per answer, stored with the run
+#
+#   python -m evaluators.evaluation --backfill          # score stored runs that lack metrics
+#   python -m evaluators.evaluation --backfill --force  # re-score everything (e.g. after a metric change)
+import argparse, re
+from functools import lru_cache
+from typing import Dict, Optional, Sequence
+import numpy as np, pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+from evaluators.metrics import readability, citation_count, answer_length
+
+# Same patterns as evaluators/metrics.py; keep them in step
+CITATION_RE = r"\[\d+\]|\bhttps?://\S+"
+WORD_RE = r"\w+"
+TERM_RE = r"[a-zA-Z]{3,}"
+_TERM = re.compile(TERM_RE)
+
+_readability = lru_cache(maxsize=4096)(readability)  # textstat is the slow part; answers repeat across models/backfills
+
+# Stored in each model's result of a run (analytics/store.py)
+METRICS = ("readability", "citations", "words", "coverage")
+
+@lru_cache(maxsize=128)
+def context_terms(context: str) -> frozenset:
+    """Grounding vocabulary of a RAG context, tokenized once per distinct context."""
+    return frozenset(_TERM.findall(context.lower()))
+
+def coverage(answer: str, context: str) -> float:
+    """grounding_coverage() against the cached context set."""
+    a, c = set(_TERM.findall(answer.lower())), context_terms(context)
+    if not a or not c: return 0.0
+    return len(a & c) / len(a | c)
+
+@lru_cache(maxsize=1024)
+def evaluate(answer: str, context: Optional[str] = None) -> Dict[str, float]:
+    """All metrics for one answer; coverage only when there is a context."""
+    out = {"readability": _readability(answer), "citations": citation_count(answer), "words": answer_length(answer)}
+    if context is not None: out["coverage"] = coverage(answer, context)
+    return out
+
+def evaluate_batch(answers: Sequence[str], contexts: Optional[Sequence[Optional[str]]] = None) -> pd.DataFrame:
+    """
+    The same metrics for many answers at once: counts are vectorized regexes, coverage is
+    one binary term matrix for answers and distinct contexts (Jaccard from sparse dot
+    products). Readability stays per answer (textstat), memoized for repeated answers.
+    """
+    s = pd.Series([a or "" for a in answers], dtype=object)
+    out = pd.DataFrame({"readability": [_readability(a) for a in s] if len(s) else [],
+                        "citations": s.str.count(CITATION_RE).astype(int),
+                        "words": s.str.count(WORD_RE).astype(int)})
+    if contexts is None: return out
+    ctx = [c if isinstance(c, str) else None for c in contexts]
+    cov = np.array([np.nan if c is None else 0.0 for c in ctx])
+    uniq = {c: i for i, c in enumerate(dict.fromkeys(c for c in ctx if c))}  # each context tokenized once
+    idx = np.array([i for i, c in enumerate(ctx) if c], dtype=int)
+    if len(idx):
+        vec = CountVectorizer(token_pattern=TERM_RE, lowercase=True, binary=True)
+        vec.fit(list(uniq) + list(s.iloc[idx]))
+        A, C = vec.transform(s.iloc[idx]), vec.transform(list(uniq))[[uniq[ctx[i]] for i in idx]]
+        inter = np.asarray(A.multiply(C).sum(axis=1)).ravel()
+        na, nc = np.asarray(A.sum(axis=1)).ravel(), np.asarray(C.sum(axis=1)).ravel()
+        cov[idx] = np.where((na > 0) & (nc > 0), inter / np.maximum(na + nc - inter, 1), 0.0)
+    out["coverage"] = cov
+    return out
+
+def backfill(tracker, force: bool = False) -> int:
+    """Score stored answers that have no metrics yet (all of them with force); returns runs updated."""
+    answers, contexts, where = [], [], []
+    for run, results in tracker.store.entries():
+        for model, r in results.items():
+            if not isinstance(r.get("answer"), str): continue
+            if not force and r.get("words") is not None: continue
+            ctx = r.get("context")
+            answers.append(r["answer"]); contexts.append(ctx if isinstance(ctx, str) else None)
+            where.append((run["run_id"], model))
+    if not answers: return 0
+    scores = evaluate_batch(answers, contexts)
+    updates: Dict[int, Dict[str, Dict[str, float]]] = {}
+    for (rid, model), rec in zip(where, scores.to_dict(orient="records")):
+        updates.setdefault(rid, {})[model] = {k: v for k, v in rec.items() if not (k == "coverage" and pd.isna(v))}
+    return tracker.store.update_many(updates)
+
+def main():
+    ap = argparse.ArgumentParser(description="Answer metrics over stored runs")
+    ap.add_argument("--backfill", action="store_true", help="score stored runs that lack metrics")
+    ap.add_argument("--force", action="store_true", help="re-score every stored answer")
+    ap.add_argument("--db", default=None, help="run store (default RUNS_DB_PATH)")
+    a = ap.parse_args()
+    if a.backfill:
+        from analytics.tracker import MetricsTracker
+        tracker = MetricsTracker(a.db) if a.db else MetricsTracker()
+        print(f"updated {backfill(tracker, force=a.force)} runs")
+
+if __name__ == "__main__":
+    main()
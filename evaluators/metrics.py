@@ -1,8 +1,9 @@
 import re, textstat
-from typing import Dict
+from typing import Dict, Optional
+from evaluators.tokenizer import count_tokens
 
-def token_estimate(text: str) -> int:
-    return max(1, int(len(text)/4))  # ~4 chars/token heuristic
+def token_estimate(text: str, model: Optional[str] = None) -> int:
+    return count_tokens(text, model)  # model's BPE when available, else ~4 chars/token
 
 def cost_estimate(model_key_in: str, model_key_out: str, in_tokens: int, out_tokens: int, COST_MAP: Dict[str,float]) -> float:
     ci = COST_MAP.get(f"{model_key_in}:input", 0.0)
@@ -0,0 +1,110 @@
+# evaluators/tokenizer.py — local BPE token counting/truncation per model family
+#
+#   python -m evaluators.tokenizer --fetch   # setup step: download the vocabularies into TOKENIZER_CACHE_DIR
+#
+# Uses tiktoken and the vocabularies in the cache; nothing is downloaded while serving a
+# request (only --fetch goes online). A missing vocabulary is an incomplete setup: every
+# function still answers with the ~4 chars/token estimate so requests don't fail, but it is
+# reported as an error once on stderr and on the Settings page.
+import argparse, hashlib, os, sys
+from functools import lru_cache
+from typing import Iterable, List, Optional
+from utils.config import TOKENIZER_CACHE_DIR
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4  # fallback only
+# Model id substring → encoding. Llama 3's 128k BPE extends cl100k, so cl100k counts are a
+# close (slightly high, i.e. safe for clipping) approximation for the Groq models.
+ENCODINGS = (("gpt-4o", "o200k_base"), ("openai/", "o200k_base"), ("llama", "cl100k_base"))
+DEFAULT_ENCODING = "cl100k_base"
+BLOB_URL = "https://openaipublic.blob.core.windows.net/encodings/{}.tiktoken"
+
+def _cache_dir() -> str:
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", TOKENIZER_CACHE_DIR)
+    return os.environ["TIKTOKEN_CACHE_DIR"]
+
+def cached(name: str) -> bool:
+    """Whether the vocabulary is on disk where tiktoken looks (file named by the SHA-1 of its URL)."""
+    return os.path.exists(os.path.join(_cache_dir(), hashlib.sha1(BLOB_URL.format(name).encode()).hexdigest()))
+
+def _load(name: str, download: bool = False):
+    if tiktoken is None: return None
+    if not (download or cached(name)): return None  # never fetch inside a request
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception:  # unreadable cache / no network for --fetch
+        return None
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+    enc = _load(name)
+    if enc is None:
+        why = "tiktoken is not installed" if tiktoken is None else f"{name} is not in {_cache_dir()}"
+        print(f"tokenizer: setup incomplete, {why}; token counts are ~{CHARS_PER_TOKEN} chars/token "
+              "estimates until you run: python -m evaluators.tokenizer --fetch", file=sys.stderr)
+    return enc
+
+def encoding_for(model: Optional[str] = None):
+    m = (model or "").lower()
+    return _encoding(next((enc for key, enc in ENCODINGS if key in m), DEFAULT_ENCODING))
+
+def is_exact(model: Optional[str] = None) -> bool:
+    return encoding_for(model) is not None
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    if not text: return 0
+    enc = encoding_for(model)
+    if enc is None: return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(enc.encode_ordinary(text))  # special-token strings count as plain text
+
+def count_tokens_batch(texts: Iterable[str], model: Optional[str] = None) -> List[int]:
+    texts = list(texts)
+    enc = encoding_for(model)
+    if enc is None: return [count_tokens(t) for t in texts]
+    return [len(t) for t in enc.encode_ordinary_batch(texts)]  # encodes on tiktoken's thread pool
+
+def token_offset(text: str, start: int, n_tokens: int, model: Optional[str] = None) -> int:
+    """Index in `text` just past the first `n_tokens` tokens from `start` (clamped to len(text))."""
+    if n_tokens <= 0: return start
+    enc = encoding_for(model)
+    if enc is None: return min(len(text), start + n_tokens * CHARS_PER_TOKEN)
+    span = n_tokens * 8 + 16  # only encode a window; widened in the rare case it is too short
+    while True:
+        end = min(len(text), start + span)
+        window = text[start:end]
+        toks = enc.encode_ordinary(window)
+        if len(toks) > n_tokens:
+            # bytes of the first n tokens (a window cut can only change the last one), back to
+            # characters; a character split across token n is left out
+            nbytes = sum(len(b) for b in enc.decode_tokens_bytes(toks[:n_tokens]))
+            return start + len(window.encode("utf-8")[:nbytes].decode("utf-8", errors="ignore"))
+        if end == len(text): return end
+        span *= 2
+
+def truncate_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Longest prefix of `text` that is at most `max_tokens` tokens."""
+    return text[:token_offset(text, 0, max_tokens, model)]
+
+def main():
+    ap = argparse.ArgumentParser(description="Token counting with the models' BPE vocabularies")
+    ap.add_argument("--fetch", "--prefetch", dest="fetch", action="store_true",
+                    help=f"download vocabularies into {TOKENIZER_CACHE_DIR} (setup step)")
+    ap.add_argument("--model", default=None)
+    ap.add_argument("text", nargs="*")
+    a = ap.parse_args()
+    if a.fetch:
+        if tiktoken is None: sys.exit("tiktoken is not installed (pip install -r requirements.txt)")
+        missing = [name for name in sorted({enc for _, enc in ENCODINGS} | {DEFAULT_ENCODING})
+                   if _load(name, download=True) is None]
+        if missing: sys.exit(f"could not fetch {', '.join(missing)} (offline? copy a fetched {_cache_dir()} instead)")
+        print("vocabularies in", _cache_dir())
+    if a.text:
+        text = " ".join(a.text)
+        print(count_tokens(text, a.model), "tokens", "" if is_exact(a.model) else "(estimate)")
+
+if __name__ == "__main__":
+    main()
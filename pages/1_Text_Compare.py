@@ -1,22 +1,9 @@
 import streamlit as st
-from components.ui import page_header, metric_cards, section_divider, answer
-from services.openrouter import OpenRouterClient
-from services.groq_llama import GroqClient
-from evaluators.metrics import token_estimate, cost_estimate, readability, citation_count, answer_length
-from analytics.tracker import MetricsTracker
-from utils.config import COST_MAP
-
-# ---- helper: radio fallback for older Streamlit
-def safe_vote_radio(label: str, key: str):
-    try:
-        return st.radio(label,
-                        ["OpenAI (GPT-4o-mini)", "Llama-3.1 (Groq)", "Tie"],
-                        horizontal=True, index=None, key=key)
-    except TypeError:
-        val = st.selectbox(label,
-                           ["(choose…)", "OpenAI (GPT-4o-mini)", "Llama-3.1 (Groq)", "Tie"],
-                           key=key, index=0)
-        return None if val == "(choose…)" else val
+from components.ui import page_header, metric_cards, section_divider, answer_grid, fmt, cached_note, hedge_note, vote_radio
+from services import registry
+from services.dispatch import fan_out
+from analytics.tracker import MetricsTracker, result_fields
+from utils.config import RUN_DEADLINE_S
 
 # Ensure tracker
 if "tracker" not in st.session_state:
@@ -34,70 +21,55 @@ with st.expander("Prompt", expanded=True):
 with st.expander("Advanced"):
     system = st.text_area("System prompt", value="You are a helpful, concise assistant.")
     max_tokens = st.slider("Max tokens", 128, 2048, 512, 64)
+    stream = st.checkbox("Stream tokens", value=True, help="Show answers as they are generated and record TTFT / tokens per second.")
+    bypass = st.checkbox("Bypass cache", value=False, help="Always call the providers, even if this exact request was answered before.")
 
 do_run = st.button("Run Comparison", type="primary", use_container_width=True, disabled=not prompt.strip())
 section_divider()
 
 # When user clicks run, compute and store results in session_state, then render below
 if do_run:
-    orc, grq = OpenRouterClient(), GroqClient()
+    models, clients = registry.models(), registry.clients(hedge=st.session_state.tracker.hedge_delays("text"))
+    live = st.empty()  # streamed answers; replaced by the full render below
+    with live.container():
+        slots = answer_grid({m["key"]: m["short"] for m in models})
     with st.spinner("Calling models..."):
-        ai_text, ai_usage, ai_lat = orc.chat_text(prompt, system=system, max_tokens=max_tokens)
-        ll_text, ll_usage, ll_lat = grq.chat_text(prompt, system=system, max_tokens=max_tokens)
-
-    ai_in = ai_usage.get("prompt_tokens", token_estimate(prompt+system))
-    ai_out = ai_usage.get("completion_tokens", token_estimate(ai_text))
-    ll_in = ll_usage.get("prompt_tokens", token_estimate(prompt+system))
-    ll_out = ll_usage.get("completion_tokens", token_estimate(ll_text))
-    ai_cost = cost_estimate("openai/gpt-4o-mini","openai/gpt-4o-mini",ai_in,ai_out,COST_MAP)
-    ll_cost = cost_estimate("llama-3.1-8b-instant","llama-3.1-8b-instant",ll_in,ll_out,COST_MAP)
+        # every model at once; wall time is the slowest one
+        res = fan_out({m["key"]: (lambda cb, c=clients[m["key"]]: c.chat_text(
+            prompt, system=system, max_tokens=max_tokens, stream=stream, on_token=cb, use_cache=not bypass))
+            for m in models}, sinks={k: slot.write for k, slot in slots.items()}, deadline=RUN_DEADLINE_S)
+    live.empty()
+    for m in models:
+        if res[m["key"]]["error"]: st.error(f"{m['short']}: {res[m['key']]['error']}")
+    results = {m["key"]: result_fields(m["model"], res[m["key"]], prompt + system) for m in models}
 
     # log now and persist
-    run_id = st.session_state.tracker.log({
-        "mode":"text","prompt":prompt,
-        "openai_answer":ai_text,"llama_answer":ll_text,
-        "openai_latency":ai_lat,"llama_latency":ll_lat,
-        "openai_tokens_in":ai_in,"openai_tokens_out":ai_out,
-        "llama_tokens_in":ll_in,"llama_tokens_out":ll_out,
-        "openai_cost":ai_cost,"llama_cost":ll_cost,
-        "preference": None
-    })
-    st.session_state.tracker.save_csv()
+    run_id = st.session_state.tracker.log({"mode": "text", "prompt": prompt, "preference": None}, results)
 
     # stash everything to render consistently after rerun
-    st.session_state.text_last = dict(
-        run_id=run_id, prompt=prompt,
-        ai_text=ai_text, ll_text=ll_text,
-        ai_lat=ai_lat, ll_lat=ll_lat,
-        ai_in=ai_in, ai_out=ai_out, ll_in=ll_in, ll_out=ll_out,
-        ai_cost=ai_cost, ll_cost=ll_cost
-    )
+    st.session_state.text_last = dict(run_id=run_id, prompt=prompt, results=results)
 
 # Always render from state if available
 if st.session_state.text_last:
     S = st.session_state.text_last
-    metric_cards(
-        {"Latency (s)": f"{S['ai_lat']:.2f}", "Tokens (in/out)": f"{S['ai_in']}/{S['ai_out']}",
-         "Cost ($)": f"{S['ai_cost']:.4f}", "Readability": f"{readability(S['ai_text']):.1f}",
-         "Length": f"{answer_length(S['ai_text'])}", "Citations": f"{citation_count(S['ai_text'])}"},
-        {"Latency (s)": f"{S['ll_lat']:.2f}", "Tokens (in/out)": f"{S['ll_in']}/{S['ll_out']}",
-         "Cost ($)": f"{S['ll_cost']:.4f}", "Readability": f"{readability(S['ll_text']):.1f}",
-         "Length": f"{answer_length(S['ll_text'])}", "Citations": f"{citation_count(S['ll_text'])}"},
-        "OpenAI (GPT-4o-mini)", "Llama-3.1 (Groq)"
-    )
+    R = S["results"]
+    metric_cards({registry.label(k): {
+        "Latency (s)": f"{r['latency']:.2f}", "Tokens (in/out)": f"{r['tokens_in']}/{r['tokens_out']}",
+        "Cost ($)": f"{r['cost']:.4f}", "Readability": f"{r['readability']:.1f}",
+        "Length": f"{r['words']}", "Citations": f"{r['citations']}",
+        "TTFT (s)": fmt(r.get('ttft')), "Tokens/s": fmt(r.get('tps'), ".1f")} for k, r in R.items()})
+    cached_note([registry.short(k) for k, r in R.items() if r.get("cache_hit")])
+    hedge_note({registry.short(k): r["hedge_winner"] for k, r in R.items() if r.get("hedged")})
     section_divider()
-    c1, c2 = st.columns(2)
-    with c1: answer("OpenAI", S['ai_text'])
-    with c2: answer("Llama-3.1", S['ll_text'])
+    answer_grid({k: registry.short(k) for k in R}, {k: r["answer"] for k, r in R.items()})
 
     section_divider()
     with st.form("vote_text_form", clear_on_submit=True):
-        vote = safe_vote_radio("Which answer do you prefer?", "vote_text_choice")
+        vote = vote_radio("Which answer do you prefer?", "vote_text_choice", [registry.label(k) for k in R])
         submitted = st.form_submit_button("Save Vote")
         if submitted:
             if S['run_id'] is not None:
                 st.session_state.tracker.update_by_id(S['run_id'], preference=vote or "Tie")
-                st.session_state.tracker.save_csv()
                 st.success(f"Saved vote for run #{S['run_id']}: {vote or 'Tie'}")
             else:
                 st.error("Could not find the run to attach this vote.")
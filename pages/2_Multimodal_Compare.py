@@ -1,21 +1,35 @@
 import streamlit as st
-from components.ui import page_header, metric_cards, section_divider, answer
-from services.openrouter import OpenRouterClient
-from services.groq_llama import GroqClient
+from components.ui import page_header, metric_cards, section_divider, answer_grid, fmt, cached_note, hedge_note, image_note, vote_radio
+from services import registry
+from services.dispatch import fan_out
 from retrieval.document_processor import extract_text_from_pdf, extract_text_from_docx, extract_text_from_csv
-from evaluators.metrics import token_estimate, readability, citation_count, answer_length
-from analytics.tracker import MetricsTracker
-
-def safe_vote_radio(label: str, key: str):
-    try:
-        return st.radio(label,
-                        ["OpenAI (GPT-4o-mini)", "Llama-3.1 (Groq)", "Tie"],
-                        horizontal=True, index=None, key=key)
-    except TypeError:
-        val = st.selectbox(label,
-                           ["(choose…)", "OpenAI (GPT-4o-mini)", "Llama-3.1 (Groq)", "Tie"],
-                           key=key, index=0)
-        return None if val == "(choose…)" else val
+from analytics.tracker import MetricsTracker, result_fields
+from utils.config import RUN_DEADLINE_S
+
+def render_last(S: dict, form_key: str):
+    """Metric cards, answers and the vote form for the last run of one mode (kept across reruns)."""
+    R, titles = S["results"], S["titles"]
+    metric_cards({titles[k]: {
+        "Latency (s)": f"{r['latency']:.2f}", "Tokens (in/out)": f"{r['tokens_in']}/{r['tokens_out']}",
+        "Readability": f"{r['readability']:.1f}", "Length": f"{r['words']}",
+        "Citations": f"{r['citations']}",
+        "TTFT (s)": fmt(r.get('ttft')), "Tokens/s": fmt(r.get('tps'), ".1f")} for k, r in R.items()})
+    cached_note([registry.short(k) for k, r in R.items() if r.get("cache_hit")])
+    hedge_note({registry.short(k): r["hedge_winner"] for k, r in R.items() if r.get("hedged")})
+    image_note(next((r for r in R.values() if r.get("image_bytes") is not None), {}))
+    section_divider()
+    answer_grid({k: f"{titles[k]} Answer" for k in R}, {k: r["answer"] for k, r in R.items()})
+
+    section_divider()
+    with st.form(f"vote_{form_key}_form", clear_on_submit=True):
+        vote = vote_radio("Which answer do you prefer?", f"vote_{form_key}_choice", [registry.label(k) for k in R])
+        submitted = st.form_submit_button("Save Vote")
+        if submitted:
+            if S['run_id'] is not None:
+                st.session_state.tracker.update_by_id(S['run_id'], preference=vote or "Tie")
+                st.success(f"Saved vote for run #{S['run_id']}: {vote or 'Tie'}")
+            else:
+                st.error("Could not find the run to attach this vote.")
 
 if "tracker" not in st.session_state:
     st.session_state.tracker = MetricsTracker()
@@ -28,12 +42,14 @@ if "doc_last" not in st.session_state:
 
 st.set_page_config(page_title="Images & Docs", page_icon="🖼️", layout="wide")
 page_header("Images & Documents",
-            "OpenAI (Vision) vs Llama-3.1 (text); and Documents → Text",
+            "Vision models vs text-only baselines; and Documents → Text",
             "Multimodal")
 
 mode = st.radio("Mode", ["Image → Text", "Document → Text"], horizontal=True)
+stream = st.checkbox("Stream tokens", value=True, help="Show answers as they are generated and record TTFT / tokens per second.")
+bypass = st.checkbox("Bypass cache", value=False, help="Always call the providers, even if this exact request was answered before.")
 
-orc, grq = OpenRouterClient(), GroqClient()
+models = registry.models()
 
 # ---------- Image → Text ----------
 if mode == "Image → Text":
@@ -46,63 +62,41 @@ if mode == "Image → Text":
 
     if img and do_run:
         image_bytes = img.read()
+        clients = registry.clients(hedge=st.session_state.tracker.hedge_delays("image"))
         mime = img.type or "image/png"
+        # vision models see the image; the rest answer from the prompt alone as a text baseline
+        vision = {m["key"] for m in registry.models(vision=True)}
+        titles = {m["key"]: f"{m['short']} (Vision)" if m["key"] in vision else f"{m['short']} (text baseline)" for m in models}
+        def call(m):
+            c = clients[m["key"]]
+            if m["key"] in vision:
+                return lambda cb: c.chat_vision(prompt, [image_bytes], mime_types=[mime], stream=stream, on_token=cb, use_cache=not bypass)
+            return lambda cb: c.chat_text(prompt + "\n(Note: image not visible to this model.)", stream=stream, on_token=cb, use_cache=not bypass)
+        live = st.empty()  # streamed answers; replaced by the full render below
+        with live.container():
+            slots = answer_grid({k: f"{t} Answer" for k, t in titles.items()})
         with st.spinner("Calling models..."):
-            ai_ans, ai_usage, ai_lat = orc.chat_vision(prompt, [image_bytes], mime_types=[mime])
-            ll_ans, ll_usage, ll_lat = grq.chat_text(prompt + "\n(Note: image not visible to this model.)")
-
-        ai_in = ai_usage.get("prompt_tokens", token_estimate(prompt))
-        ai_out = ai_usage.get("completion_tokens", token_estimate(ai_ans))
-        ll_in = ll_usage.get("prompt_tokens", token_estimate(prompt))
-        ll_out = ll_usage.get("completion_tokens", token_estimate(ll_ans))
+            res = fan_out({m["key"]: call(m) for m in models}, sinks={k: slot.write for k, slot in slots.items()},
+                          deadline=RUN_DEADLINE_S)
+        live.empty()
+        for m in models:
+            if res[m["key"]]["error"]: st.error(f"{m['short']}: {res[m['key']]['error']}")
+        results = {m["key"]: result_fields(m["vision_model"] if m["key"] in vision else m["model"], res[m["key"]], prompt)
+                   for m in models}
 
         run_id = st.session_state.tracker.log({
             "mode": "image",
             "prompt": prompt,
             "filename": getattr(img, "name", ""),
-            "openai_answer": ai_ans, "llama_answer": ll_ans,
-            "openai_latency": ai_lat, "llama_latency": ll_lat,
-            "openai_tokens_in": ai_in, "openai_tokens_out": ai_out,
-            "llama_tokens_in": ll_in, "llama_tokens_out": ll_out,
             "preference": None
-        })
-        st.session_state.tracker.save_csv()
+        }, results)
 
-        st.session_state.image_last = dict(
-            run_id=run_id, prompt=prompt, filename=getattr(img, "name", ""),
-            ai_ans=ai_ans, ll_ans=ll_ans,
-            ai_lat=ai_lat, ll_lat=ll_lat,
-            ai_in=ai_in, ai_out=ai_out, ll_in=ll_in, ll_out=ll_out
-        )
+        st.session_state.image_last = dict(run_id=run_id, prompt=prompt, filename=getattr(img, "name", ""),
+                                           results=results, titles=titles)
 
     # render from state if we have a last image run
     if st.session_state.image_last:
-        S = st.session_state.image_last
-        metric_cards(
-            {"Latency (s)": f"{S['ai_lat']:.2f}", "Tokens (in/out)": f"{S['ai_in']}/{S['ai_out']}",
-             "Readability": f"{readability(S['ai_ans']):.1f}", "Length": f"{answer_length(S['ai_ans'])}",
-             "Citations": f"{citation_count(S['ai_ans'])}"},
-            {"Latency (s)": f"{S['ll_lat']:.2f}", "Tokens (in/out)": f"{S['ll_in']}/{S['ll_out']}",
-             "Readability": f"{readability(S['ll_ans']):.1f}", "Length": f"{answer_length(S['ll_ans'])}",
-             "Citations": f"{citation_count(S['ll_ans'])}"},
-            "OpenAI Vision (GPT-4o-mini)", "Llama-3.1 (text baseline)"
-        )
-        section_divider()
-        cA, cB = st.columns(2)
-        with cA: answer("OpenAI (Vision) Answer", S['ai_ans'])
-        with cB: answer("Llama-3.1 (Text) Answer", S['ll_ans'])
-
-        section_divider()
-        with st.form("vote_img_form", clear_on_submit=True):
-            vote = safe_vote_radio("Which answer do you prefer?", "vote_img_choice")
-            submitted = st.form_submit_button("Save Vote")
-            if submitted:
-                if S['run_id'] is not None:
-                    st.session_state.tracker.update_by_id(S['run_id'], preference=vote or "Tie")
-                    st.session_state.tracker.save_csv()
-                    st.success(f"Saved vote for run #{S['run_id']}: {vote or 'Tie'}")
-                else:
-                    st.error("Could not find the run to attach this vote.")
+        render_last(st.session_state.image_last, "img")
 
 # ---------- Document → Text ----------
 else:
@@ -132,59 +126,30 @@ else:
             st.warning("No selectable text found. If this is a scanned PDF, run OCR first.")
         else:
             combined_prompt = f"Document:\n{text[:12000]}\n\nInstruction:\n{prompt}"
+            titles = {m["key"]: m["label"] for m in models}
+            clients = registry.clients(hedge=st.session_state.tracker.hedge_delays("doc"))
+            live = st.empty()  # streamed answers; replaced by the full render below
+            with live.container():
+                slots = answer_grid({m["key"]: f"{m['short']} Answer" for m in models})
             with st.spinner("Calling models..."):
-                ai_ans, ai_usage, ai_lat = orc.chat_text(combined_prompt)
-                ll_ans, ll_usage, ll_lat = grq.chat_text(combined_prompt)
-
-            ai_in = ai_usage.get("prompt_tokens", token_estimate(combined_prompt))
-            ai_out = ai_usage.get("completion_tokens", token_estimate(ai_ans))
-            ll_in = ll_usage.get("prompt_tokens", token_estimate(combined_prompt))
-            ll_out = ll_usage.get("completion_tokens", token_estimate(ll_ans))
+                res = fan_out({m["key"]: (lambda cb, c=clients[m["key"]]: c.chat_text(
+                    combined_prompt, stream=stream, on_token=cb, use_cache=not bypass)) for m in models},
+                    sinks={k: slot.write for k, slot in slots.items()}, deadline=RUN_DEADLINE_S)
+            live.empty()
+            for m in models:
+                if res[m["key"]]["error"]: st.error(f"{m['short']}: {res[m['key']]['error']}")
+            results = {m["key"]: result_fields(m["model"], res[m["key"]], combined_prompt) for m in models}
 
             run_id = st.session_state.tracker.log({
                 "mode": "doc",
                 "prompt": prompt,
                 "filename": getattr(f, "name", ""),
-                "openai_answer": ai_ans, "llama_answer": ll_ans,
-                "openai_latency": ai_lat, "llama_latency": ll_lat,
-                "openai_tokens_in": ai_in, "openai_tokens_out": ai_out,
-                "llama_tokens_in": ll_in, "llama_tokens_out": ll_out,
                 "preference": None
-            })
-            st.session_state.tracker.save_csv()
+            }, results)
 
-            st.session_state.doc_last = dict(
-                run_id=run_id, prompt=prompt, filename=getattr(f, "name", ""),
-                ai_ans=ai_ans, ll_ans=ll_ans,
-                ai_lat=ai_lat, ll_lat=ll_lat,
-                ai_in=ai_in, ai_out=ai_out, ll_in=ll_in, ll_out=ll_out
-            )
+            st.session_state.doc_last = dict(run_id=run_id, prompt=prompt, filename=getattr(f, "name", ""),
+                                             results=results, titles=titles)
 
     # Render last doc run (if exists)
     if st.session_state.doc_last:
-        S = st.session_state.doc_last
-        metric_cards(
-            {"Latency (s)": f"{S['ai_lat']:.2f}", "Tokens (in/out)": f"{S['ai_in']}/{S['ai_out']}",
-             "Readability": f"{readability(S['ai_ans']):.1f}", "Length": f"{answer_length(S['ai_ans'])}",
-             "Citations": f"{citation_count(S['ai_ans'])}"},
-            {"Latency (s)": f"{S['ll_lat']:.2f}", "Tokens (in/out)": f"{S['ll_in']}/{S['ll_out']}",
-             "Readability": f"{readability(S['ll_ans']):.1f}", "Length": f"{answer_length(S['ll_ans'])}",
-             "Citations": f"{citation_count(S['ll_ans'])}"},
-            "OpenAI (GPT-4o-mini)", "Llama-3.1 (Groq)"
-        )
-        section_divider()
-        c1, c2 = st.columns(2)
-        with c1: answer("OpenAI Answer", S['ai_ans'])
-        with c2: answer("Llama-3.1 Answer", S['ll_ans'])
-
-        section_divider()
-        with st.form("vote_doc_form", clear_on_submit=True):
-            vote = safe_vote_radio("Which answer do you prefer?", "vote_doc_choice")
-            submitted = st.form_submit_button("Save Vote")
-            if submitted:
-                if S['run_id'] is not None:
-                    st.session_state.tracker.update_by_id(S['run_id'], preference=vote or "Tie")
-                    st.session_state.tracker.save_csv()
-                    st.success(f"Saved vote for run #{S['run_id']}: {vote or 'Tie'}")
-                else:
-                    st.error("Could not find the run to attach this vote.")
+        render_last(st.session_state.doc_last, "doc")
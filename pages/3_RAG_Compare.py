@@ -1,23 +1,14 @@
 import streamlit as st
-from components.ui import page_header, section_divider, metric_cards, answer
-from retrieval.document_processor import extract_text_from_pdf, chunk_text
+from components.ui import page_header, section_divider, metric_cards, answer_grid, fmt, cached_note, hedge_note, vote_radio
+from retrieval.document_processor import iter_pdf_pages, chunk_text
 from retrieval.hybrid_retriever import HybridRetriever
+from retrieval.index_cache import shared_cache, index_key, doc_hash, estimate_bytes
+from retrieval.context_packer import pack_context
 from services.vectordb_qdrant import VectorDB
-from services.openrouter import OpenRouterClient
-from services.groq_llama import GroqClient
-from evaluators.metrics import grounding_coverage, readability, citation_count, answer_length
-from analytics.tracker import MetricsTracker
-
-def safe_vote_radio(label: str, key: str):
-    try:
-        return st.radio(label,
-                        ["OpenAI (GPT-4o-mini)", "Llama-3.1 (Groq)", "Tie"],
-                        horizontal=True, index=None, key=key)
-    except TypeError:
-        val = st.selectbox(label,
-                           ["(choose…)", "OpenAI (GPT-4o-mini)", "Llama-3.1 (Groq)", "Tie"],
-                           key=key, index=0)
-        return None if val == "(choose…)" else val
+from services import registry
+from services.dispatch import fan_out
+from analytics.tracker import MetricsTracker, result_fields
+from utils.config import RUN_DEADLINE_S
 
 st.set_page_config(page_title="RAG Compare", page_icon="📚", layout="wide")
 page_header("RAG Compare", "Ask grounded questions over a PDF", "Retrieval")
@@ -28,27 +19,74 @@ if "chunks" not in st.session_state:
     st.session_state.chunks = []
 if "rag_last" not in st.session_state:
     st.session_state.rag_last = None
+if "rag_key" not in st.session_state:
+    st.session_state.rag_key = None
+if "rag_doc" not in st.session_state:
+    st.session_state.rag_doc = None
+
+CHUNK_SIZE, OVERLAP, BOUNDARY = 900, 120, "sentence"  # chunks end on sentence breaks
+
+def build_index(chunks, key, doc_id):
+    """Fit BM25/TF-IDF and sync the vector index once per document version (see retrieval/index_cache.py)."""
+    retriever = HybridRetriever(chunks)
+    vdb = VectorDB()
+    vdb.sync_document(doc_id, chunks, version=key)  # hosted: only chunks not already in Qdrant are embedded
+    return {"retriever": retriever, "vdb": vdb, "doc_id": doc_id, "n_chunks": len(chunks),
+            "embed": dict(vdb.embedder.last_stats) if vdb.hosted else None,
+            "sync": dict(vdb.last_sync) if vdb.hosted else None,
+            "bytes": estimate_bytes(chunks, retriever, vdb)}
 
 with st.expander("Document"):
     pdf = st.file_uploader("Upload a PDF", type="pdf")
+    # hosted vector points are scoped to this id: re-indexing an edited file under the same id
+    # replaces its old chunks instead of adding to them. Blank = the content hash, so documents
+    # that merely share a file name (other sessions, other users) never touch each other's points
+    doc_id = st.text_input("Document id", key="rag_doc_id",
+                           help="Optional stable name for this document in the vector store, so a re-indexed "
+                                "edit replaces the old version; blank keys it on the content.")
     if pdf and st.button("Index", use_container_width=True):
-        text = extract_text_from_pdf(pdf)
+        parts, offsets, pos, progress = [], [], 0, st.empty()
+        for i, page in iter_pdf_pages(pdf):  # pages arrive in order while the pool extracts the rest
+            offsets.append(pos); parts.append(page); pos += len(page)
+            progress.caption(f"Extracted page {i + 1}…")
+        progress.empty()
+        text = "".join(parts)
         if not text.strip():
             st.warning("No selectable text found (maybe scanned?). Try OCR first.")
         else:
-            st.session_state.chunks = chunk_text(text, chunk_size=900, overlap=120)
+            st.session_state.chunks = chunk_text(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP, page_offsets=offsets, boundary=BOUNDARY)
+            st.session_state.rag_doc = doc_id.strip() or doc_hash(text)
+            st.session_state.rag_key = f"{index_key(text, CHUNK_SIZE, OVERLAP, BOUNDARY)}@{st.session_state.rag_doc}"
             st.success(f"Chunked into {len(st.session_state.chunks)} segments.")
 
 if not st.session_state.chunks:
     st.info("Upload & index a PDF to enable RAG.")
     st.stop()
 
-retriever = HybridRetriever(st.session_state.chunks)
-vdb = VectorDB(); vdb.clear(); vdb.add_chunks(st.session_state.chunks)
+cache = shared_cache()
+entry, hit = cache.get_or_build(st.session_state.rag_key, lambda: build_index(
+    st.session_state.chunks, st.session_state.rag_key, st.session_state.rag_doc))
+retriever, vdb = entry["retriever"], entry["vdb"]
+if hit and vdb.sync_document(entry["doc_id"], st.session_state.chunks, version=st.session_state.rag_key):
+    entry["sync"] = dict(vdb.last_sync)  # another version of this document was indexed since
+cs = cache.stats()
+st.caption(f"Index cache: {'hit' if hit else 'miss (built now)'} · build time {entry['build_s']:.2f}s · "
+           f"{entry['n_chunks']} chunks · {cs['entries']} cached docs, {cs['used_mb']:.1f}/{cs['budget_mb']:.0f} MB")
+if entry.get("embed"):
+    E = entry["embed"]
+    st.caption(f"Embeddings: {E['chunks_per_sec']:.0f} chunks/s · {E['cached']}/{E['chunks']} from cache · "
+               f"{E['requests']} request(s) in {E['seconds']:.2f}s")
+if entry.get("sync"):
+    Y = entry["sync"]
+    st.caption(f"Qdrant sync: {Y['upserted']} upserted · {Y['skipped']} already indexed · {Y['deleted']} stale removed")
 
 q = st.text_input("Ask a question grounded in the document")
 k = st.slider("Top-K context (after blend)", 3, 12, 6)
 w_vec = st.slider("Vector weighting (0→BM25/TF-IDF, 1→Vector)", 0.0, 1.0, 0.5, 0.05)
+order = st.radio("Context order", ["position", "score"], horizontal=True,
+                 help="Packed context in document order or most relevant first.")
+stream = st.checkbox("Stream tokens", value=True, help="Show answers as they are generated and record TTFT / tokens per second.")
+bypass = st.checkbox("Bypass cache", value=False, help="Always call the providers, even if this exact request was answered before.")
 
 do_run = st.button("Compare Answers", type="primary", disabled=not q.strip())
 
@@ -59,7 +97,7 @@ if do_run:
     bm_index = {t: i for i, t in enumerate(bm_texts)}
 
     # Vector
-    vec_hits = vdb.search_with_scores(q, k=max(k, 8))
+    vec_hits = vdb.search_with_scores(q, k=max(k, 8), doc_id=entry["doc_id"])
     vec_texts = [t for (t, s, _) in vec_hits]
     vec_scores = {t: s for (t, s, _) in vec_hits}
 
@@ -77,81 +115,83 @@ if do_run:
         [(t, (1 - w_vec) * bm_scores.get(t, 0.0) + w_vec * vs.get(t, 0.0)) for t in union],
         key=lambda x: -x[1]
     )
-    top_context_texts = [t for t, _ in blended[:k]]
 
-    # Citations
+    # Citations + packing: overlapping neighbours merged, near-duplicates dropped, each
+    # model's context filled to its own token budget by relevance
     idx_map = {c["text"]: i for i, c in enumerate(st.session_state.chunks)}
-    citations = [idx_map.get(t, -1) for t in top_context_texts]
-    context = ""
-    for i, t in zip(citations, top_context_texts):
-        label = f"[{i}]" if i >= 0 else "[?]"
-        context += f"{label} {t}\n\n"
+    scored = [(idx_map[t], st.session_state.chunks[idx_map[t]], s) for t, s in blended[:k] if t in idx_map]
+    models = registry.models()
+    packs = {m["key"]: pack_context(scored, m["context_tokens"], m["model"], order=order) for m in models}
+    contexts = {k: p["context"] for k, p in packs.items()}
 
     # Call models
-    orc, grq = OpenRouterClient(), GroqClient()
+    clients = registry.clients(hedge=st.session_state.tracker.hedge_delays("rag"))
+    live = st.empty()  # streamed answers; replaced by the full render below
+    with live.container():
+        slots = answer_grid({m["key"]: m["short"] for m in models})
     with st.spinner("Calling models..."):
         sys = "Answer using only the provided context. If unknown, say you don't know. Include inline citation labels like [12] if applicable."
-        ai_ans, _, ai_lat = orc.chat_text(q, context=context, system=sys)
-        ll_ans, _, ll_lat = grq.chat_text(q, context=context, system=sys)
+        res = fan_out({m["key"]: (lambda cb, c=clients[m["key"]], ctx=contexts[m["key"]]: c.chat_text(
+            q, context=ctx, system=sys, stream=stream, on_token=cb, use_cache=not bypass)) for m in models},
+            sinks={k: slot.write for k, slot in slots.items()}, deadline=RUN_DEADLINE_S)
+    live.empty()
+    for m in models:
+        if res[m["key"]]["error"]: st.error(f"{m['short']}: {res[m['key']]['error']}")
+    results = {}
+    for m in models:
+        P = packs[m["key"]]
+        results[m["key"]] = {**result_fields(m["model"], res[m["key"]], q + sys, P["context"]),
+                             "context_tokens": P["tokens"], "tokens_saved": P["saved_tokens"],
+                             "context": P["context"]}  # kept so metrics can be backfilled
 
     # log & persist
+    first = packs[models[0]["key"]]
     run_id = st.session_state.tracker.log({
         "mode": "rag",
         "prompt": q,
         "k": k,
         "vector_weight": w_vec,
-        "context_chars": len(context),
-        "openai_answer": ai_ans, "llama_answer": ll_ans,
-        "openai_latency": ai_lat, "llama_latency": ll_lat,
-        "coverage_openai": grounding_coverage(ai_ans, context),
-        "coverage_llama": grounding_coverage(ll_ans, context),
-        "readability_openai": readability(ai_ans),
-        "readability_llama": readability(ll_ans),
-        "citations_openai": citation_count(ai_ans),
-        "citations_llama": citation_count(ll_ans),
+        "context_chars": len(first["context"]),
+        "context_tokens_raw": first["raw_tokens"],
         "preference": None
-    })
-    st.session_state.tracker.save_csv()
+    }, results)
 
     # stash for reliable rendering & voting
     st.session_state.rag_last = dict(
-        run_id=run_id, q=q, k=k, w_vec=w_vec, context=context,
-        ai_ans=ai_ans, ll_ans=ll_ans,
-        ai_lat=ai_lat, ll_lat=ll_lat
+        run_id=run_id, q=q, k=k, w_vec=w_vec, context=first["context"], results=results,
+        packs={side: {f: p[f] for f in ("tokens", "raw_tokens", "saved_tokens", "merged", "deduped", "dropped")}
+               for side, p in packs.items()},
     )
 
 # Always render from state if available
 if st.session_state.rag_last:
     S = st.session_state.rag_last
+    R = S["results"]
     st.subheader("Context (blended)")
     st.code(S['context'][:3000] + ("..." if len(S['context']) > 3000 else ""))
-
-    metric_cards(
-        {"Coverage": f"{grounding_coverage(S['ai_ans'], S['context']):.2f}",
-         "Readability": f"{readability(S['ai_ans']):.1f}",
-         "Citations": f"{citation_count(S['ai_ans'])}",
-         "Words": f"{answer_length(S['ai_ans'])}",
-         "Latency (s)": f"{S['ai_lat']:.2f}"},
-        {"Coverage": f"{grounding_coverage(S['ll_ans'], S['context']):.2f}",
-         "Readability": f"{readability(S['ll_ans']):.1f}",
-         "Citations": f"{citation_count(S['ll_ans'])}",
-         "Words": f"{answer_length(S['ll_ans'])}",
-         "Latency (s)": f"{S['ll_lat']:.2f}"},
-        "OpenAI (GPT-4o-mini)", "Llama-3.1 (Groq)"
-    )
-
-    c1, c2 = st.columns(2)
-    with c1: answer("OpenAI", S['ai_ans'])
-    with c2: answer("Llama-3.1", S['ll_ans'])
+    st.caption(" · ".join(
+        f"{registry.short(side)}: {P['raw_tokens']} → {P['tokens']} tokens (saved {P['saved_tokens']}; {P['merged']} merged, "
+        f"{P['deduped']} near-duplicate, {P['dropped']} over budget)" for side, P in S["packs"].items()))
+
+    metric_cards({registry.label(k): {
+        "Coverage": f"{r['coverage']:.2f}",
+        "Readability": f"{r['readability']:.1f}",
+        "Citations": f"{r['citations']}",
+        "Words": f"{r['words']}",
+        "Latency (s)": f"{r['latency']:.2f}",
+        "TTFT (s)": fmt(r.get('ttft')), "Tokens/s": fmt(r.get('tps'), ".1f")} for k, r in R.items()})
+    cached_note([registry.short(k) for k, r in R.items() if r.get("cache_hit")])
+    hedge_note({registry.short(k): r["hedge_winner"] for k, r in R.items() if r.get("hedged")})
+
+    answer_grid({k: registry.short(k) for k in R}, {k: r["answer"] for k, r in R.items()})
 
     section_divider()
     with st.form("vote_rag_form", clear_on_submit=True):
-        vote = safe_vote_radio("Which answer do you prefer?", "vote_rag_choice")
+        vote = vote_radio("Which answer do you prefer?", "vote_rag_choice", [registry.label(k) for k in R])
         submitted = st.form_submit_button("Save Vote")
         if submitted:
             if S['run_id'] is not None:
                 st.session_state.tracker.update_by_id(S['run_id'], preference=vote or "Tie")
-                st.session_state.tracker.save_csv()
                 st.success(f"Saved vote for run #{S['run_id']}: {vote or 'Tie'}")
             else:
                 st.error("Could not find the run to attach this vote.")
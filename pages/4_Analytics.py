@@ -1,5 +1,9 @@
-import streamlit as st, plotly.express as px, numpy as np, pandas as pd
+import time
+import streamlit as st, plotly.express as px, plotly.graph_objects as go, numpy as np, pandas as pd
 from components.ui import page_header, section_divider
+from analytics.aggregates import normalize, is_hit, PHASES
+from analytics.store import RunStore
+from services import registry
 
 st.set_page_config(page_title="Analytics", page_icon="📊", layout="wide")
 page_header("Analytics", "Explore saved comparisons and overall winner", "Reports")
@@ -8,101 +12,140 @@ page_header("Analytics", "Explore saved comparisons and overall winner", "Report
 if "tracker" not in st.session_state:
     from analytics.tracker import MetricsTracker
     st.session_state.tracker = MetricsTracker()
-
-df = st.session_state.tracker.df().copy()
-if df.empty:
+tracker = st.session_state.tracker
+
+# Everything below reads running aggregates (updated as runs are logged/voted), recomputed
+# only when the store's version moves; raw rows are only read in the drill-down at the end.
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_summary(path: str, version: int) -> pd.DataFrame:
+    return RunStore(path).summary()
+
+summary = load_summary(tracker.store.path, tracker.version)
+agg = summary.set_index(["mode", "side", "metric"]) if not summary.empty else summary
+
+def stat(mode: str, side: str, metric: str, field: str = "mean"):
+    try:
+        v = agg.loc[(mode, side, metric), field]
+    except KeyError:
+        return np.nan if field != "n" else 0
+    return v if field != "n" else int(v)
+
+total_runs = stat("all", "", "runs", "n")
+if not total_runs:
     st.info("No saved runs yet. Save from the compare pages.")
     st.stop()
 
-# Normalize old column names (OpenRouter/Groq -> OpenAI/Llama)
-col_map = {
-    "openrouter_latency": "openai_latency",
-    "groq_latency": "llama_latency",
-    "openrouter_tokens_in": "openai_tokens_in",
-    "openrouter_tokens_out": "openai_tokens_out",
-    "groq_tokens_in": "llama_tokens_in",
-    "groq_tokens_out": "llama_tokens_out",
-    "openrouter_cost": "openai_cost",
-    "groq_cost": "llama_cost",
-    "coverage_openrouter": "coverage_openai",
-    "coverage_groq": "coverage_llama",
-    "readability_openrouter": "readability_openai",
-    "readability_groq": "readability_llama",
-    "citations_openrouter": "citations_openai",
-    "citations_groq": "citations_llama",
-    "openrouter_answer": "openai_answer",
-    "groq_answer": "llama_answer",
-}
-for old, new in col_map.items():
-    if old in df.columns and new not in df.columns:
-        df[new] = df[old]
-
-# Normalize vote strings
-if "preference" in df.columns:
-    df["preference"] = (
-        df["preference"]
-        .replace({
-            "OpenRouter": "OpenAI (GPT-4o-mini)",
-            "Groq": "Llama-3.1 (Groq)",
-            "openrouter": "OpenAI (GPT-4o-mini)",
-            "groq": "Llama-3.1 (Groq)",
-        })
-    )
-
-# Cast numerics
-num_like = [c for c in df.columns if any(k in c for k in
-    ["latency","coverage","readability","citations","tokens","cost","Words","chars"])]
-for c in num_like:
-    df[c] = pd.to_numeric(df[c], errors="coerce")
-
-st.dataframe(df, use_container_width=True, height=340)
-section_divider()
+votes = summary[(summary["mode"] == "all") & summary["metric"].str.startswith("vote:")]
+votes = votes.assign(preference=votes["metric"].str[5:])[["preference", "n"]]
+# Models with results, registered ones first in config order (runs of removed models still show)
+present = set(summary.loc[summary["side"] != "", "side"])
+SIDES = [k for k in registry.keys() if k in present] + sorted(present - set(registry.keys()))
 
 # Aggregates
 st.subheader("Aggregates")
 c1, c2, c3 = st.columns(3)
-with c1: st.metric("Total Runs", len(df))
-with c2: st.metric("Modes Covered", df["mode"].nunique() if "mode" in df else 1)
-with c3: st.metric("Votes Collected", int(df["preference"].notna().sum()) if "preference" in df else 0)
-
-# Latency
-if {"openai_latency","llama_latency"}.issubset(df.columns):
-    st.subheader("Latency (s)")
-    lat = df.melt(value_vars=["openai_latency","llama_latency"], var_name="model", value_name="seconds")
-    lat["model"] = lat["model"].map({"openai_latency":"OpenAI (GPT-4o-mini)", "llama_latency":"Llama-3.1 (Groq)"})
-    fig = px.box(lat, x="model", y="seconds", points="all")
-    st.plotly_chart(fig, use_container_width=True)
+with c1: st.metric("Total Runs", total_runs)
+with c2: st.metric("Modes Covered", int(((summary["metric"] == "runs") & (summary["mode"] != "all")).sum()))
+with c3: st.metric("Votes Collected", int(votes["n"].sum()))
+
+# Answers replayed from the response cache carry lookup-time "latencies"; they are never
+# folded into the timing aggregates
+cached_runs = sum(stat("all", side, "cache_hit", "n") for side in SIDES)
+if cached_runs:
+    st.caption(f"{cached_runs} cached answer(s) excluded from the timing charts and the latency score.")
+# Failed calls have no latency or answer to score; only their count is kept
+errors = {s: stat("all", s, "error", "n") for s in SIDES}
+if any(errors.values()):
+    st.caption("Failed calls (left out of timings and answer metrics): "
+               + " · ".join(f"{registry.short(s)} {int(n)}" for s, n in errors.items() if n))
+# Calls duplicated past their p95 (services/hedging.py); hedged latencies count from the first send
+hedges = {s: (stat("all", s, "hedged", "n"), stat("all", s, "hedge_won", "n")) for s in SIDES}
+if any(n for n, _ in hedges.values()):
+    st.caption("Hedged requests: " + " · ".join(f"{registry.short(s)} {n} fired, duplicate won {w}"
+                                                for s, (n, w) in hedges.items() if n))
+
+# Box plots drawn from the quantile sketches (whiskers = min/max, dashed line = mean)
+def model_box(metric: str, unit: str, mode: str = "all"):
+    rows = [(registry.label(s), *[stat(mode, s, metric, f) for f in ("min", "q1", "median", "q3", "max", "mean")])
+            for s in SIDES if stat(mode, s, metric, "n")]
+    if not rows:
+        return None
+    x, lo, q1, med, q3, hi, mean = map(list, zip(*rows))
+    fig = go.Figure(go.Box(x=x, lowerfence=lo, q1=q1, median=med, q3=q3, upperfence=hi, mean=mean))
+    fig.update_layout(xaxis_title="model", yaxis_title=unit)
+    return fig
+
+# Latency + streaming timings (TTFT / inter-token latency / output tokens per second), and the
+# time calls spent queued for provider capacity (services/scheduler.py), which latency excludes
+timing_plots = [("latency", "Latency (s)", "seconds"), ("ttft", "Time to first token (s)", "seconds"),
+                ("itl", "Inter-token latency (s)", "seconds"), ("tps", "Output tokens / sec", "tokens/s"),
+                ("queue_wait", "Queue wait before sending (s)", "seconds")]
+timing_figs = [(title, model_box(metric, unit)) for metric, title, unit in timing_plots]
+timing_figs = [(title, fig) for title, fig in timing_figs if fig is not None]
+for i in range(0, len(timing_figs), 2):
+    for col, (title, fig) in zip(st.columns(2), timing_figs[i:i+2]):
+        with col:
+            st.subheader(title)
+            st.plotly_chart(fig, use_container_width=True)
+
+# Latency phases (services/http_session.py): percentiles per model from the sketches (all
+# time) or from the raw results of a recent window
+st.subheader("Latency phases")
+st.caption("Connect/TLS are 0 on reused pooled connections; TTFB runs from request sent to response headers; "
+           "server is the processing time the provider reports. Cached answers are excluded.")
+PHASE_ORDER = ("latency", "queue_wait", *PHASES)
+WINDOWS = {"All time": None, "Last hour": 3600, "Last 24 hours": 86400, "Last 7 days": 7 * 86400, "Last 30 days": 30 * 86400}
+modes = sorted(set(summary.loc[summary["metric"] == "runs", "mode"]) - {"all"})
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def window_phases(path: str, version: int, since: str, mode: str) -> pd.DataFrame:
+    df = pd.DataFrame(RunStore(path).model_rows(mode=None if mode == "all" else mode, since=since))
+    cols = [m for m in PHASE_ORDER if m in df.columns]
+    if df.empty or not cols: return pd.DataFrame()
+    if "cache_hit" in df.columns: df = df[~df["cache_hit"].map(is_hit)]
+    long = df.melt(id_vars="side", value_vars=cols, var_name="metric").dropna(subset=["value"])
+    long["value"] = long["value"].astype(float)
+    g = long.groupby(["side", "metric"])["value"]
+    q = g.quantile([0.5, 0.9, 0.99]).unstack()
+    q.columns = ["p50", "p90", "p99"]
+    return q.join(g.size().rename("n")).reset_index()
+
+w1, w2 = st.columns(2)
+with w1: window = st.selectbox("Window", list(WINDOWS))
+with w2: phase_mode = st.selectbox("Mode", ["all"] + modes, key="phase_mode")
+if WINDOWS[window] is None:
+    ph = summary[(summary["mode"] == phase_mode) & (summary["side"] != "") & summary["metric"].isin(PHASE_ORDER)]
+    ph = ph.rename(columns={"median": "p50"})[["side", "metric", "n", "p50", "p90", "p99"]]
+else:
+    since = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - WINDOWS[window]))
+    ph = window_phases(tracker.store.path, tracker.version, since, phase_mode)
+if ph.empty:
+    st.caption("No timed calls in this window.")
+else:
+    ph = ph.assign(model=ph["side"].map(registry.label),
+                   phase=pd.Categorical(ph["metric"], PHASE_ORDER, ordered=True)).sort_values(["model", "phase"])
+    ms = ph.assign(**{c: (ph[c] * 1000).round(1) for c in ("p50", "p90", "p99")})
+    st.dataframe(ms[["model", "phase", "n", "p50", "p90", "p99"]].rename(
+        columns={"p50": "p50 (ms)", "p90": "p90 (ms)", "p99": "p99 (ms)"}), use_container_width=True, hide_index=True)
+    parts = ms[ms["metric"].isin(("connect", "tls", "ttfb", "transfer", "decode"))]
+    if not parts.empty:
+        fig = px.bar(parts, x="model", y="p50", color="phase", labels={"p50": "median (ms)"},
+                     category_orders={"phase": list(PHASE_ORDER)})
+        st.plotly_chart(fig, use_container_width=True)
 
 # RAG: Coverage & Readability
-rag_df = df[df["mode"].eq("rag")] if "mode" in df else pd.DataFrame()
-if not rag_df.empty and {"coverage_openai","coverage_llama"}.issubset(rag_df.columns):
-    st.subheader("Grounding Coverage (RAG)")
-    cov = rag_df[["coverage_openai","coverage_llama"]].rename(columns={
-        "coverage_openai":"OpenAI (GPT-4o-mini)",
-        "coverage_llama":"Llama-3.1 (Groq)"
-    }).melt(var_name="model", value_name="coverage")
-    fig = px.violin(cov, x="model", y="coverage", box=True, points="all")
-    st.plotly_chart(fig, use_container_width=True)
-
-if not rag_df.empty and {"readability_openai","readability_llama"}.issubset(rag_df.columns):
-    st.subheader("Readability (RAG)")
-    rea = rag_df[["readability_openai","readability_llama"]].rename(columns={
-        "readability_openai":"OpenAI (GPT-4o-mini)",
-        "readability_llama":"Llama-3.1 (Groq)"
-    }).melt(var_name="model", value_name="readability")
-    fig = px.box(rea, x="model", y="readability", points="all")
-    st.plotly_chart(fig, use_container_width=True)
+for metric, title in (("coverage", "Grounding Coverage (RAG)"), ("readability", "Readability (RAG)")):
+    fig = model_box(metric, metric, mode="rag")
+    if fig is not None:
+        st.subheader(title)
+        st.plotly_chart(fig, use_container_width=True)
 
 # Votes
-if "preference" in df.columns and not df["preference"].dropna().empty:
+if not votes.empty:
     st.subheader("User Votes")
-    vc = (
-        df["preference"]
-        .fillna("—")
-        .value_counts(dropna=False)
-        .rename_axis("preference")
-        .reset_index(name="count")
-    )
+    vc = pd.concat([votes.rename(columns={"n": "count"}),
+                    pd.DataFrame([{"preference": "—", "count": total_runs - int(votes["n"].sum())}])])
+    vc = vc[vc["count"] > 0].sort_values("count", ascending=False)
     fig = px.bar(vc, x="preference", y="count", labels={"preference":"Vote","count":"Count"})
     st.plotly_chart(fig, use_container_width=True)
 else:
@@ -112,43 +155,26 @@ section_divider()
 # Overall Verdict
 st.subheader("Overall Verdict")
 
-def safe_mean(s):
-    s = pd.to_numeric(s, errors="coerce").dropna()
-    return float(s.mean()) if len(s) else np.nan
-
-metrics = {
-    "lat_ai": safe_mean(df.get("openai_latency")),
-    "lat_ll": safe_mean(df.get("llama_latency")),
-    "cov_ai": safe_mean(rag_df.get("coverage_openai")) if not rag_df.empty else np.nan,
-    "cov_ll": safe_mean(rag_df.get("coverage_llama")) if not rag_df.empty else np.nan,
-    "rea_ai": safe_mean(rag_df.get("readability_openai")) if not rag_df.empty else np.nan,
-    "rea_ll": safe_mean(rag_df.get("readability_llama")) if not rag_df.empty else np.nan,
-}
-
-if "preference" in df.columns:
-    wins_ai = (df["preference"] == "OpenAI (GPT-4o-mini)").sum()
-    wins_ll = (df["preference"] == "Llama-3.1 (Groq)").sum()
-    total_v = max(1, (df["preference"].isin(["OpenAI (GPT-4o-mini)","Llama-3.1 (Groq)"])).sum())
-    vote_ai = wins_ai / total_v
-    vote_ll = wins_ll / total_v
-else:
-    vote_ai = vote_ll = np.nan
-
 W = {"latency": 0.25, "coverage": 0.35, "readability": 0.20, "votes": 0.20}
 
-def inv_norm(a, b):
-    if np.isnan(a) or np.isnan(b): return (np.nan, np.nan)
-    hi = max(a, b); lo = min(a, b); rng = hi - lo if hi != lo else 1.0
-    return ((hi - a)/rng, (hi - b)/rng)  # lower better
-
-def norm(a, b):
-    if np.isnan(a) or np.isnan(b): return (np.nan, np.nan)
-    hi = max(a, b); lo = min(a, b); rng = hi - lo if hi != lo else 1.0
-    return ((a - lo)/rng, (b - lo)/rng)  # higher better
-
-lat_ai, lat_ll = inv_norm(metrics["lat_ai"], metrics["lat_ll"])
-cov_ai, cov_ll = norm(metrics["cov_ai"], metrics["cov_ll"]) if not np.isnan(metrics["cov_ai"]) and not np.isnan(metrics["cov_ll"]) else (np.nan, np.nan)
-rea_ai, rea_ll = norm(metrics["rea_ai"], metrics["rea_ll"]) if not np.isnan(metrics["rea_ai"]) and not np.isnan(metrics["rea_ll"]) else (np.nan, np.nan)
+def norm(vals: dict, lower_better: bool = False) -> dict:
+    """Min-max across models (1 = best); nan when fewer than two models have the metric."""
+    ok = {k: v for k, v in vals.items() if not np.isnan(v)}
+    if len(ok) < 2: return {k: np.nan for k in vals}
+    hi, lo = max(ok.values()), min(ok.values()); rng = hi - lo if hi != lo else 1.0
+    return {k: ((hi - v) if lower_better else (v - lo)) / rng if k in ok else np.nan for k, v in vals.items()}
+
+lat = norm({s: stat("all", s, "latency") for s in SIDES}, lower_better=True)
+cov = norm({s: stat("rag", s, "coverage") for s in SIDES})
+rea = norm({s: stat("rag", s, "readability") for s in SIDES})
+
+if not votes.empty:
+    n_vote = dict(zip(votes["preference"], votes["n"]))
+    wins = {s: n_vote.get(registry.label(s), 0) for s in SIDES}
+    total_v = max(1, sum(wins.values()))
+    vote = {s: w / total_v for s, w in wins.items()}
+else:
+    vote = {s: np.nan for s in SIDES}
 
 def weighted(vals, weights):
     pairs = [(v, w) for v, w in zip(vals, weights) if not np.isnan(v)]
@@ -156,25 +182,39 @@ def weighted(vals, weights):
     tw = sum(w for _, w in pairs)
     return sum(v*w for v, w in pairs) / (tw if tw else 1)
 
-score_ai = weighted([lat_ai, cov_ai, rea_ai, vote_ai], [W["latency"],W["coverage"],W["readability"],W["votes"]])
-score_ll = weighted([lat_ll, cov_ll, rea_ll, vote_ll], [W["latency"],W["coverage"],W["readability"],W["votes"]])
+scores = {s: weighted([lat[s], cov[s], rea[s], vote[s]], [W["latency"], W["coverage"], W["readability"], W["votes"]])
+          for s in SIDES}
 
-colA, colB = st.columns(2)
-with colA: st.metric("OpenAI Score", f"{(score_ai*100):.1f}%" if not np.isnan(score_ai) else "—")
-with colB: st.metric("Llama-3.1 Score", f"{(score_ll*100):.1f}%" if not np.isnan(score_ll) else "—")
+for col, s in zip(st.columns(max(1, len(SIDES))), SIDES):
+    with col: st.metric(f"{registry.short(s)} Score", f"{(scores[s]*100):.1f}%" if not np.isnan(scores[s]) else "—")
 
-if not np.isnan(score_ai) and not np.isnan(score_ll):
-    if score_ai > score_ll:
-        st.success("**Overall: OpenAI (GPT-4o-mini) leads** based on current runs.")
-    elif score_ll > score_ai:
-        st.success("**Overall: Llama-3.1 (Groq) leads** based on current runs.")
+scored = {s: v for s, v in scores.items() if not np.isnan(v)}
+if len(scored) >= 2:
+    best = max(scored.values())
+    leaders = [s for s, v in scored.items() if v == best]
+    if len(leaders) == 1:
+        st.success(f"**Overall: {registry.label(leaders[0])} leads** based on current runs.")
     else:
-        st.info("**Overall: Tie** based on current runs.")
+        st.info(f"**Overall: Tie** ({', '.join(registry.label(s) for s in leaders)}) based on current runs.")
 else:
     st.caption("Not enough comparable metrics yet to compute a verdict.")
 
-# Persist current tracker rows to CSV (no overwrite of memory)
-st.session_state.tracker.save_csv()
-
 section_divider()
-st.caption("Votes update the exact run via run_id and are saved immediately. If you still see 0, check the CSV is writable and that `tracker.update_by_id` exists.")
+# Drill-down: the only place raw rows are read
+st.subheader("Runs")
+with st.expander("Per-mode statistics"):
+    st.dataframe(summary[summary["side"] != ""].round(4), use_container_width=True, hide_index=True)
+if st.toggle("Show raw runs"):
+    d1, d2, d3 = st.columns(3)
+    with d1: mode = st.selectbox("Mode", ["all"] + modes)
+    with d2: limit = st.number_input("Latest N", 10, 100000, 500, step=100)
+    with d3: layout = st.radio("Layout", ["per run", "per model"], horizontal=True,
+                               help="One row per run with columns per model, or one row per model answer.")
+    m = None if mode == "all" else mode
+    raw = pd.DataFrame([normalize(r) for r in tracker.store.recent(int(limit), m)] if layout == "per run"
+                       else tracker.store.model_rows(int(limit), m))
+    st.dataframe(raw, use_container_width=True, height=340)
+    # Runs are already persisted in the run store; the CSV is an export only
+    st.download_button("Export runs (CSV)", raw.to_csv(index=False), file_name="llm_benchmarks.csv", mime="text/csv")
+
+st.caption("Votes update the exact run via run_id and are saved immediately. If you still see 0, check the run store (RUNS_DB_PATH) is writable.")
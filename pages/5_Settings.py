@@ -1,19 +1,39 @@
 import streamlit as st
 from components.ui import page_header
-from utils.config import (OPENROUTER_TEXT_MODEL, OPENROUTER_VISION_MODEL, GROQ_TEXT_MODEL)
+from utils.config import SCHEDULER_LIMITS, SCHEDULER_RESERVE
+from services.scheduler import shared_scheduler
+from services import registry
+from evaluators.tokenizer import is_exact
 
 st.set_page_config(page_title="Settings", page_icon="⚙️", layout="wide")
 page_header("Settings", "Models, costs & notes", "Config")
 
-st.code(f"""
-OpenAI via OpenRouter (text):   {OPENROUTER_TEXT_MODEL}
-OpenAI via OpenRouter (vision): {OPENROUTER_VISION_MODEL}
-Llama-3.1 via Groq (text):      {GROQ_TEXT_MODEL}
-""", language="yaml")
+st.subheader("Models")
+st.caption("Every page compares all of these; add more with EXTRA_MODELS (see README).")
+st.dataframe([{"key": m["key"], "label": m["label"], "provider": m["provider"], "model": m["model"],
+               "vision": m.get("vision_model") or "—", "RAG context tokens": m["context_tokens"]}
+              for m in registry.models()], use_container_width=True, hide_index=True)
+
+st.subheader("Tokenizer")
+estimated = [m["short"] for m in registry.models() if not is_exact(m["model"])]
+if estimated:
+    st.error("Setup incomplete: the BPE vocabularies are not in TOKENIZER_CACHE_DIR, so token counts for "
+             + ", ".join(estimated) + " are ~4 chars/token estimates and Llama context clipping is approximate. "
+             "Run `python -m evaluators.tokenizer --fetch` once while online.")
+else:
+    st.caption("Token counts use each model's BPE vocabulary (exact for OpenAI models, close for Llama).")
+
+st.subheader("Provider limits")
+st.caption(f"Shared by every session in this process. Batch jobs leave {SCHEDULER_RESERVE:.0%} of each limit "
+           "to interactive runs, which are always served first. 0 = unlimited.")
+st.table([{"provider": p, **lim} for p, lim in SCHEDULER_LIMITS.items()])
+lanes = shared_scheduler().snapshot()
+if lanes:
+    st.dataframe(lanes, use_container_width=True, hide_index=True)
 
 st.markdown("""
 - Light, minimal UI for readability.
-- Multimodal: **Images** (OpenAI Vision) and **Documents** (PDF/DOCX/CSV/TXT) to both models.
+- Multimodal: **Images** (vision models; text-only models get a baseline prompt) and **Documents** (PDF/DOCX/CSV/TXT) to every model.
 - RAG: Hybrid BM25/TF-IDF + Vector (Qdrant+Jina when configured), blended retrieval.
 - Add/adjust metrics in `evaluators/metrics.py`; render with `metric_cards`.
 """)
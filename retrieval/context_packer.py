@@ -0,0 +1,92 @@
+# retrieval/context_packer.py — assemble RAG context within a per-model token budget
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from evaluators.tokenizer import count_tokens, token_offset
+
+LABEL_TOKENS = 8   # "[12] (p. 3) " + blank line, roughly, per emitted span
+MIN_PARTIAL = 64   # smallest truncated piece worth adding once the budget is nearly full
+
+def _span(cid: int, chunk: Any, score: float) -> Dict:
+    buf = getattr(chunk, "buffer", None)
+    if buf is None:  # plain {"text", "metadata"} dict: a span over its own text
+        text = chunk["text"]
+        return {"ids": [cid], "buffer": text, "start": 0, "end": len(text), "score": score,
+                "page": (chunk.get("metadata") or {}).get("page")}
+    return {"ids": [cid], "buffer": buf, "start": chunk.start, "end": chunk.end, "score": score, "page": chunk.page}
+
+def _uncovered(a: int, b: int, taken: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Pieces of [a, b) not inside any already selected interval."""
+    pieces, pos = [], a
+    for s, e in sorted(taken):
+        if e <= pos or s >= b: continue
+        if s > pos: pieces.append((pos, s))
+        pos = max(pos, e)
+    if pos < b: pieces.append((pos, b))
+    return pieces
+
+def _shingles(text: str, n: int = 4) -> set:
+    w = re.findall(r"\w+", text.lower())
+    return {tuple(w[i:i + n]) for i in range(max(1, len(w) - n + 1))}
+
+def _label(s: Dict) -> str:
+    return f"[{min(s['ids'])}]" + (f" (p. {s['page']})" if s.get("page") else "")
+
+def render(spans: Sequence[Dict]) -> str:
+    return "".join(f"{_label(s)} {s['buffer'][s['start']:s['end']]}\n\n" for s in spans)
+
+def pack_context(scored: Sequence[Tuple[int, Any, float]], budget_tokens: int, model: Optional[str] = None,
+                 order: str = "position", dup_threshold: float = 0.85) -> Dict:
+    """
+    scored: (chunk_id, chunk, score), best first. Chunks are taken greedily by score, each
+    costing only the tokens it adds beyond text already selected (overlapping neighbours are
+    nearly free); chunks whose text is mostly contained elsewhere in the selection are
+    dropped, and the first chunk that no longer fits is cut to the remaining budget instead
+    of the whole context being clipped at the end. Selected spans of the same document are
+    merged when they overlap or touch, then emitted in document order ("position") or by
+    score ("score").
+    Returns {"context", "spans", "tokens", "raw_tokens", "saved_tokens", "merged", "deduped", "dropped"}.
+    """
+    raw_tokens = count_tokens(render([_span(cid, c, s) for cid, c, s in scored]), model)
+    taken: Dict[int, List[Tuple[int, int]]] = {}   # id(buffer) → selected intervals
+    picked: List[Dict] = []
+    shingles: List[Tuple[Dict, set]] = []
+    used, deduped, dropped = 0, 0, 0
+    for cid, chunk, score in scored:
+        sp = _span(cid, chunk, score)
+        ivs = taken.setdefault(id(sp["buffer"]), [])
+        pieces = _uncovered(sp["start"], sp["end"], ivs)
+        if not pieces: picked.append(sp); continue  # fully inside the selection already
+        overlaps = pieces != [(sp["start"], sp["end"])]
+        if not overlaps:
+            sh = _shingles(sp["buffer"][sp["start"]:sp["end"]])
+            if any(len(sh & other) / max(1, min(len(sh), len(other))) >= dup_threshold for _, other in shingles):
+                deduped += 1; continue
+        cost = sum(count_tokens(sp["buffer"][a:b], model) for a, b in pieces) + (0 if overlaps else LABEL_TOKENS)
+        left = budget_tokens - used
+        if cost > left:
+            if overlaps or left - LABEL_TOKENS < MIN_PARTIAL:
+                dropped += 1; continue
+            sp["end"] = token_offset(sp["buffer"], sp["start"], left - LABEL_TOKENS, model)
+            pieces, cost = [(sp["start"], sp["end"])], left
+        used += cost
+        ivs.extend(pieces)
+        picked.append(sp)
+        if not overlaps: shingles.append((sp, sh))
+
+    # merge what was picked into maximal spans per document
+    first_seen: Dict[int, int] = {}
+    for sp in picked: first_seen.setdefault(id(sp["buffer"]), len(first_seen))
+    merged: List[Dict] = []
+    for sp in sorted(picked, key=lambda s: (first_seen[id(s["buffer"])], s["start"], -s["end"])):
+        cur = merged[-1] if merged else None
+        if cur is not None and cur["buffer"] is sp["buffer"] and sp["start"] <= cur["end"]:
+            cur["end"] = max(cur["end"], sp["end"]); cur["ids"] += sp["ids"]; cur["score"] = max(cur["score"], sp["score"])
+        else:
+            merged.append(dict(sp, ids=list(sp["ids"])))
+    if order == "score":
+        merged.sort(key=lambda s: -s["score"])
+    context = render(merged)
+    tokens = count_tokens(context, model)
+    return {"context": context, "spans": merged, "tokens": tokens, "raw_tokens": raw_tokens,
+            "saved_tokens": raw_tokens - tokens, "merged": len(picked) - len(merged),
+            "deduped": deduped, "dropped": dropped}
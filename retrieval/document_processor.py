@@ -1,15 +1,69 @@
 from PyPDF2 import PdfReader
 from docx import Document
 import pandas as pd
+import re
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Tuple
+from utils.config import PDF_WORKERS, PDF_PARALLEL_MIN_PAGES
+from evaluators.tokenizer import token_offset
+
+_reader: Optional[PdfReader] = None  # per worker process, parsed once in the pool initializer
+
+def _init_pdf_worker(data: bytes):
+    global _reader
+    _reader = PdfReader(BytesIO(data))
+
+def _extract_range(lo: int, hi: int) -> List[str]:
+    return [_reader.pages[i].extract_text() or "" for i in range(lo, hi)]
+
+def _pdf_bytes(file) -> bytes:
+    if isinstance(file, (bytes, bytearray)): return bytes(file)
+    if isinstance(file, str):
+        with open(file, "rb") as f: return f.read()
+    if hasattr(file, "getvalue"): return file.getvalue()  # Streamlit UploadedFile, BytesIO
+    return file.read()
+
+def iter_pdf_pages(file, workers: int = PDF_WORKERS) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_index, text) in page order as soon as each page is ready, so callers can
+    chunk/index early pages while later ones are still being extracted. Page ranges are
+    spread over a process pool (text extraction is CPU-bound pure Python); small files
+    or workers=1 run in-process.
+    """
+    data = _pdf_bytes(file)
+    reader = PdfReader(BytesIO(data))
+    n = len(reader.pages)
+    if workers <= 1 or n < PDF_PARALLEL_MIN_PAGES:
+        for i, p in enumerate(reader.pages):
+            yield i, p.extract_text() or ""
+        return
+    step = -(-n // (workers * 4))  # a few ranges per worker: balances load, keeps the first pages early
+    ranges = [(lo, min(lo + step, n)) for lo in range(0, n, step)]
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(ranges)),
+                               initializer=_init_pdf_worker, initargs=(data,))
+    try:
+        futs = [pool.submit(_extract_range, lo, hi) for lo, hi in ranges]
+        for (lo, _), fut in zip(ranges, futs):
+            for j, text in enumerate(fut.result()):
+                yield lo + j, text
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def extract_pdf_pages(file, workers: int = PDF_WORKERS) -> Tuple[str, List[int]]:
+    """Full text (pages joined once, no separator) and the start offset of every page in it."""
+    parts, offsets, pos = [], [], 0
+    for _, text in iter_pdf_pages(file, workers):
+        offsets.append(pos); parts.append(text); pos += len(text)
+    return "".join(parts), offsets
+
+def page_of(page_offsets: List[int], pos: int) -> int:
+    """1-based page number holding character `pos` of the extracted text."""
+    return max(1, bisect_right(page_offsets, pos))
 
 def extract_text_from_pdf(file) -> str:
-    reader = PdfReader(file)
-    text = ""
-    for p in reader.pages:
-        text += p.extract_text() or ""
-    return text
+    return extract_pdf_pages(file)[0]
 
 def extract_text_from_docx(file_bytes: bytes) -> str:
     doc = Document(BytesIO(file_bytes))
@@ -21,11 +75,88 @@ def extract_text_from_csv(file_bytes: bytes, max_rows: int = 1000) -> str:
         df = df.head(max_rows)
     return df.to_csv(index=False)
 
-def chunk_text(text: str, chunk_size=900, overlap=120) -> List[Dict]:
-    chunks, start = [], 0
-    while start < len(text):
-        end = min(start + chunk_size, len(text))
-        chunk = text[start:end]
-        chunks.append({"text": chunk, "metadata": {"start": start, "end": end}})
-        start += max(1, chunk_size - overlap)
-    return chunks
+class Chunk:
+    """
+    A [start, end) span of a shared text buffer. The text is only sliced out when asked
+    for, so a document's chunks cost a few dozen bytes each instead of a copy of every
+    (overlapping) window. Reads like the old {"text", "metadata"} dicts.
+    """
+    __slots__ = ("buffer", "start", "end", "page")
+
+    def __init__(self, buffer: str, start: int, end: int, page: Optional[int] = None):
+        self.buffer, self.start, self.end, self.page = buffer, start, end, page
+
+    @property
+    def text(self) -> str:
+        return self.buffer[self.start:self.end]
+
+    @property
+    def metadata(self) -> Dict:
+        md = {"start": self.start, "end": self.end}
+        if self.page is not None: md["page"] = self.page
+        return md
+
+    def __getitem__(self, key: str):
+        if key in ("text", "metadata"): return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        return self[key] if key in ("text", "metadata") else default
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return f"Chunk({self.start}:{self.end}, page={self.page})"
+
+_WS = re.compile(r"\s+")
+_SENTENCE = re.compile(r"[.!?…][\"')\]]*\s+")
+_PARAGRAPH = re.compile(r"\n[ \t]*\n\s*")
+# Preferred break points, best first; a window falls back to the next kind when it has none
+BOUNDARIES = {"paragraph": (_PARAGRAPH, _SENTENCE, _WS), "sentence": (_SENTENCE, _WS), "word": (_WS,)}
+
+def _snap(text: str, lo: int, hi: int, patterns) -> int:
+    """End of the last break inside text[lo:hi] (first pattern that has one), else hi."""
+    for pat in patterns:
+        a, step = hi, 64
+        while a > lo:  # breaks are usually near the end: scan growing tails, not the whole window
+            a = max(lo, hi - step); step *= 4
+            last = None
+            for last in pat.finditer(text, a, hi): pass
+            if last is not None: return last.end()
+    return hi
+
+def iter_chunks(text: str, chunk_size=900, overlap=120, boundary: Optional[str] = None,
+                unit: str = "chars", page_offsets: Optional[List[int]] = None) -> Iterator[Chunk]:
+    """
+    Lazily yield Chunk spans over `text`. unit="tokens" sizes chunk_size/overlap in BPE
+    tokens (evaluators/tokenizer.py). boundary = "paragraph" | "sentence" | "word" ends each
+    chunk at the last such break in the back half of the window (falling back to finer
+    breaks, then a hard cut) and starts the next one on a word; None keeps fixed strides.
+    """
+    n, start = len(text), 0
+    if unit == "tokens":
+        adv = lambda pos, k: token_offset(text, pos, k)  # index k tokens after pos
+    else:
+        adv = lambda pos, k: min(n, pos + k)
+    page = (lambda pos: page_of(page_offsets, pos)) if page_offsets else (lambda pos: None)
+    if boundary is None:
+        while start < n:
+            yield Chunk(text, start, adv(start, chunk_size), page(start))
+            start = max(start + 1, adv(start, chunk_size - overlap))
+        return
+    patterns = BOUNDARIES[boundary]
+    while start < n:
+        end = adv(start, chunk_size)
+        if end < n:
+            end = _snap(text, adv(start, chunk_size // 2), end, patterns)
+        yield Chunk(text, start, end, page(start))
+        if end >= n: return
+        ov = overlap if unit != "tokens" else (end - start) * overlap // chunk_size
+        nxt = max(start + 1, end - ov)
+        m = _WS.search(text, nxt, end) if nxt < end else None
+        start = m.end() if m and m.end() < end else nxt
+
+def chunk_text(text: str, chunk_size=900, overlap=120, page_offsets: Optional[List[int]] = None,
+               boundary: Optional[str] = None, unit: str = "chars") -> List[Chunk]:
+    return list(iter_chunks(text, chunk_size, overlap, boundary, unit, page_offsets))
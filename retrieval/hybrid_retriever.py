@@ -1,22 +1,66 @@
-from rank_bm25 import BM25Okapi
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
 import numpy as np
 
+def _top(scores, m):
+    """Indices of the m best scores, best first (argpartition + sort of just those m)."""
+    m = min(m, len(scores))
+    idx = np.argpartition(-scores, m - 1)[:m]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
 class HybridRetriever:
-    def __init__(self, chunks):
+    """
+    BM25 (Okapi, same formula/idf floor as rank_bm25) + TF-IDF cosine, blended 50/50.
+    One CountVectorizer pass feeds both: its unigram columns become a precomputed sparse
+    BM25 weight matrix, and the full (1,2)-gram counts go through a TfidfTransformer,
+    so a query is one tokenization plus two sparse mat-vecs.
+    """
+    def __init__(self, chunks, k1=1.5, b=0.75, epsilon=0.25):
         self.chunks = chunks or []
-        self.corpus = [c["text"] for c in self.chunks]
-        self.bm25 = BM25Okapi([c.split() for c in self.corpus]) if self.corpus else None
-        self.vec = TfidfVectorizer(ngram_range=(1,2), strip_accents="unicode")
-        self.mat = self.vec.fit_transform(self.corpus) if self.corpus else None
+        self.k1, self.b, self.epsilon = k1, b, epsilon
+        self.vec = CountVectorizer(ngram_range=(1,2), strip_accents="unicode")
+        self.tfidf = TfidfTransformer()
+        self.mat = self.bm25_mat = None
+        if self.chunks:
+            counts = self.vec.fit_transform(c["text"] for c in self.chunks)  # texts are transient
+            self.mat = self.tfidf.fit_transform(counts)
+            terms = self.vec.get_feature_names_out()
+            self.uni = np.flatnonzero(np.char.find(terms.astype(str), " ") < 0)  # unigram columns
+            self.bm25_mat = self._bm25_weights(counts[:, self.uni].tocsr())
+
+    def _bm25_weights(self, tf):
+        n = tf.shape[0]
+        dl = np.asarray(tf.sum(axis=1)).ravel()
+        avgdl = dl.sum() / n
+        df = np.bincount(tf.indices, minlength=tf.shape[1])
+        idf = np.log(n - df + 0.5) - np.log(df + 0.5)
+        idf[idf < 0] = self.epsilon * idf.mean()  # rank_bm25's floor for very common terms
+        w = tf.copy().astype(np.float64)
+        rows = np.repeat(np.arange(n), np.diff(w.indptr))
+        denom = w.data + self.k1 * (1 - self.b + self.b * dl[rows] / avgdl)
+        w.data = idf[w.indices] * w.data * (self.k1 + 1) / denom
+        return w
+
+    def scores(self, queries):
+        """(bm25, tfidf) score matrices, shape (len(queries), len(chunks))."""
+        qc = self.vec.transform(queries)
+        bm = (qc[:, self.uni] @ self.bm25_mat.T).toarray()
+        tf = (self.tfidf.transform(qc) @ self.mat.T).toarray()
+        return bm, tf
+
+    def get_top_chunks_batch(self, queries, k=5):
+        if not self.chunks: return [[] for _ in queries]
+        live = [i for i, q in enumerate(queries) if q.strip()]
+        out = [[] for _ in queries]
+        if not live: return out
+        bm, tf = self.scores([queries[i] for i in live])
+        def norm(a): lo,hi=a.min(),a.max(); return (a-lo)/(hi-lo+1e-9)
+        for row, qi in enumerate(live):
+            b_scores, t_scores = bm[row], tf[row]
+            bn, tn = norm(b_scores), norm(t_scores)
+            cand = list(dict.fromkeys(_top(b_scores, max(k,10)).tolist() + _top(t_scores, max(k,10)).tolist()))
+            blended = sorted([(i, 0.5*bn[i]+0.5*tn[i]) for i in cand], key=lambda x:-x[1])[:k]
+            out[qi] = [self.chunks[i] for i,_ in blended]
+        return out
 
     def get_top_chunks(self, query, k=5):
-        if not self.corpus or not query.strip(): return []
-        b_scores = self.bm25.get_scores(query.split())
-        qv = self.vec.transform([query]); t_scores = cosine_similarity(qv, self.mat)[0]
-        def norm(a): a=np.array(a,dtype=float); lo,hi=a.min(),a.max(); return (a-lo)/(hi-lo+1e-9)
-        bn, tn = norm(b_scores), norm(t_scores)
-        cand = list(dict.fromkeys(np.argsort(-b_scores)[:max(k,10)].tolist() + np.argsort(-t_scores)[:max(k,10)].tolist()))
-        blended = sorted([(i, 0.5*bn[i]+0.5*tn[i]) for i in cand], key=lambda x:-x[1])[:k]
-        return [self.chunks[i] for i,_ in blended]
+        return self.get_top_chunks_batch([query], k)[0]
@@ -0,0 +1,101 @@
+# retrieval/index_cache.py — process-wide LRU of built RAG indexes
+import hashlib, sys, threading, time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from utils.config import INDEX_CACHE_MB
+
+def doc_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()[:24]
+
+def index_key(text: str, chunk_size: int, overlap: int, boundary: Optional[str] = None) -> str:
+    """Document content hash + chunking parameters."""
+    return f"{doc_hash(text)}:{chunk_size}:{overlap}" + (f":{boundary}" if boundary else "")
+
+def _sparse_bytes(m) -> int:
+    if m is None: return 0
+    return int(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes)
+
+def estimate_bytes(chunks: List[Dict], *indexes: Any) -> int:
+    """Rough resident size: chunk text + any sparse matrices / vocabularies hanging off the indexes."""
+    # Chunk records share one buffer (counted once); plain dicts own their text
+    buffers = {id(c.buffer): c.buffer for c in chunks if hasattr(c, "buffer")}
+    total = sum(sys.getsizeof(b) for b in buffers.values())
+    total += sum(sys.getsizeof(c) if hasattr(c, "buffer") else sys.getsizeof(c["text"]) for c in chunks)
+    for ix in indexes:
+        nb = getattr(ix, "nbytes", None)
+        if isinstance(nb, int):
+            total += nb; continue
+        for attr in ("mat", "bm25_mat"):
+            total += _sparse_bytes(getattr(ix, attr, None))
+        vec = getattr(ix, "vec", None)
+        vocab = getattr(vec, "vocabulary_", None) if vec is not None else None
+        if vocab: total += len(vocab) * 100  # key str + dict slot, ballpark
+    return total
+
+class IndexCache:
+    """
+    key → {"retriever", "vdb", "build_s", "bytes", "n_chunks"}.
+    Entries are built once (concurrent callers for the same key wait for the first build)
+    and the least recently used ones are evicted once the total estimate exceeds the budget.
+    """
+    def __init__(self, budget_mb: float = INDEX_CACHE_MB):
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.used = 0
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def get_or_build(self, key: str, build: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """Returns (entry, hit). `build` returns the entry dict without timing/size fields."""
+        with self._lock:
+            e = self._touch(key)
+            if e is not None:
+                self.hits += 1
+                return e, True
+            klock = self._key_locks.setdefault(key, threading.Lock())
+        with klock:
+            with self._lock:
+                e = self._touch(key)  # someone else built it while we waited
+                if e is not None:
+                    self.hits += 1
+                    return e, True
+            t0 = time.perf_counter()
+            e = build()
+            e["build_s"] = time.perf_counter() - t0
+            e.setdefault("bytes", 0)
+            with self._lock:
+                self.misses += 1
+                self.entries[key] = e
+                self.used += e["bytes"]
+                self._evict(keep=key)
+                self._key_locks.pop(key, None)
+            return e, False
+
+    def _touch(self, key: str) -> Optional[Dict[str, Any]]:
+        e = self.entries.get(key)
+        if e is not None: self.entries.move_to_end(key)
+        return e
+
+    def _evict(self, keep: str):
+        while self.used > self.budget and len(self.entries) > 1:
+            k, e = next(iter(self.entries.items()))
+            if k == keep: break
+            del self.entries[k]
+            self.used -= e["bytes"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self.entries), "used_mb": self.used / 1048576,
+                    "budget_mb": self.budget / 1048576, "hits": self.hits, "misses": self.misses}
+
+_shared: Optional[IndexCache] = None
+_shared_lock = threading.Lock()
+
+def shared_cache() -> IndexCache:
+    """The one cache per process, so every Streamlit session reuses the same indexes."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            _shared = _shared or IndexCache()
+    return _shared
@@ -0,0 +1,59 @@
+# services/dispatch.py — run provider calls side by side
+import contextvars, queue, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from services.hedging import run_deadline
+
+Call = Callable[..., Tuple[str, Dict, float]]
+
+def _guarded(fn: Call, *args) -> Dict:
+    """Run one provider call; never raise, so a failure can't sink its sibling."""
+    t0 = time.perf_counter()
+    try:
+        text, usage, latency = fn(*args)
+        return {"text": text, "usage": usage or {}, "latency": latency, "error": None}
+    except Exception as e:
+        return {"text": "", "usage": {}, "latency": time.perf_counter() - t0, "error": str(e)}
+
+def fan_out(calls: Dict[str, Call], sinks: Optional[Dict[str, Callable[[str], None]]] = None,
+            poll: float = 0.05, deadline: Optional[float] = None) -> Dict[str, Dict]:
+    """
+    Start every call at once and wait for all of them.
+    calls: {"openai": lambda: orc.chat_text(...), "llama": lambda: grq.chat_text(...)}
+    Returns {name: {"text", "usage", "latency", "error"}} in the same key order.
+    Each latency is the one the client measured for its own request.
+
+    With sinks, each call is invoked as fn(on_token) and sinks[name](text_so_far)
+    is called from *this* thread as tokens arrive (Streamlit widgets can only be
+    touched from the script thread, so workers just enqueue deltas).
+
+    deadline: seconds the whole run may take (services/hedging.py); a call still queued
+    or waiting for its answer by then comes back with a DeadlineExceeded error.
+    """
+    if not calls: return {}
+    with run_deadline(deadline):
+        ctx = contextvars.copy_context()  # workers see the deadline
+    _run = lambda *a: ctx.copy().run(_guarded, *a)
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        if not sinks:
+            futs = {name: pool.submit(_run, fn) for name, fn in calls.items()}
+            return {name: f.result() for name, f in futs.items()}
+
+        q: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+        futs = {name: pool.submit(_run, fn, lambda d, n=name: q.put((n, d))) for name, fn in calls.items()}
+        buf = {name: "" for name in calls}
+        while True:
+            finished = all(f.done() for f in futs.values())
+            changed = set()
+            try:
+                name, delta = q.get(timeout=poll)
+                while True:
+                    buf[name] += delta; changed.add(name)
+                    name, delta = q.get_nowait()
+            except queue.Empty:
+                pass
+            for name in changed:
+                if name in sinks: sinks[name](buf[name])
+            if finished and q.empty():
+                break
+        return {name: f.result() for name, f in futs.items()}
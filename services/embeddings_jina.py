@@ -1,22 +1,137 @@
-import requests
-from utils.config import JINA_API_KEY
+import hashlib, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import numpy as np
+from utils.config import JINA_API_KEY, JINA_BATCH_SIZE, JINA_MAX_WORKERS, EMBED_CACHE_DIR
+from services.http_session import post
+
+try:
+    import fcntl
+except ImportError:  # Windows: one process per cache directory
+    fcntl = None
 
 JINA_URL = "https://api.jina.ai/v1/embeddings"
 JINA_MODEL = "jina-embeddings-v3"
 JINA_DIM = 1024
 
+class EmbeddingCache:
+    """
+    Content hash → float32 vector, on disk as an append-only `vectors.f32` (rows of `dim`
+    floats) plus `keys.tsv` ("hash<TAB>row"). The vector file is memory-mapped on load,
+    so a large cache costs page cache, not Python heap.
+    Several processes (the app, batch_eval.py) may share a directory: appends hold an
+    exclusive flock on `.lock` and first pick up rows other processes added to keys.tsv.
+    """
+    def __init__(self, model: str, dim: int, root: str = EMBED_CACHE_DIR):
+        self.dim = dim
+        d = os.path.join(root, model.replace("/", "_"))
+        os.makedirs(d, exist_ok=True)
+        self.vec_path, self.key_path = os.path.join(d, "vectors.f32"), os.path.join(d, "keys.tsv")
+        self.lock_path = os.path.join(d, ".lock")
+        self.rows: Dict[str, int] = {}
+        self._key_pos = 0  # bytes of keys.tsv already read into self.rows
+        self._mm: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        with self._lock, self._flock(shared=True):
+            self._sync()
+
+    @contextmanager
+    def _flock(self, shared: bool = False):
+        if fcntl is None:
+            yield; return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync(self):
+        """Read keys appended since the last sync (ours or another process's); call under the flock."""
+        if not os.path.exists(self.key_path) or os.path.getsize(self.key_path) <= self._key_pos: return
+        with open(self.key_path, "rb") as f:
+            f.seek(self._key_pos)
+            for line in f:
+                if not line.endswith(b"\n"): break  # a writer died mid-line; the next append drops it
+                self._key_pos += len(line)
+                h, _, r = line.decode("ascii").strip().partition("\t")
+                if r: self.rows[h] = int(r)
+
+    def _map(self) -> Optional[np.memmap]:
+        n = os.path.getsize(self.vec_path) // (4 * self.dim) if os.path.exists(self.vec_path) else 0
+        if n and (self._mm is None or self._mm.shape[0] < n):
+            self._mm = np.memmap(self.vec_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        return self._mm
+
+    def get_many(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            if any(h not in self.rows for h in hashes):
+                with self._flock(shared=True): self._sync()
+            want = {h: self.rows[h] for h in hashes if h in self.rows}
+            if not want: return {}
+            mm = self._map()
+            return {h: np.asarray(mm[r]) for h, r in want.items() if mm is not None and r < mm.shape[0]}
+
+    def put_many(self, hashes: List[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        row = 4 * self.dim
+        with self._lock, self._flock():
+            self._sync()
+            new = [i for i, h in enumerate(hashes) if h not in self.rows]  # another process may have added them
+            if not new: return
+            with open(self.vec_path, "ab") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size % row: f.truncate(size - size % row)  # partial row from a crashed writer: unreferenced
+                start = f.tell() // row
+                f.write(vectors[new].tobytes())
+            # keys after vectors: a crash can leave unreferenced rows, never dangling keys
+            with open(self.key_path, "ab") as f:
+                if f.seek(0, os.SEEK_END) > self._key_pos: f.truncate(self._key_pos)  # a crashed writer's partial line
+                f.write("".join(f"{hashes[i]}\t{start + j}\n" for j, i in enumerate(new)).encode("ascii"))
+            self._sync()
+
 class JinaEmbeddings:
-    def __init__(self, api_key: str = JINA_API_KEY, model: str = JINA_MODEL):
+    def __init__(self, api_key: str = JINA_API_KEY, model: str = JINA_MODEL,
+                 batch_size: int = JINA_BATCH_SIZE, max_workers: int = JINA_MAX_WORKERS):
         if not api_key:
             raise ValueError("Missing JINA_API_KEY")
         self.api_key = api_key
         self.model = model
+        self.batch_size, self.max_workers = batch_size, max_workers
+        self.cache = EmbeddingCache(model, JINA_DIM)
+        self.last_stats: Dict[str, float] = {}
 
-    def embed(self, texts):
-        r = requests.post(JINA_URL, headers={
+    def _request(self, texts):
+        r = post(JINA_URL, headers={
             "Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"
-        }, json={"input": texts, "model": self.model}, timeout=60)
+        }, json={"input": texts, "model": self.model})
         r.raise_for_status()
         data = r.json()["data"]
         data = sorted(data, key=lambda x: x["index"])
         return [d["embedding"] for d in data]
+
+    def embed(self, texts):
+        """
+        Embeddings in input order. Cached texts are read from disk; the rest are de-duplicated,
+        split into `batch_size` requests sent `max_workers` at a time, then merged back by position.
+        Throughput of the call is left in `self.last_stats`.
+        """
+        t0 = time.perf_counter()
+        keys = [hashlib.sha1(f"{self.model}\0{t}".encode("utf-8")).hexdigest() for t in texts]
+        found = self.cache.get_many(keys)
+        todo = list(dict.fromkeys(k for k in keys if k not in found))
+        text_of = dict(zip(keys, texts))
+        batches = [todo[i:i + self.batch_size] for i in range(0, len(todo), self.batch_size)]
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+                results = list(pool.map(lambda b: self._request([text_of[k] for k in b]), batches))
+            for b, vecs in zip(batches, results):
+                arr = np.asarray(vecs, dtype=np.float32)
+                self.cache.put_many(b, arr)
+                found.update(zip(b, arr))
+        secs = time.perf_counter() - t0
+        self.last_stats = {"chunks": len(texts), "cached": len(texts) - sum(len(b) for b in batches),
+                           "requests": len(batches), "seconds": secs,
+                           "chunks_per_sec": len(texts) / secs if secs > 0 else 0.0}
+        return [found[k].tolist() for k in keys]
@@ -1,48 +1,90 @@
-import time, requests
-from typing import Dict, List, Tuple
-from utils.config import GROQ_API_KEY, GROQ_TEXT_MODEL
+import time
+from services.http_session import post_timed
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.config import GROQ_API_KEY, GROQ_TEXT_MODEL, GROQ_BASE_URL
+from services.streaming import read_sse
+from services.response_cache import cached_call
+from services.scheduler import shared_scheduler, estimate_tokens, used_tokens, INTERACTIVE
+from services.hedging import hedged, deadline_at
+from evaluators.tokenizer import truncate_tokens
 
-URL = "https://api.groq.com/openai/v1/chat/completions"
+URL = f"{GROQ_BASE_URL}/chat/completions"
 
-def _clip_for_tpm(s: str, max_tokens_est: int = 6000):
-    # ~4 chars/token heuristic
-    max_chars = max_tokens_est * 4
-    return s[:max_chars]
+def _clip_for_tpm(s: str, max_tokens: int = 6000, model: str = GROQ_TEXT_MODEL):
+    return truncate_tokens(s, max_tokens, model)
+
+def _server_time(usage: Dict) -> Dict:
+    # Groq reports its processing time in the body (usage.total_time), not in headers
+    if usage.get("server_time") is None and usage.get("total_time") is not None:
+        return {**usage, "server_time": usage["total_time"]}
+    return usage
 
 class GroqClient:
-    def __init__(self, api_key: str = GROQ_API_KEY):
+    def __init__(self, api_key: str = GROQ_API_KEY, priority: int = INTERACTIVE, model: str = GROQ_TEXT_MODEL,
+                 hedge_after: Optional[Dict[str, float]] = None):
         if not api_key:
             raise ValueError("Missing GROQ_API_KEY")
         self.api_key = api_key
+        self.model = model
+        self.priority = priority  # scheduler class: INTERACTIVE (pages) or BATCH (batch_eval)
+        self.hedge_after = hedge_after or {}  # {"latency"|"ttft": seconds} before a duplicate is sent
 
     def _headers(self):
         return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
 
-    def chat_text(self, prompt: str, system: str = "You are a helpful assistant.", context: str = "", max_tokens: int = 512) -> Tuple[str, Dict, float]:
+    def chat_text(self, prompt: str, system: str = "You are a helpful assistant.", context: str = "", max_tokens: int = 512,
+                  stream: bool = False, on_token: Optional[Callable[[str], None]] = None,
+                  use_cache: bool = True) -> Tuple[str, Dict, float]:
         # clip to avoid TPM errors
-        prompt = _clip_for_tpm(prompt)
-        context = _clip_for_tpm(context)
+        prompt = _clip_for_tpm(prompt, model=self.model)
+        context = _clip_for_tpm(context, model=self.model)
 
         messages = [{"role": "system", "content": system}]
         if context:
             messages.append({"role": "user", "content": f"Context:\n{context}"})
         messages.append({"role": "user", "content": prompt})
+        return cached_call("groq", self.model, messages, max_tokens, use_cache, on_token,
+                           lambda: self._request(messages, max_tokens, stream, on_token))
+
+    def _request(self, messages: List[Dict], max_tokens: int, stream: bool,
+                 on_token: Optional[Callable[[str], None]]) -> Tuple[str, Dict, float]:
+        # wait for the shared RPM/TPM budget; latency below starts once admitted
+        est = estimate_tokens(messages, max_tokens, self.model)
+        def attempt(cb, admitted):
+            with shared_scheduler().slot("groq", self.model, est, self.priority, deadline_at()) as slot:
+                admitted()
+                content, usage, latency = self._send(messages, max_tokens, stream, cb)
+                slot.settle(used_tokens(usage))
+            return content, {**usage, "queue_wait": slot.queue_wait}, latency
+        (content, usage, latency), hedge = hedged(attempt, self.hedge_after.get("ttft" if stream else "latency"), on_token)
+        return content, {**usage, **hedge}, latency
 
-        t0 = time.time()
-        resp = requests.post(URL, headers=self._headers(), json={
-            "model": GROQ_TEXT_MODEL, "messages": messages, "max_tokens": max_tokens
-        }, timeout=60)
-        t1 = time.time()
+    def _send(self, messages: List[Dict], max_tokens: int, stream: bool,
+              on_token: Optional[Callable[[str], None]]) -> Tuple[str, Dict, float]:
+        body = {"model": self.model, "messages": messages, "max_tokens": max_tokens}
+        if stream:
+            body["stream"] = True
+        t0 = time.perf_counter()
+        resp, phases = post_timed(URL, headers=self._headers(), json=body, stream=stream)
 
         if not resp.ok:
             # Make the most common issues actionable
             raise ValueError(
-                f"❌ Groq request rejected. Model={GROQ_TEXT_MODEL}. → Check GROQ_TEXT_MODEL and payload. "
+                f"❌ Groq request rejected. Model={self.model}. → Check the model id and payload. "
                 f"Response: {resp.text}"
             )
 
+        if stream:
+            t1 = time.perf_counter()
+            content, usage = read_sse(resp, t0, on_token)
+            t2 = time.perf_counter()
+            usage = {**usage, **phases, "transfer": t2 - t1 - usage["decode"]}
+            return content, _server_time(usage), t2 - t0
+        t1 = time.perf_counter()
+
         data = resp.json()
         content = data["choices"][0]["message"]["content"]
-        usage = data.get("usage", {})
+        usage = {**data.get("usage", {}), **phases, "decode": time.perf_counter() - t1}
         latency = t1 - t0
-        return content, usage, latency
+        if on_token: on_token(content)
+        return content, _server_time(usage), latency
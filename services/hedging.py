@@ -0,0 +1,155 @@
+# services/hedging.py — per-run deadline budgets and hedged provider calls
+#
+# A run (one fan_out) gets a deadline: every call under it — scheduler queueing, HTTP
+# retries and the answer itself — must finish by then, or it fails with DeadlineExceeded
+# instead of holding the page for the full read timeout.
+#
+# Hedging: when a call is still silent (no first token when streaming, no response
+# otherwise) the model's observed p95 after it was sent, one duplicate is sent and whichever
+# copy responds first wins; the other is abandoned at its next token. The clock starts
+# once the scheduler admits the call, like the latencies the p95 comes from (the run
+# store's sketches, MetricsTracker.hedge_delays); a call still queued is never duplicated.
+import contextvars, threading, time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("deadline", default=None)
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+DEADLINE_SLACK = 0.05  # a socket timeout this close to the deadline was the deadline's
+
+@contextmanager
+def run_deadline(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """Calls inside must finish within `seconds` (None/0 = no budget); nested budgets only shrink."""
+    at = time.monotonic() + seconds if seconds else None
+    outer = _deadline.get()
+    if outer is not None and (at is None or outer < at): at = outer
+    token = _deadline.set(at)
+    try:
+        yield at
+    finally:
+        _deadline.reset(token)
+
+def deadline_at() -> Optional[float]:
+    """Absolute time.monotonic() deadline of the current run, if any."""
+    return _deadline.get()
+
+def remaining() -> Optional[float]:
+    at = _deadline.get()
+    return None if at is None else max(0.0, at - time.monotonic())
+
+def check(what: str = "call"):
+    if remaining() == 0.0:
+        raise DeadlineExceeded(f"{what} ran past the run deadline")
+
+@contextmanager
+def deadline_errors(what: str = "call"):
+    """
+    Socket timeouts that fire because clip_timeout() shrank them to the run budget surface as
+    requests' ReadTimeout / ConnectionError("Read timed out"); report those as DeadlineExceeded.
+    """
+    try:
+        yield
+    except DeadlineExceeded:
+        raise
+    except OSError as e:  # requests' exceptions are IOErrors
+        rem = remaining()
+        if rem is not None and rem <= DEADLINE_SLACK:
+            raise DeadlineExceeded(f"{what} ran past the run deadline ({type(e).__name__})") from e
+        raise
+
+def clip_timeout(connect: float, read: float) -> Tuple[float, float]:
+    """(connect, read) socket timeouts no longer than what is left of the run budget."""
+    rem = remaining()
+    if rem is None: return connect, read
+    rem = max(rem, 0.001)
+    return min(connect, rem), min(read, rem)
+
+class _Lost(Exception):
+    """Raised inside the losing copy's token callback to abandon its stream."""
+
+# send(on_token, admitted): makes the call, calling admitted() once it leaves the scheduler queue
+Sender = Callable[[Optional[Callable[[str], None]], Callable[[], None]], Tuple[str, Dict, float]]
+
+def hedged(send: Sender, after: Optional[float], on_token: Optional[Callable[[str], None]] = None
+           ) -> Tuple[Tuple[str, Dict, float], Dict[str, Any]]:
+    """
+    Run send, firing one duplicate if nothing has come back `after` seconds after it was
+    admitted (None = never). The first copy to emit a token or return owns the result; the
+    other's tokens are dropped. Returns (send's result, {"hedged", "hedge_winner"}). The
+    winner's latency/ttft are counted from the first send, so they stay what the user waited.
+    """
+    if after is None:
+        check()
+        with deadline_errors():
+            return send(_guard(on_token), lambda: None), {"hedged": False, "hedge_winner": None}
+    cond = threading.Condition()
+    owner, done, sent, launched = [None], {}, {}, []
+
+    def emit(i: int):
+        def cb(delta: str):
+            with cond:
+                if owner[0] is None: owner[0] = i; cond.notify_all()
+            if owner[0] != i: raise _Lost()
+            check()
+            if on_token: on_token(delta)
+        return cb
+
+    def admitted(i: int):
+        def mark():
+            with cond: sent[i] = time.perf_counter(); cond.notify_all()
+        return mark
+
+    def run(i: int, ctx):
+        try:
+            with deadline_errors():
+                out = (True, ctx.run(send, emit(i), admitted(i)))
+        except BaseException as e:  # _Lost included; only the owner's outcome matters
+            out = (False, e)
+        with cond:
+            if owner[0] is None and out[0]: owner[0] = i
+            done[i] = out
+            cond.notify_all()
+
+    def start(i: int):
+        launched.append(i)
+        threading.Thread(target=run, args=(i, contextvars.copy_context()), daemon=True).start()
+
+    check()
+    start(0)
+    with cond:
+        while owner[0] is None and 0 not in done and remaining() != 0.0:
+            waited = time.perf_counter() - sent[0] if 0 in sent else None
+            if waited is not None and waited >= after: break
+            cond.wait(timeout=_bounded(None if waited is None else after - waited))
+        if owner[0] is None and 0 not in done and remaining() != 0.0:
+            start(1)
+        settled = lambda: (owner[0] is not None and owner[0] in done) or (owner[0] is None and len(done) == len(launched))
+        if not cond.wait_for(settled, timeout=remaining()):
+            raise DeadlineExceeded("no answer within the run deadline")
+        i = owner[0] if owner[0] is not None else 0
+        ok, value = done[i]
+    hedge = len(launched) > 1
+    info = {"hedged": hedge, "hedge_winner": ("primary", "hedge")[i] if hedge else None}
+    if not ok: raise value
+    content, usage, latency = value
+    if i:  # the hedge went out later; the user has been waiting since the primary did
+        lag = sent[1] - sent[0]
+        latency += lag
+        if usage.get("ttft") is not None: usage = {**usage, "ttft": usage["ttft"] + lag}
+    return (content, usage, latency), info
+
+def _guard(on_token: Optional[Callable[[str], None]]) -> Optional[Callable[[str], None]]:
+    """Token callback that stops a stream once the run deadline has passed."""
+    if on_token is None: return None
+    def cb(delta: str):
+        check()
+        on_token(delta)
+    return cb
+
+def _bounded(t: Optional[float]) -> Optional[float]:
+    rem = remaining()
+    if rem is None: return t
+    return rem if t is None else min(t, rem)
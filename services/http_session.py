@@ -0,0 +1,197 @@
+# services/http_session.py — process-wide pooled HTTP sessions for the provider clients
+import email.utils, random, re, socket, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from services import hedging
+from utils.config import (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_POOL_SIZE,
+                          HTTP_MAX_RETRIES, HTTP_BACKOFF_BASE, HTTP_BACKOFF_MAX)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_sessions: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+# Connection setup time of the request in flight on this thread (urllib3 connects lazily,
+# inside sess.post, on the calling thread); stays 0 when a pooled connection is reused
+_setup = threading.local()
+
+def _add(phase: str, dt: float):
+    setattr(_setup, phase, getattr(_setup, phase, 0.0) + dt)
+
+class _TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._new_conn()  # DNS + TCP
+        finally:
+            _add("connect", time.perf_counter() - t0)
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _add("connect", time.perf_counter() - t0)
+
+    def connect(self):
+        t0, before = time.perf_counter(), getattr(_setup, "connect", 0.0)
+        try:
+            super().connect()
+        finally:  # whatever connect() spent beyond _new_conn is the TLS handshake
+            _add("tls", time.perf_counter() - t0 - (getattr(_setup, "connect", 0.0) - before))
+
+class _TimedHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+class _TimedHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPPool, "https": _TimedHTTPSPool}
+
+def _origin(url: str) -> str:
+    u = urlsplit(url)
+    return f"{u.scheme}://{u.netloc}"
+
+def session_for(url: str) -> requests.Session:
+    """One keep-alive session (and connection pool) per scheme+host, shared by every thread."""
+    origin = _origin(url)
+    with _lock:
+        s = _sessions.get(origin)
+        if s is None:
+            s = requests.Session()
+            s.mount(origin, _TimedAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=0))
+            _sessions[origin] = s
+        return s
+
+def _retry_after(resp: requests.Response) -> Optional[float]:
+    """Retry-After as seconds (accepts both delta-seconds and HTTP-date forms)."""
+    v = resp.headers.get("Retry-After")
+    if not v: return None
+    try:
+        return max(0.0, float(v))
+    except ValueError:
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(v).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def server_time(headers) -> Optional[float]:
+    """Processing seconds the provider reports: Server-Timing (total, else the longest dur), openai-processing-ms or x-envoy-upstream-service-time."""
+    st = headers.get("Server-Timing")
+    if st:
+        durs = {m.group(1).strip(): float(m.group(2)) for m in re.finditer(r"([^,;\s]+)[^,]*?;\s*dur=([\d.]+)", st)}
+        if durs: return durs.get("total", max(durs.values())) / 1000
+    for h in ("openai-processing-ms", "x-envoy-upstream-service-time"):
+        try:
+            return float(headers[h]) / 1000
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+def backoff(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff; a server-provided Retry-After wins."""
+    if retry_after is not None:
+        return min(retry_after, HTTP_BACKOFF_MAX)
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+def post(url: str, **kwargs) -> requests.Response:
+    return post_timed(url, **kwargs)[0]
+
+def post_timed(url: str, *, timeout=None, retries: int = HTTP_MAX_RETRIES, stream: bool = False,
+               **kwargs) -> Tuple[requests.Response, Dict[str, Optional[float]]]:
+    """
+    requests.post through the pooled session, retrying 429/5xx and failures before the
+    request reached the server (connect errors/timeouts). A read timeout is raised at once:
+    the provider may already be generating (and billing) an answer for this non-idempotent POST.
+    Also returns where the time went (seconds, monotonic; phases of the last attempt):
+      retry_wait  – failed attempts and backoff before it
+      connect     – DNS + TCP connect (0 on a reused pooled connection)
+      tls         – TLS handshake
+      ttfb        – request sent → response headers (server time + a round trip)
+      transfer    – reading the body (stream=False; a streamed body is read by the caller)
+      server_time – processing time the provider reports in its headers, if any
+    The last response is returned as-is (even if it is an error) so callers keep
+    their own error messages; the last connection error is re-raised. Under a run
+    deadline (services/hedging.py) timeouts shrink to what is left and no retry is
+    attempted that could not start in time; a timeout cut short by the deadline raises
+    hedging.DeadlineExceeded.
+    """
+    sess = session_for(url)
+    t_first = time.perf_counter()
+    for attempt in range(retries + 1):
+        hedging.check("request")
+        _setup.connect = _setup.tls = 0.0
+        t0 = time.perf_counter()
+        try:
+            # headers only; the body is read below so its transfer is timed on its own
+            with hedging.deadline_errors("request"):
+                resp = sess.post(url, timeout=timeout or hedging.clip_timeout(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+                                 stream=True, **kwargs)
+        except requests.ConnectionError:  # includes ConnectTimeout; a ReadTimeout propagates
+            wait = backoff(attempt)
+            if attempt == retries or not _can_wait(wait): raise
+            time.sleep(wait)
+            continue
+        if resp.status_code not in RETRY_STATUSES or attempt == retries:
+            with hedging.deadline_errors("request"):
+                return resp, _phases(resp, stream, t_first, t0)
+        wait = backoff(attempt, _retry_after(resp))
+        if not _can_wait(wait):
+            with hedging.deadline_errors("request"):
+                return resp, _phases(resp, stream, t_first, t0)
+        resp.close()
+        time.sleep(wait)
+    return resp, {}  # unreachable; keeps linters quiet
+
+def _phases(resp: requests.Response, stream: bool, t_first: float, t0: float) -> Dict[str, Optional[float]]:
+    t_head = time.perf_counter()
+    connect, tls = _setup.connect, _setup.tls
+    transfer = None
+    if not stream:
+        resp.content  # read (and cache) the whole body now
+        transfer = time.perf_counter() - t_head
+    return {"retry_wait": t0 - t_first, "connect": connect, "tls": tls,
+            "ttfb": max(0.0, t_head - t0 - connect - tls), "transfer": transfer,
+            "server_time": server_time(resp.headers)}
+
+def _can_wait(seconds: float) -> bool:
+    rem = hedging.remaining()
+    return rem is None or seconds < rem
+
+def connect_rtt(url: str, timeout: float = HTTP_CONNECT_TIMEOUT) -> Optional[float]:
+    """TCP connect time to the URL's host in seconds (≈ one network round trip); None if unreachable."""
+    u = urlsplit(url)
+    port = u.port or (443 if u.scheme == "https" else 80)
+    t0 = time.perf_counter()
+    try:
+        with socket.create_connection((u.hostname, port), timeout=timeout):
+            return time.perf_counter() - t0
+    except OSError:
+        return None
+
+def _warm_one(url: str) -> Optional[float]:
+    rtt = connect_rtt(url)
+    if rtt is not None:
+        try:
+            # opens a TLS connection that stays parked in the pool for the first real call
+            session_for(url).head(_origin(url), timeout=(HTTP_CONNECT_TIMEOUT, HTTP_CONNECT_TIMEOUT))
+        except requests.RequestException:
+            pass
+    return rtt
+
+def warm_up(urls: Dict[str, str]) -> Dict[str, Optional[float]]:
+    """Pre-open pooled connections to every provider in parallel; returns {name: connect RTT (s) or None}."""
+    if not urls: return {}
+    with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+        futs = {name: pool.submit(_warm_one, url) for name, url in urls.items()}
+        return {name: f.result() for name, f in futs.items()}
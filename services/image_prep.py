@@ -0,0 +1,126 @@
+# services/image_prep.py — downscale, re-encode and strip images before they go to a vision model
+import base64, hashlib, io, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image, ImageOps
+from utils.config import IMAGE_MAX_EDGE, IMAGE_FORMAT, IMAGE_QUALITY, IMAGE_CACHE_MB
+
+MIME = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+def _b64_len(n: int) -> int:
+    return 4 * ((n + 2) // 3)
+
+def _data_url(data: bytes, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> Tuple[bytes, str]:
+    if fmt == "jpeg" and (img.mode in ("RGBA", "LA") or "transparency" in img.info):
+        fmt = "webp"  # JPEG has no alpha; WebP keeps it at a similar size
+    if fmt == "jpeg" and img.mode != "RGB":
+        img = img.convert("RGB")
+    elif fmt != "jpeg" and img.mode not in ("RGB", "RGBA", "L", "LA"):
+        img = img.convert("RGBA")
+    out = io.BytesIO()
+    opts = {"optimize": True} if fmt == "png" else {"quality": quality, **({"optimize": True} if fmt == "jpeg" else {"method": 4})}
+    img.save(out, fmt.upper(), **opts)  # no exif/icc/xmp passed on: metadata is dropped
+    return out.getvalue(), MIME[fmt]
+
+def prepare_image(data: bytes, mime: Optional[str] = None, max_edge: int = IMAGE_MAX_EDGE,
+                  fmt: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY) -> Dict[str, Any]:
+    """
+    {"url": data URL, "bytes_in", "bytes_out" (data URL lengths before/after), "size", "mime"}.
+    EXIF rotation is applied, then the longest edge is capped at max_edge (0 = keep) and the
+    image re-encoded without metadata (EXIF, ICC, XMP, PNG text), even when that is not
+    smaller than the upload; anything Pillow cannot read is sent as is.
+    """
+    mime = mime or "image/png"
+    raw = len(f"data:{mime};base64,") + _b64_len(len(data))
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception:
+        return {"url": _data_url(data, mime), "bytes_in": raw, "bytes_out": raw, "size": None, "mime": mime}
+    img = ImageOps.exif_transpose(img)
+    if max_edge and max(img.size) > max_edge:
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    body, out_mime = _encode(img, fmt, quality)
+    url = _data_url(body, out_mime)
+    return {"url": url, "bytes_in": raw, "bytes_out": len(url), "size": img.size, "mime": out_mime}
+
+class ImageCache:
+    """
+    Content hash + settings → prepare_image() result, LRU within a byte budget (data URL
+    lengths). Concurrent callers for the same image wait for the first one to encode it.
+    """
+    def __init__(self, budget_mb: float = IMAGE_CACHE_MB):
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.used = 0
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, data: bytes, mime: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        key = f"{hashlib.sha256(data).hexdigest()}:{mime}:{IMAGE_MAX_EDGE}:{IMAGE_FORMAT}:{IMAGE_QUALITY}"
+        with self._lock:
+            e = self._touch(key)
+            if e is not None:
+                self.hits += 1
+                return e, True
+            klock = self._key_locks.setdefault(key, threading.Lock())
+        with klock:
+            with self._lock:
+                e = self._touch(key)
+                if e is not None:
+                    self.hits += 1
+                    return e, True
+            e = prepare_image(data, mime)
+            with self._lock:
+                self.misses += 1
+                self._key_locks.pop(key, None)
+                if e["bytes_out"] <= self.budget:
+                    self.entries[key] = e
+                    self.used += e["bytes_out"]
+                    while self.used > self.budget:
+                        self.used -= self.entries.popitem(last=False)[1]["bytes_out"]
+            return e, False
+
+    def _touch(self, key: str) -> Optional[Dict[str, Any]]:
+        e = self.entries.get(key)
+        if e is not None: self.entries.move_to_end(key)
+        return e
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self.entries), "used_mb": self.used / 1048576,
+                    "budget_mb": self.budget / 1048576, "hits": self.hits, "misses": self.misses}
+
+_shared: Optional[ImageCache] = None
+_shared_lock = threading.Lock()
+
+def shared_cache() -> ImageCache:
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            _shared = _shared or ImageCache()
+    return _shared
+
+def prepare_images(images: List[bytes], mime_types: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Every image through the shared cache, several at once (Pillow releases the GIL while
+    resizing/encoding). Returns (prepared, fields) with fields as logged per call:
+    image_prep_s (wall time), image_bytes (data URLs sent), image_bytes_saved (vs. the raw upload).
+    """
+    mimes = [(mime_types[i] if mime_types and i < len(mime_types) else None) for i in range(len(images))]
+    t0 = time.perf_counter()
+    cache = shared_cache()
+    if len(images) > 1:
+        with ThreadPoolExecutor(max_workers=min(len(images), 8), thread_name_prefix="image-prep") as pool:
+            got = list(pool.map(cache.get, images, mimes))
+    else:
+        got = [cache.get(img, m) for img, m in zip(images, mimes)]
+    prepared = [p for p, _ in got]
+    return prepared, {"image_prep_s": time.perf_counter() - t0,
+                      "image_bytes": sum(p["bytes_out"] for p in prepared),
+                      "image_bytes_saved": sum(p["bytes_in"] - p["bytes_out"] for p in prepared)}
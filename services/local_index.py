@@ -0,0 +1,110 @@
+# services/local_index.py — append-only TF-IDF index for VectorDB's offline mode
+from collections import Counter
+from typing import Dict, Iterable, List
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+class IncrementalTfidfIndex:
+    """
+    Same scores as `TfidfVectorizer(...).fit_transform(all_docs)` + cosine similarity,
+    but adding documents only touches the new ones:
+      - the vocabulary grows in place (column ids are never reassigned),
+      - raw term counts are appended as CSR row blocks (merged like a binary counter,
+        so there are O(log n) blocks and each row is re-copied O(log n) times),
+      - IDF and row norms are recomputed lazily on the next search.
+    """
+    def __init__(self, ngram_range=(1, 2), strip_accents="unicode", lowercase=True):
+        self._params = dict(ngram_range=ngram_range, strip_accents=strip_accents, lowercase=lowercase)
+        self.analyzer = TfidfVectorizer(ngram_range=ngram_range, strip_accents=strip_accents,
+                                        lowercase=lowercase).build_analyzer()
+        self.vocab: Dict[str, int] = {}
+        self._df = np.zeros(1024, dtype=np.int64)  # document frequencies (grown by doubling)
+        self.blocks: List[sparse.csr_matrix] = []
+        self.n_docs = 0
+        self._weights = None  # (idf, blocks, per-block tf-idf row norms), published together by _refresh()
+
+    def __len__(self):
+        return self.n_docs
+
+    @property
+    def n_terms(self) -> int:
+        return len(self.vocab)
+
+    @property
+    def nbytes(self) -> int:
+        mats = sum(b.data.nbytes + b.indices.nbytes + b.indptr.nbytes for b in self.blocks)
+        return int(mats + self._df.nbytes + len(self.vocab) * 100)
+
+    def clear(self):
+        self.__init__(**self._params)
+
+    def add(self, texts: Iterable[str]):
+        vocab, indptr, indices, data = self.vocab, [0], [], []
+        for t in texts:
+            counts = Counter()
+            for term in self.analyzer(t):
+                j = vocab.get(term)
+                if j is None:
+                    j = vocab[term] = len(vocab)
+                counts[j] += 1
+            indices.extend(counts.keys()); data.extend(counts.values())
+            indptr.append(len(indices))
+        n = len(indptr) - 1
+        if not n: return
+        cols = np.asarray(indices, dtype=np.int32)
+        if len(vocab) > len(self._df):
+            grown = np.zeros(max(len(vocab), 2 * len(self._df)), dtype=np.int64)
+            grown[:len(self._df)] = self._df
+            self._df = grown
+        np.add.at(self._df, cols, 1)  # columns are unique within a row → one hit per doc
+        block = sparse.csr_matrix((np.asarray(data, dtype=np.float64), cols, np.asarray(indptr, dtype=np.int64)),
+                                  shape=(n, len(vocab)))
+        self.blocks.append(block)
+        self.n_docs += n
+        self._merge_tail()
+        self._weights = None
+
+    def _merge_tail(self):
+        while len(self.blocks) > 1 and self.blocks[-2].shape[0] <= self.blocks[-1].shape[0]:
+            b = self.blocks.pop(); a = self.blocks.pop()
+            w = max(a.shape[1], b.shape[1])
+            self.blocks.append(sparse.vstack([_widen(a, w), _widen(b, w)], format="csr"))
+
+    def _refresh(self):
+        """
+        idf and norms are built in locals and published in one assignment: the index is shared
+        between sessions (retrieval/index_cache.py), so concurrent first searches must never
+        see an idf without its norms.
+        """
+        weights = self._weights
+        if weights is not None: return weights
+        blocks = list(self.blocks)
+        df = self._df[:max(b.shape[1] for b in blocks)]
+        idf = np.log((1 + sum(b.shape[0] for b in blocks)) / (1 + df)) + 1.0  # sklearn's smooth_idf
+        idf2 = idf ** 2
+        norms = [np.sqrt(b.multiply(b).tocsr() @ idf2[:b.shape[1]]) for b in blocks]
+        self._weights = weights = (idf, blocks, norms)
+        return weights
+
+    def scores(self, query: str) -> np.ndarray:
+        """Cosine similarity of the query against every document, in insertion order."""
+        if not self.n_docs: return np.zeros(0)
+        idf, blocks, block_norms = self._refresh()
+        q = np.zeros(len(idf))
+        for term in self.analyzer(query):
+            j = self.vocab.get(term)
+            if j is not None and j < len(q): q[j] += 1
+        q *= idf
+        qn = np.linalg.norm(q)
+        if qn == 0: return np.zeros(sum(b.shape[0] for b in blocks))
+        q /= qn
+        out = []
+        for b, norms in zip(blocks, block_norms):
+            s = b @ (q[:b.shape[1]] * idf[:b.shape[1]])
+            out.append(np.divide(s, norms, out=np.zeros_like(s), where=norms > 0))
+        return np.concatenate(out)
+
+def _widen(m: sparse.csr_matrix, width: int) -> sparse.csr_matrix:
+    if m.shape[1] == width: return m
+    return sparse.csr_matrix((m.data, m.indices, m.indptr), shape=(m.shape[0], width))
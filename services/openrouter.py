@@ -1,15 +1,26 @@
 # services/openrouter.py
-import base64, time, requests
-from typing import Dict, List, Tuple, Optional
-from utils.config import OPENROUTER_API_KEY, OPENROUTER_TEXT_MODEL, OPENROUTER_VISION_MODEL
+import time, requests
+from services.http_session import post_timed
+from typing import Callable, Dict, List, Tuple, Optional
+from utils.config import OPENROUTER_API_KEY, OPENROUTER_TEXT_MODEL, OPENROUTER_VISION_MODEL, OPENROUTER_BASE_URL
+from services.streaming import read_sse
+from services.response_cache import cached_call
+from services.scheduler import shared_scheduler, estimate_tokens, used_tokens, INTERACTIVE
+from services.hedging import hedged, deadline_at
+from services.image_prep import prepare_images
 
-URL = "https://openrouter.ai/api/v1/chat/completions"
+URL = f"{OPENROUTER_BASE_URL}/chat/completions"
 
 class OpenRouterClient:
-    def __init__(self, api_key: str = OPENROUTER_API_KEY):
+    def __init__(self, api_key: str = OPENROUTER_API_KEY, priority: int = INTERACTIVE,
+                 model: str = OPENROUTER_TEXT_MODEL, vision_model: Optional[str] = OPENROUTER_VISION_MODEL,
+                 hedge_after: Optional[Dict[str, float]] = None):
         if not api_key:
             raise ValueError("Missing OPENROUTER_API_KEY")
         self.api_key = api_key
+        self.model, self.vision_model = model, vision_model
+        self.priority = priority  # scheduler class: INTERACTIVE (pages) or BATCH (batch_eval)
+        self.hedge_after = hedge_after or {}  # {"latency"|"ttft": seconds} before a duplicate is sent
 
     def _headers(self):
         return {
@@ -18,20 +29,47 @@ class OpenRouterClient:
             "X-Title": "LLM Comparison Workbench"
         }
 
-    def _run(self, model: str, messages: List[Dict], max_tokens: int = 512) -> Tuple[str, Dict, float]:
-        t0 = time.time()
-        resp = requests.post(URL, headers=self._headers(), json={
-            "model": model, "messages": messages, "max_tokens": max_tokens
-        }, timeout=60)
-        t1 = time.time()
+    def _run(self, model: str, messages: List[Dict], max_tokens: int = 512,
+             stream: bool = False, on_token: Optional[Callable[[str], None]] = None,
+             use_cache: bool = True) -> Tuple[str, Dict, float]:
+        return cached_call("openrouter", model, messages, max_tokens, use_cache, on_token,
+                           lambda: self._request(model, messages, max_tokens, stream, on_token))
+
+    def _request(self, model: str, messages: List[Dict], max_tokens: int,
+                 stream: bool, on_token: Optional[Callable[[str], None]]) -> Tuple[str, Dict, float]:
+        # wait for the shared RPM/TPM budget; latency below starts once admitted
+        est = estimate_tokens(messages, max_tokens, model)
+        def attempt(cb, admitted):
+            with shared_scheduler().slot("openrouter", model, est, self.priority, deadline_at()) as slot:
+                admitted()
+                content, usage, latency = self._send(model, messages, max_tokens, stream, cb)
+                slot.settle(used_tokens(usage))
+            return content, {**usage, "queue_wait": slot.queue_wait}, latency
+        (content, usage, latency), hedge = hedged(attempt, self.hedge_after.get("ttft" if stream else "latency"), on_token)
+        return content, {**usage, **hedge}, latency
+
+    def _send(self, model: str, messages: List[Dict], max_tokens: int,
+              stream: bool, on_token: Optional[Callable[[str], None]]) -> Tuple[str, Dict, float]:
+        body = {"model": model, "messages": messages, "max_tokens": max_tokens}
+        if stream:
+            body.update(stream=True, stream_options={"include_usage": True})
+        t0 = time.perf_counter()
+        resp, phases = post_timed(URL, headers=self._headers(), json=body, stream=stream)
         try:
             resp.raise_for_status()
         except requests.HTTPError:
             raise ValueError(f"❌ OpenRouter request rejected. Model={model}. Response: {resp.text}")
+        if stream:
+            t1 = time.perf_counter()
+            content, usage = read_sse(resp, t0, on_token)
+            t2 = time.perf_counter()
+            return content, {**usage, **phases, "transfer": t2 - t1 - usage["decode"]}, t2 - t0
+        t1 = time.perf_counter()
         data = resp.json()
         content = data["choices"][0]["message"]["content"]
-        usage = data.get("usage", {})
+        usage = {**data.get("usage", {}), **phases, "decode": time.perf_counter() - t1}
         latency = t1 - t0
+        if on_token: on_token(content)
         return content, usage, latency
 
     def chat_text(
@@ -39,13 +77,16 @@ class OpenRouterClient:
         prompt: str,
         system: str = "You are a helpful assistant.",
         context: str = "",
-        max_tokens: int = 512
+        max_tokens: int = 512,
+        stream: bool = False,
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True
     ):
         messages = [{"role": "system", "content": system}]
         if context:
             messages.append({"role": "user", "content": f"Context:\n{context}"})
         messages.append({"role": "user", "content": prompt})
-        return self._run(OPENROUTER_TEXT_MODEL, messages, max_tokens)
+        return self._run(self.model, messages, max_tokens, stream, on_token, use_cache)
 
     def chat_vision(
         self,
@@ -53,12 +94,14 @@ class OpenRouterClient:
         images: List[bytes],
         system: str = "You are a helpful vision assistant.",
         max_tokens: int = 512,
-        mime_types: Optional[List[str]] = None  # <-- supports PNG/JPG correctly
+        mime_types: Optional[List[str]] = None,  # <-- supports PNG/JPG correctly
+        stream: bool = False,
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True
     ):
-        parts = [{"type": "text", "text": prompt}]
-        for i, img in enumerate(images):
-            b64 = base64.b64encode(img).decode("utf-8")
-            mt = (mime_types[i] if mime_types and i < len(mime_types) and mime_types[i] else "image/png")
-            parts.append({"type": "image_url", "image_url": {"url": f"data:{mt};base64,{b64}"}})
+        # downscaled, re-encoded, metadata-free data URLs (cached by content hash; see services/image_prep.py)
+        prepared, prep = prepare_images(images, mime_types)
+        parts = [{"type": "text", "text": prompt}] + [{"type": "image_url", "image_url": {"url": p["url"]}} for p in prepared]
         messages = [{"role": "system", "content": system}, {"role": "user", "content": parts}]
-        return self._run(OPENROUTER_VISION_MODEL, messages, max_tokens)
+        content, usage, latency = self._run(self.vision_model or self.model, messages, max_tokens, stream, on_token, use_cache)
+        return content, {**usage, **prep}, latency
@@ -0,0 +1,43 @@
+# services/registry.py — the contenders configured in utils/config.MODELS, and clients for them
+from typing import Any, Callable, Dict, List, Optional
+from services.openrouter import OpenRouterClient
+from services.groq_llama import GroqClient
+from services.scheduler import INTERACTIVE
+from utils.config import MODELS
+
+# provider name → client factory(spec, priority, hedge_after); every client exposes chat_text (and chat_vision
+# when the spec has a vision_model) returning (content, usage, latency)
+PROVIDERS: Dict[str, Callable[..., Any]] = {
+    "openrouter": lambda m, p, h: OpenRouterClient(priority=p, model=m["model"], vision_model=m.get("vision_model"), hedge_after=h),
+    "groq": lambda m, p, h: GroqClient(priority=p, model=m["model"], hedge_after=h),
+}
+
+def models(vision: Optional[bool] = None) -> List[Dict]:
+    """Registered contenders in display order (vision=True: only those that accept images)."""
+    return [m for m in MODELS if vision is None or bool(m.get("vision_model")) == vision]
+
+def keys() -> List[str]:
+    return [m["key"] for m in MODELS]
+
+def spec(key: str) -> Dict:
+    return next(m for m in MODELS if m["key"] == key)
+
+def label(key: str) -> str:
+    """UI name for a model key; keys no longer registered (older runs) show as themselves."""
+    return next((m["label"] for m in MODELS if m["key"] == key), key)
+
+def short(key: str) -> str:
+    return next((m["short"] for m in MODELS if m["key"] == key), key)
+
+def client(m: Dict, priority: int = INTERACTIVE, hedge_after: Optional[Dict[str, float]] = None):
+    if m["provider"] not in PROVIDERS:
+        raise ValueError(f"Unknown provider {m['provider']!r} for model {m['key']!r}")
+    return PROVIDERS[m["provider"]](m, priority, hedge_after)
+
+def clients(priority: int = INTERACTIVE, hedge: Optional[Dict[str, Dict[str, float]]] = None) -> Dict[str, Any]:
+    """
+    {key: client} for every registered model (raises on a missing API key, like the clients do).
+    hedge: {key: {"latency"|"ttft": seconds}} (MetricsTracker.hedge_delays); models without
+    an entry are never hedged.
+    """
+    return {m["key"]: client(m, priority, (hedge or {}).get(m["key"])) for m in MODELS}
@@ -0,0 +1,99 @@
+# services/response_cache.py — on-disk cache of chat completions (SQLite, LRU + TTL)
+import hashlib, json, os, sqlite3, threading, time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.config import RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_PATH, RESPONSE_CACHE_MB, RESPONSE_CACHE_TTL_H
+
+# Timings/outcomes that describe one particular request; never replayed from the cache
+_PER_REQUEST = ("ttft", "itl", "tps", "queue_wait", "cache_hit", "hedged", "hedge_winner",
+                "retry_wait", "connect", "tls", "ttfb", "transfer", "decode", "server_time")
+
+def cache_key(provider: str, model: str, messages: List[Dict], max_tokens: int) -> str:
+    """Stable hash of everything that determines the answer (system/context/prompt live in messages)."""
+    blob = json.dumps({"p": provider, "m": model, "msg": messages, "max": max_tokens},
+                      sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, max_mb: float = RESPONSE_CACHE_MB,
+                 ttl_h: float = RESPONSE_CACHE_TTL_H):
+        self.path, self.max_bytes, self.ttl = path, int(max_mb * 1048576), ttl_h * 3600
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as c:
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("""CREATE TABLE IF NOT EXISTS responses(
+                key TEXT PRIMARY KEY, content TEXT, usage TEXT,
+                created REAL, accessed REAL, size INTEGER)""")
+            c.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+
+    @contextmanager
+    def _conn(self):
+        # short-lived connections: safe across Streamlit sessions, threads and processes
+        c = sqlite3.connect(self.path, timeout=10)
+        try:
+            with c: yield c  # commit / rollback
+        finally:
+            c.close()
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict]]:
+        now = time.time()
+        with self._conn() as c:
+            row = c.execute("SELECT content, usage, created FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None: return None
+            if self.ttl and now - row[2] > self.ttl:
+                c.execute("DELETE FROM responses WHERE key=?", (key,))
+                return None
+            c.execute("UPDATE responses SET accessed=? WHERE key=?", (now, key))
+        return row[0], json.loads(row[1] or "{}")
+
+    def put(self, key: str, content: str, usage: Dict):
+        usage = {k: v for k, v in (usage or {}).items() if k not in _PER_REQUEST}
+        u = json.dumps(usage)
+        now, size = time.time(), len(content.encode("utf-8")) + len(u) + len(key)
+        with self._conn() as c:
+            c.execute("INSERT OR REPLACE INTO responses VALUES (?,?,?,?,?,?)", (key, content, u, now, now, size))
+            total = c.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(c, total - self.max_bytes)
+
+    def _evict(self, c, excess: int):
+        """Drop least recently used rows until `excess` bytes are freed."""
+        freed, doomed = 0, []
+        for k, size in c.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            doomed.append((k,)); freed += size
+            if freed >= excess: break
+        c.executemany("DELETE FROM responses WHERE key=?", doomed)
+
+    def clear(self):
+        with self._conn() as c:
+            c.execute("DELETE FROM responses")
+
+_shared: Optional[ResponseCache] = None
+_lock = threading.Lock()
+
+def shared_cache() -> ResponseCache:
+    global _shared
+    if _shared is None:
+        with _lock:
+            _shared = _shared or ResponseCache()
+    return _shared
+
+def cached_call(provider: str, model: str, messages: List[Dict], max_tokens: int, use_cache: bool,
+                on_token: Optional[Callable[[str], None]], call: Callable[[], Tuple[str, Dict, float]]):
+    """
+    Serve (content, usage, latency) from the cache when allowed, else run `call` and store
+    its result. usage["cache_hit"] tells the two apart; a hit's latency is the lookup time.
+    """
+    if not (use_cache and RESPONSE_CACHE_ENABLED):
+        content, usage, latency = call()
+        return content, {**usage, "cache_hit": False}, latency
+    t0 = time.perf_counter()
+    key = cache_key(provider, model, messages, max_tokens)
+    hit = shared_cache().get(key)
+    if hit is not None:
+        content, usage = hit
+        if on_token: on_token(content)
+        return content, {**usage, "cache_hit": True}, time.perf_counter() - t0
+    content, usage, latency = call()
+    shared_cache().put(key, content, usage)
+    return content, {**usage, "cache_hit": False}, latency
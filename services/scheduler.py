@@ -0,0 +1,192 @@
+# services/scheduler.py — process-wide admission control for provider calls (RPM / TPM / concurrency)
+#
+# Every Streamlit session and batch job in the process shares one Scheduler, so the
+# provider limits hold for the whole team rather than per browser tab. A call is admitted
+# once its (provider, model) lane has a free concurrency slot, a request token and enough
+# TPM tokens for its estimated prompt plus max_tokens; the time spent waiting for that is
+# reported as usage["queue_wait"], separate from the provider latency.
+#
+# Interactive calls always go ahead of batch calls, and batch calls may not use the last
+# SCHEDULER_RESERVE share of any bucket or concurrency slot, so a batch run can slow
+# itself down but cannot starve the pages.
+import heapq, itertools, threading, time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from utils.config import SCHEDULER_LIMITS, SCHEDULER_RESERVE
+from evaluators.tokenizer import count_tokens
+from services.hedging import DeadlineExceeded
+
+INTERACTIVE, BATCH = 0, 1
+IMAGE_TOKENS = 765  # rough per-image charge (OpenAI high-detail 1024px tile estimate)
+_arrivals = itertools.count()
+
+class TokenBucket:
+    """Continuously refilled bucket: `per_minute` tokens per minute, holding at most that many (0 = unlimited)."""
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._t = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._t) * self.rate)
+        self._t = now
+
+    def wait_for(self, n: float, floor: float, now: float) -> float:
+        """Seconds until `n` tokens can be taken while leaving `floor` in the bucket (0 = now)."""
+        if not self.capacity: return 0.0
+        self._refill(now)
+        n = min(n, self.capacity - floor)  # an oversize request waits for a full bucket, not forever
+        short = n + floor - self.level
+        return 0.0 if short <= 0 else short / self.rate
+
+    def take(self, n: float):
+        if self.capacity: self.level -= min(n, self.capacity)
+
+    def give(self, n: float):
+        if self.capacity: self.level = min(self.capacity, self.level + n)
+
+class Ticket:
+    """One admitted call: how long it queued, and what it was charged (settled with real usage later)."""
+    __slots__ = ("lane", "tokens", "priority", "queue_wait")
+    def __init__(self, lane: "Lane", tokens: int, priority: int):
+        self.lane, self.tokens, self.priority, self.queue_wait = lane, tokens, priority, 0.0
+
+    def settle(self, actual_tokens: Optional[int]):
+        """Refund an over-estimate / charge an under-estimate once the provider reports usage."""
+        if actual_tokens is None: return
+        with self.lane.cond:
+            delta = actual_tokens - self.tokens
+            if delta < 0: self.lane.tpm.give(-delta)
+            else: self.lane.tpm.take(delta)
+            self.tokens = actual_tokens
+            self.lane.cond.notify_all()
+
+class Lane:
+    """Limits and wait queue of one (provider, model)."""
+    def __init__(self, rpm: float = 0, tpm: float = 0, concurrency: int = 0, reserve: float = SCHEDULER_RESERVE):
+        self.rpm, self.tpm = TokenBucket(rpm), TokenBucket(tpm)
+        self.concurrency, self.reserve = int(concurrency), reserve
+        self.active = 0
+        self.waiting: List[Tuple[int, int, Ticket]] = []  # heap of (priority, arrival, ticket)
+        self.cond = threading.Condition()
+        self.stats = {"admitted": 0, "queue_wait": 0.0, "max_wait": 0.0}
+
+    def _delay(self, t: Ticket, now: float) -> Optional[float]:
+        """0 if `t` can start now, seconds to sleep if a bucket is short, None if blocked on a slot."""
+        batch = t.priority >= BATCH
+        if self.concurrency:
+            cap = self.concurrency - (max(1, round(self.concurrency * self.reserve)) if batch and self.concurrency > 1 else 0)
+            if self.active >= cap: return None
+        floor = lambda b: b.capacity * self.reserve if batch else 0.0
+        return max(self.rpm.wait_for(1, floor(self.rpm), now), self.tpm.wait_for(t.tokens, floor(self.tpm), now))
+
+    def acquire(self, tokens: int, priority: int, deadline: Optional[float] = None) -> Ticket:
+        """Wait for admission; TimeoutError once time.monotonic() passes `deadline` (None = wait as long as it takes)."""
+        t = Ticket(self, tokens, priority)
+        entry = (priority, next(_arrivals), t)
+        t0 = time.monotonic()
+        with self.cond:
+            heapq.heappush(self.waiting, entry)
+            while True:
+                now = time.monotonic()
+                if self.waiting[0] is entry:  # strict order: nobody overtakes a higher-priority/older call
+                    delay = self._delay(t, now)
+                    if delay == 0: break
+                else:
+                    delay = None
+                if deadline is not None:
+                    if now >= deadline:
+                        self.waiting.remove(entry); heapq.heapify(self.waiting)
+                        self.cond.notify_all()
+                        raise DeadlineExceeded(f"queued {now - t0:.1f}s for provider capacity, past the run deadline")
+                    delay = deadline - now if delay is None else min(delay, deadline - now)
+                self.cond.wait(timeout=delay)
+            heapq.heappop(self.waiting)
+            self.rpm.take(1); self.tpm.take(tokens); self.active += 1
+            t.queue_wait = time.monotonic() - t0
+            self.stats["admitted"] += 1; self.stats["queue_wait"] += t.queue_wait
+            self.stats["max_wait"] = max(self.stats["max_wait"], t.queue_wait)
+            self.cond.notify_all()  # the next in line re-checks
+        return t
+
+    def release(self, t: Ticket):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+class Scheduler:
+    def __init__(self, limits: Dict[str, Dict[str, float]] = SCHEDULER_LIMITS):
+        self.limits = limits
+        self.lanes: Dict[Tuple[str, str], Lane] = {}
+        self._lock = threading.Lock()
+
+    def lane(self, provider: str, model: str) -> Lane:
+        """Provider limits apply per model (that's how Groq and OpenRouter count them); "provider:model" overrides."""
+        key = (provider, model)
+        with self._lock:
+            ln = self.lanes.get(key)
+            if ln is None:
+                ln = self.lanes[key] = Lane(**self.limits.get(f"{provider}:{model}", self.limits.get(provider, {})))
+            return ln
+
+    def set_limits(self, provider: str, **limits):
+        """Override one provider's limits (e.g. batch_eval flags); its lanes restart with fresh buckets."""
+        with self._lock:
+            self.limits = {**self.limits, provider: {**self.limits.get(provider, {}), **limits}}
+            for key in [k for k in self.lanes if k[0] == provider]: del self.lanes[key]
+
+    @contextmanager
+    def slot(self, provider: str, model: str, tokens: int, priority: int = INTERACTIVE,
+             deadline: Optional[float] = None) -> Iterator[Ticket]:
+        """Block until the call may start (or raise at `deadline`); the concurrency slot is held for the body."""
+        ln = self.lane(provider, model)
+        t = ln.acquire(tokens, priority, deadline)
+        try:
+            yield t
+        finally:
+            ln.release(t)
+
+    def snapshot(self) -> List[Dict]:
+        """Per-lane state for display: queued, running, bucket levels and average queue wait."""
+        out = []
+        with self._lock: lanes = list(self.lanes.items())
+        for (provider, model), ln in lanes:
+            with ln.cond:
+                now = time.monotonic()
+                ln.rpm._refill(now); ln.tpm._refill(now)
+                n = ln.stats["admitted"]
+                out.append({"provider": provider, "model": model, "queued": len(ln.waiting), "running": ln.active,
+                            "rpm_left": round(ln.rpm.level, 1) if ln.rpm.capacity else None,
+                            "tpm_left": round(ln.tpm.level) if ln.tpm.capacity else None,
+                            "admitted": n, "avg_wait_s": ln.stats["queue_wait"] / n if n else 0.0,
+                            "max_wait_s": ln.stats["max_wait"]})
+        return out
+
+def estimate_tokens(messages: List[Dict], max_tokens: int, model: Optional[str] = None) -> int:
+    """What a call may use against TPM: prompt text (+ a flat charge per image) plus max_tokens."""
+    n = max_tokens
+    for m in messages:
+        content = m.get("content")
+        if isinstance(content, str):
+            n += count_tokens(content, model)
+        else:
+            for part in content or []:
+                n += count_tokens(part.get("text", ""), model) if part.get("type") == "text" else IMAGE_TOKENS
+    return n
+
+def used_tokens(usage: Dict) -> Optional[int]:
+    """Tokens the provider reported for the call, if it did."""
+    if usage.get("total_tokens") is not None: return int(usage["total_tokens"])
+    if usage.get("prompt_tokens") is None and usage.get("completion_tokens") is None: return None
+    return int(usage.get("prompt_tokens") or 0) + int(usage.get("completion_tokens") or 0)
+
+_shared: Optional[Scheduler] = None
+_lock = threading.Lock()
+
+def shared_scheduler() -> Scheduler:
+    global _shared
+    if _shared is None:
+        with _lock:
+            _shared = _shared or Scheduler()
+    return _shared
@@ -0,0 +1,46 @@
+# services/streaming.py — OpenAI-style SSE reader shared by the chat clients
+import json, time
+from typing import Callable, Dict, Optional, Tuple
+
+def read_sse(resp, t0: float, on_token: Optional[Callable[[str], None]] = None) -> Tuple[str, Dict]:
+    """
+    Consume a `stream: true` chat-completions body.
+    t0 is the perf_counter() taken just before the request was sent.
+    Returns (content, usage) where usage also carries the stream timings:
+      ttft – seconds to the first content token
+      itl  – mean gap between content tokens (s)
+      tps  – output tokens per second after the first token
+      decode – seconds spent parsing the chunks' JSON
+    """
+    parts, stamps, usage, decode = [], [], {}, 0.0
+    for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue  # keep-alives / comments
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            break
+        t = time.perf_counter()
+        chunk = json.loads(payload)
+        decode += time.perf_counter() - t
+        # OpenRouter sends usage on the last chunk; Groq nests it under x_groq
+        usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or usage
+        for ch in chunk.get("choices") or []:
+            delta = (ch.get("delta") or {}).get("content")
+            if delta:
+                stamps.append(time.perf_counter())
+                parts.append(delta)
+                if on_token: on_token(delta)
+    usage = dict(usage or {})
+    usage.update(stream_stats(t0, stamps, usage.get("completion_tokens")), decode=decode)
+    return "".join(parts), usage
+
+def stream_stats(t0: float, stamps, out_tokens: Optional[int] = None) -> Dict[str, Optional[float]]:
+    if not stamps:
+        return {"ttft": None, "itl": None, "tps": None}
+    gen = stamps[-1] - stamps[0]
+    n = out_tokens or len(stamps)  # one delta ≈ one token when usage is missing
+    return {
+        "ttft": stamps[0] - t0,
+        "itl": gen / (len(stamps) - 1) if len(stamps) > 1 else None,
+        "tps": (n - 1) / gen if gen > 0 and n > 1 else None,
+    }
@@ -1,18 +1,39 @@
 from typing import List, Dict, Optional, Tuple
-import uuid
-from utils.config import QDRANT_URL, QDRANT_API_KEY, JINA_API_KEY
+import hashlib, threading, uuid
+from concurrent.futures import ThreadPoolExecutor
+from utils.config import QDRANT_URL, QDRANT_API_KEY, JINA_API_KEY, QDRANT_UPSERT_BATCH, QDRANT_UPSERT_WORKERS
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qm
 from services.embeddings_jina import JinaEmbeddings, JINA_DIM
+from services.local_index import IncrementalTfidfIndex
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
+POINT_NS = uuid.UUID("6f1c2a0e-8d5b-4f6e-9a3c-2b7d4e1f0a95")  # fixed namespace for uuid5 point ids
+
+def point_id(doc_id: str, chunk: Dict) -> str:
+    """
+    Same document + same span + same text → same id, so re-indexing is idempotent. doc_id is
+    the content hash unless the user names the document: a named document keeps its id when
+    edited, so its unchanged chunks are skipped and its removed ones deleted.
+    """
+    md = chunk.get("metadata") or {}
+    digest = hashlib.sha1(chunk["text"].encode("utf-8")).hexdigest()[:16]
+    return str(uuid.uuid5(POINT_NS, f"{doc_id}:{md.get('start')}:{md.get('end')}:{digest}"))
+
+def _doc_filter(doc_id: str):
+    return qm.Filter(must=[qm.FieldCondition(key="doc_id", match=qm.MatchValue(value=doc_id))])
+
+# (collection, doc_id) → content version this process last synced it to, so a cached index
+# whose document was since re-indexed with other content is re-synced before it is searched
+_synced: Dict[Tuple[str, str], str] = {}
+_sync_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_synced_lock = threading.Lock()
+
 class VectorDB:
     """
     If Qdrant + Jina keys exist → hosted vector search.
-    Else → local TF-IDF matrix (no network).
+    Else → local incremental TF-IDF index (no network).
     """
     def __init__(self, collection="benchmark_chunks"):
         self.collection = collection
@@ -21,61 +42,115 @@ class VectorDB:
             self.client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, timeout=30)
             cols = {c.name for c in self.client.get_collections().collections}
             if self.collection not in cols:
-                self.client.create_collection(
-                    collection_name=self.collection,
-                    vectors_config=qm.VectorParams(size=JINA_DIM, distance=qm.Distance.COSINE)
-                )
+                self._create()
             self.embedder = JinaEmbeddings()
+            self.last_sync: Dict[str, int] = {}
         else:
             self.docs: List[Dict] = []
-            self.vec = TfidfVectorizer(ngram_range=(1,2), strip_accents="unicode", lowercase=True)
-            self.mat = None
+            self.index = IncrementalTfidfIndex(ngram_range=(1,2), strip_accents="unicode", lowercase=True)
+
+    @property
+    def nbytes(self) -> int:
+        """Local memory held by the index (hosted vectors live in Qdrant)."""
+        return 0 if self.hosted else self.index.nbytes
+
+    def _create(self):
+        self.client.create_collection(
+            collection_name=self.collection,
+            vectors_config=qm.VectorParams(size=JINA_DIM, distance=qm.Distance.COSINE)
+        )
+        try:
+            self.client.create_payload_index(self.collection, field_name="doc_id",
+                                             field_schema=qm.PayloadSchemaType.KEYWORD)
+        except Exception:
+            pass  # local/in-memory Qdrant has no payload indexes
 
     def clear(self):
+        """Drop *everything* in the collection; prefer delete_document() for one document."""
         if self.hosted:
             try:
                 self.client.delete_collection(self.collection)
             except Exception:
                 pass
-            self.client.create_collection(
-                collection_name=self.collection,
-                vectors_config=qm.VectorParams(size=JINA_DIM, distance=qm.Distance.COSINE)
-            )
+            self._create()
         else:
             self.docs = []
-            self.mat = None
+            self.index.clear()
+
+    def _doc_point_ids(self, doc_id: str) -> List:
+        ids, offset = [], None
+        while True:
+            pts, offset = self.client.scroll(self.collection, scroll_filter=_doc_filter(doc_id), limit=1024,
+                                             offset=offset, with_payload=False, with_vectors=False)
+            ids.extend(p.id for p in pts)
+            if offset is None: return ids
+
+    def delete_document(self, doc_id: str):
+        if self.hosted:
+            self.client.delete(self.collection, points_selector=qm.FilterSelector(filter=_doc_filter(doc_id)), wait=False)
+
+    def sync_document(self, doc_id: str, chunks: List[Dict], version: str) -> bool:
+        """
+        Make doc_id's points match `chunks` (add_chunks' delta sync) unless this process already
+        did so for this content `version`; returns whether a sync ran. No-op for the local index.
+        """
+        if not self.hosted: return False
+        key = (self.collection, doc_id)
+        with _synced_lock:
+            lock = _sync_locks.setdefault(key, threading.Lock())
+        with lock:
+            if _synced.get(key) == version: return False
+            self.add_chunks(chunks, doc_id=doc_id)
+            _synced[key] = version
+        return True
 
-    def add_chunks(self, chunks: List[Dict]):
+    def add_chunks(self, chunks: List[Dict], doc_id: Optional[str] = None):
         """
         chunks: [{"text": str, "metadata": {...}}]
+        Hosted with a doc_id, this syncs the document instead of blindly appending: chunks whose
+        (doc, span, text) id already exists are skipped, only the delta is embedded and upserted
+        (in parallel batches, wait=False), and the document's points that are no longer present
+        are deleted. Other documents in the collection are untouched.
         """
         if not chunks: return
         texts = [c["text"] for c in chunks]
         if self.hosted:
-            vecs = self.embedder.embed(texts)
-            pts = []
-            for vec, c in zip(vecs, chunks):
-                pts.append(qm.PointStruct(
-                    id=str(uuid.uuid4()),
-                    vector=[float(x) for x in vec],
-                    payload={"text": c["text"], **(c.get("metadata") or {})}
-                ))
-            self.client.upsert(collection_name=self.collection, points=pts)
+            ids = [point_id(doc_id or "", c) for c in chunks]
+            existing = set(self._doc_point_ids(doc_id)) if doc_id else set()
+            new = [(pid, c) for pid, c in zip(ids, chunks) if pid not in existing]
+            vecs = self.embedder.embed([c["text"] for _, c in new]) if new else []
+            pts = [qm.PointStruct(
+                id=pid,
+                vector=[float(x) for x in vec],
+                payload={"text": c["text"], "doc_id": doc_id, **(c.get("metadata") or {})}
+            ) for (pid, c), vec in zip(new, vecs)]
+            batches = [pts[i:i + QDRANT_UPSERT_BATCH] for i in range(0, len(pts), QDRANT_UPSERT_BATCH)]
+            if batches:
+                with ThreadPoolExecutor(max_workers=min(QDRANT_UPSERT_WORKERS, len(batches))) as pool:
+                    list(pool.map(lambda b: self.client.upsert(self.collection, points=b, wait=False), batches))
+            keep = set(ids)
+            stale = [pid for pid in existing if str(pid) not in keep]
+            if stale:
+                self.client.delete(self.collection, points_selector=qm.PointIdsList(points=stale), wait=False)
+            self.last_sync = {"chunks": len(chunks), "skipped": len(chunks) - len(new),
+                              "upserted": len(pts), "deleted": len(stale)}
         else:
-            # Local TF-IDF
+            # Local TF-IDF: only the new chunks are tokenized; IDF is refreshed lazily on search
             self.docs.extend(chunks)
-            self.mat = self.vec.fit_transform([d["text"] for d in self.docs])
+            self.index.add(texts)
 
-    def search_with_scores(self, query: str, k: int = 6) -> List[Tuple[str, float, Dict]]:
+    def search_with_scores(self, query: str, k: int = 6, doc_id: Optional[str] = None) -> List[Tuple[str, float, Dict]]:
         """
         Returns list of (text, score, payload/metadata)
+        doc_id restricts hosted search to one document (the local index only ever holds its own chunks).
         """
         if not query.strip(): return []
         if self.hosted:
             qv = self.embedder.embed([query])[0]
             res = self.client.search(
                 collection_name=self.collection,
-                query_vector=qv, limit=k, with_payload=True, score_threshold=None
+                query_vector=qv, limit=k, with_payload=True, score_threshold=None,
+                query_filter=_doc_filter(doc_id) if doc_id else None
             )
             out = []
             for r in res:
@@ -84,9 +159,11 @@ class VectorDB:
             return out
         else:
             if not self.docs: return []
-            qv = self.vec.transform([query])
-            sims = cosine_similarity(qv, self.mat)[0]
-            idxs = sims.argsort()[::-1][:k]
+            sims = self.index.scores(query)
+            k = min(k, len(sims))
+            if k <= 0: return []
+            top = np.argpartition(-sims, k - 1)[:k]
+            idxs = top[np.argsort(-sims[top], kind="stable")]
             out = []
             for i in idxs:
                 out.append((self.docs[i]["text"], float(sims[i]), self.docs[i].get("metadata", {})))
@@ -1,4 +1,4 @@
-import os
+import json, os, sys
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,6 +11,15 @@ JINA_API_KEY = os.getenv("JINA_API_KEY", "")
 QDRANT_URL = os.getenv("QDRANT_URL", "")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", "")
 
+# Qdrant upserts: points per request and requests in flight (services/vectordb_qdrant.py)
+QDRANT_UPSERT_BATCH   = int(os.getenv("QDRANT_UPSERT_BATCH", "256"))
+QDRANT_UPSERT_WORKERS = int(os.getenv("QDRANT_UPSERT_WORKERS", "4"))
+
+# Jina embeddings: request size, parallel requests, on-disk cache (services/embeddings_jina.py)
+JINA_BATCH_SIZE  = int(os.getenv("JINA_BATCH_SIZE", "64"))
+JINA_MAX_WORKERS = int(os.getenv("JINA_MAX_WORKERS", "4"))
+EMBED_CACHE_DIR  = os.getenv("EMBED_CACHE_DIR", ".cache/embeddings")
+
 # ==== Models (defaults are safe) ====
 OPENROUTER_TEXT_MODEL   = os.getenv("OPENROUTER_TEXT_MODEL",   "openai/gpt-4o-mini")
 OPENROUTER_VISION_MODEL = os.getenv("OPENROUTER_VISION_MODEL", "openai/gpt-4o-mini")  # same route supports images
@@ -19,6 +28,106 @@ OPENROUTER_VISION_MODEL = os.getenv("OPENROUTER_VISION_MODEL", "openai/gpt-4o-mi
 # Use one of Groq’s current models (older llama3-8b-8192 is decommissioned)
 GROQ_TEXT_MODEL = os.getenv("GROQ_TEXT_MODEL", "llama-3.1-8b-instant")
 
+# OpenAI-compatible API roots; point both at benchmarks/mock_provider.py to run without the real providers
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1").rstrip("/")
+GROQ_BASE_URL       = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1").rstrip("/")
+
+# ==== HTTP (shared pooled sessions, see services/http_session.py) ====
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT    = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_POOL_SIZE       = int(os.getenv("HTTP_POOL_SIZE", "8"))       # keep-alive connections per host
+HTTP_MAX_RETRIES     = int(os.getenv("HTTP_MAX_RETRIES", "3"))     # on connection errors / 429 / 5xx
+HTTP_BACKOFF_BASE    = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX     = float(os.getenv("HTTP_BACKOFF_MAX", "20"))
+HTTP_WARMUP          = os.getenv("HTTP_WARMUP", "1") == "1"        # pre-open connections at app start
+
+# ==== Provider scheduler (services/scheduler.py), shared by every session in the process ====
+# Limits apply per (provider, model); "provider:model" keys override a single model. 0 = unlimited.
+SCHEDULER_LIMITS = {
+    "groq": {"rpm": float(os.getenv("GROQ_RPM", "30")), "tpm": float(os.getenv("GROQ_TPM", "6000")),
+             "concurrency": int(os.getenv("GROQ_CONCURRENCY", "4"))},
+    "openrouter": {"rpm": float(os.getenv("OPENROUTER_RPM", "300")), "tpm": float(os.getenv("OPENROUTER_TPM", "0")),
+                   "concurrency": int(os.getenv("OPENROUTER_CONCURRENCY", "8"))},
+}
+SCHEDULER_RESERVE = float(os.getenv("SCHEDULER_RESERVE", "0.25"))  # share of each limit batch jobs may not use
+
+# ==== Deadlines & hedged requests (services/hedging.py) ====
+RUN_DEADLINE_S    = float(os.getenv("RUN_DEADLINE_S", "45"))     # whole comparison on the pages; 0 = none
+HEDGE_ENABLED     = os.getenv("HEDGE", "1") == "1"
+HEDGE_QUANTILE    = float(os.getenv("HEDGE_QUANTILE", "0.95"))   # duplicate a call still silent past this latency quantile
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))    # history needed before a model is hedged
+
+# ==== RAG index cache (retrieval/index_cache.py) ====
+INDEX_CACHE_MB = float(os.getenv("INDEX_CACHE_MB", "512"))  # LRU budget for built retrievers/vector indexes
+
+# ==== LLM response cache (services/response_cache.py) ====
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_PATH    = os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite")
+RESPONSE_CACHE_MB      = float(os.getenv("RESPONSE_CACHE_MB", "200"))
+RESPONSE_CACHE_TTL_H   = float(os.getenv("RESPONSE_CACHE_TTL_H", "168"))  # 0 = never expire
+
+# ==== Vision image preprocessing (services/image_prep.py) ====
+IMAGE_MAX_EDGE  = int(os.getenv("IMAGE_MAX_EDGE", "1536"))     # longest side sent to vision models, px; 0 = keep
+IMAGE_FORMAT    = os.getenv("IMAGE_FORMAT", "jpeg").lower()    # jpeg | webp | png (jpeg falls back to webp for alpha)
+IMAGE_QUALITY   = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_CACHE_MB  = float(os.getenv("IMAGE_CACHE_MB", "64"))     # encoded data URLs kept by content hash
+
+# ==== Tokenizer (evaluators/tokenizer.py) ====
+TOKENIZER_CACHE_DIR = os.getenv("TOKENIZER_CACHE_DIR", ".cache/tiktoken")  # BPE vocabularies, fetched once
+
+# ==== RAG context budgets (retrieval/context_packer.py), in tokens per model ====
+RAG_CONTEXT_TOKENS = {
+    "openai": int(os.getenv("RAG_CONTEXT_TOKENS_OPENAI", "6000")),
+    "llama":  int(os.getenv("RAG_CONTEXT_TOKENS_LLAMA", "4000")),  # stays under Groq's free-tier TPM with the answer
+}
+
+# ==== Model registry (services/registry.py): every contender a run fans out to ====
+# key: names its results/columns (keep it stable); label: UI name and vote value; provider: a
+# client in services/registry.PROVIDERS; vision_model: set for models that accept images.
+# More contenders without code changes: EXTRA_MODELS='[{"key": "llama70", "label": "Llama-3.3 70B (Groq)",
+#   "short": "Llama-70B", "provider": "groq", "model": "llama-3.3-70b-versatile"}]'
+# Entries missing key/label/provider/model (or reusing a key) are skipped with a warning on stderr.
+MODEL_REQUIRED = ("key", "label", "provider", "model")
+
+def _extra_models(raw: str, taken: set) -> list:
+    try:
+        entries = json.loads(raw)
+    except ValueError as e:
+        print(f"config: EXTRA_MODELS is not valid JSON ({e}); ignored", file=sys.stderr)
+        return []
+    if not isinstance(entries, list): entries = [entries]
+    ok = []
+    for i, m in enumerate(entries):
+        missing = [f for f in MODEL_REQUIRED if not isinstance(m, dict) or not isinstance(m.get(f), str) or not m[f]]
+        if missing:
+            print(f"config: EXTRA_MODELS[{i}] skipped, missing {', '.join(missing)}", file=sys.stderr)
+        elif m["key"] in taken:
+            print(f"config: EXTRA_MODELS[{i}] skipped, key {m['key']!r} already in use", file=sys.stderr)
+        else:
+            taken.add(m["key"]); ok.append(m)
+    return ok
+
+MODELS = [
+    {"key": "openai", "label": "OpenAI (GPT-4o-mini)", "short": "OpenAI", "provider": "openrouter",
+     "model": OPENROUTER_TEXT_MODEL, "vision_model": OPENROUTER_VISION_MODEL},
+    {"key": "llama", "label": "Llama-3.1 (Groq)", "short": "Llama-3.1", "provider": "groq",
+     "model": GROQ_TEXT_MODEL},
+]
+MODELS += _extra_models(os.getenv("EXTRA_MODELS", "[]"), {m["key"] for m in MODELS})
+for _m in MODELS:
+    _m.setdefault("short", _m["label"])
+    _m.setdefault("context_tokens", RAG_CONTEXT_TOKENS.get(_m["key"], 4000))
+
+# ==== PDF extraction (retrieval/document_processor.py) ====
+PDF_WORKERS            = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))  # processes for page-parallel extraction
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "24"))  # smaller files: not worth a pool
+
+# ==== Run store (analytics/store.py) ====
+# the run history is data, not a cache: keep it out of .cache/ so clearing caches can't lose it
+RUNS_DB_PATH = os.getenv("RUNS_DB_PATH", "data/runs.sqlite")
+OLD_RUNS_DB_PATH = ".cache/runs.sqlite"  # default before; copied to RUNS_DB_PATH once (analytics/tracker.py)
+LEGACY_CSV   = os.getenv("LEGACY_CSV", "llm_benchmarks.csv")  # imported once into the run store
+
 # Rough costs (for display)
 COST_MAP = {
     "openai/gpt-4o-mini:input": 0.150,